@@ -0,0 +1,190 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+
+
+class BlockExpressions:
+    """Rebuilds the expressions a basic block of VM commands computes on the
+    stack.
+
+    Every pure value the block computes gets a node id. Two computations get
+    the same id only if they are guaranteed to produce the same value, so the
+    key of a node that reads a variable includes the version of the variable,
+    and every write to the variable increases its version. Writes to "this",
+    "that", "static" or "pointer 0", and calls to functions that are not
+    pure, may change any memory, so they increase the version of all of it.
+
+    Keys of nodes are tuples, whose children are node ids:
+    ("push", segment, index, version) for reading a variable or a constant,
+    ("load", address, version) for "pop pointer 1, push that 0",
+    ("call", name, argument, ...) for calling a pure function, and
+    (command, operand, ...) for arithmetic commands.
+    """
+    # the arithmetic commands that do not depend on the order of operands:
+    commutative_operations = {"add", "and", "or", "eq"}
+
+    # the arithmetic commands and the number of operands they take:
+    arithmetic_operations = {
+        "add": 2, "sub": 2, "and": 2, "or": 2, "eq": 2, "gt": 2, "lt": 2,
+        "neg": 1, "not": 1, "shiftleft": 1, "shiftright": 1
+    }
+
+    # the segments that are stored in memory the program may write through
+    # other segments:
+    memory_segments = {"this", "that", "static"}
+
+    # the functions of the Jack OS that compute a value without side effects:
+    default_pure_functions = {"Math.multiply": 2, "Math.divide": 2}
+
+    def __init__(self, commands: list, start: int, end: int, pure_functions: dict = None) -> None:
+        """Rebuilds the expressions of commands[start:end].
+
+        Args:
+            commands (list): VM commands.
+            start (int): index of the first command of the block.
+            end (int): index after the last command of the block.
+            pure_functions (dict): maps the names of the functions that compute
+            a value without side effects to their number of arguments.
+        """
+        self.pure_functions = self.default_pure_functions if pure_functions is None else pure_functions
+        # the key of every node id:
+        self.keys = []
+        # a (node_id, start, end) tuple for every computation of a node that
+        # is not a single push, in the order the computations end:
+        self.occurrences = []
+        self._ids = {}
+        self._versions = {}
+        self._memory_version = 0
+        self._calls = 0
+        self._stack = []
+        # the entry popped by the last "pop pointer 1":
+        self._last_pointer_entry = (None, None, None)
+        for index in range(start, end):
+            self._simulate(commands, index)
+
+    def node_id(self, key: tuple) -> int:
+        """
+        Args:
+            key (tuple): a key of a node.
+
+        Returns:
+            int: the id of the node with the given key. A new id is given to
+            keys that were not seen before, so children always have smaller ids
+            than their parents.
+        """
+        if key not in self._ids:
+            self._ids[key] = len(self.keys)
+            self.keys.append(key)
+        return self._ids[key]
+
+    def children(self, node_id: int) -> list:
+        """
+        Args:
+            node_id (int): id of a node.
+
+        Returns:
+            list: the ids of the nodes the node is computed from.
+        """
+        key = self.keys[node_id]
+        if key[0] == "push":
+            return []
+        if key[0] == "load":
+            return [key[1]]
+        if key[0] == "call":
+            return list(key[2:])
+        return list(key[1:])
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    def _version(self, segment: str, index: int) -> int:
+        """
+        Returns:
+            int: the current version of the given variable.
+        """
+        if segment == "constant":
+            return 0
+        if segment in self.memory_segments:
+            return self._memory_version
+        if segment == "temp":
+            # called functions may use temp as well:
+            return self._versions.get((segment, index), 0), self._calls
+        return self._versions.get((segment, index), 0)
+
+    def _write(self, segment: str, index: int):
+        """updates the versions after a write to the given variable"""
+        if segment in self.memory_segments or (segment == "pointer" and index == 0):
+            self._memory_version += 1
+        self._versions[(segment, index)] = self._versions.get((segment, index), 0) + 1
+
+    def _pop_entry(self) -> tuple:
+        """
+        Returns:
+            tuple: the (node_id, start, end) entry at the top of the stack. The
+            node_id of values that were pushed by an earlier block is None.
+        """
+        if self._stack:
+            return self._stack.pop()
+        return None, None, None
+
+    def _combine(self, operation_key: tuple, operands: list, index: int, commutative: bool):
+        """pushes the node that computes operation_key over the given operands
+        by the command at the given index"""
+        contiguous = all(operand[0] is not None for operand in operands) and \
+            all(operands[i][2] == operands[i + 1][1] for i in range(len(operands) - 1)) and \
+            operands[-1][2] == index
+        start = operands[0][1]
+        if not contiguous:
+            self._stack.append((None, start, index + 1))
+            return
+        child_ids = [operand[0] for operand in operands]
+        if commutative:
+            child_ids.sort()
+        node_id = self.node_id(operation_key + tuple(child_ids))
+        self._stack.append((node_id, start, index + 1))
+        self.occurrences.append((node_id, start, index + 1))
+
+    def _simulate(self, commands: list, index: int):
+        """updates the stack according to the command at the given index"""
+        command = commands[index]
+        command_word = command[0]
+        if command_word == "push":
+            segment, segment_index = command[1], command[2]
+            previous = commands[index - 1] if index > 0 else None
+            if segment == "that" and segment_index == 0 and previous == ("pop", "pointer", 1) \
+                    and self._last_pointer_entry[0] is not None \
+                    and self._last_pointer_entry[2] == index - 1:
+                address_id, start, _ = self._last_pointer_entry
+                node_id = self.node_id(("load", address_id, self._memory_version))
+                self._stack.append((node_id, start, index + 1))
+                self.occurrences.append((node_id, start, index + 1))
+            elif segment == "that":
+                self._stack.append((None, index, index + 1))
+            else:
+                key = ("push", segment, segment_index, self._version(segment, segment_index))
+                self._stack.append((self.node_id(key), index, index + 1))
+        elif command_word == "pop":
+            entry = self._pop_entry()
+            if command[1:] == ("pointer", 1):
+                self._last_pointer_entry = entry
+            self._write(command[1], command[2])
+        elif command_word in self.arithmetic_operations:
+            n_operands = self.arithmetic_operations[command_word]
+            operands = [self._pop_entry() for _ in range(n_operands)][::-1]
+            self._combine((command_word,), operands, index,
+                          command_word in self.commutative_operations)
+        elif command_word == "call":
+            operands = [self._pop_entry() for _ in range(command[2])][::-1]
+            if self.pure_functions.get(command[1]) == command[2] and operands:
+                self._combine(("call", command[1]), operands, index,
+                              command[1] == "Math.multiply")
+            else:
+                self._memory_version += 1
+                self._calls += 1
+                self._stack.append((None, index, index + 1))
+        elif command_word == "if-goto":
+            self._pop_entry()
+
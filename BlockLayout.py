@@ -0,0 +1,183 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+from ExecutionProfile import ExecutionProfile
+from VMReport import VMReport
+
+
+class BlockLayout:
+    """An optimization that lays out the blocks of if statements and while
+    loops by how often an execution profile shows they run (see
+    ExecutionProfile), and orders the functions of every class from the
+    most called one.
+
+    A Hack jump costs the same whether it is taken or not, so what a layout
+    changes is which paths run a "goto", and whether a condition is negated.
+    compile_if emits "if-goto TRUE; goto FALSE; label TRUE; ...". Of the
+    layouts of an if statement, the one the profiled runs of its branches
+    estimate to run the fewest Hack instructions is chosen (see VMReport):
+    - the "else" block, if any, right after the "if-goto" and before a
+      "goto" to the end, and the "then" block last, or
+    - the condition negated, when it ends with a comparison, so its "not"
+      is added, or with a negated comparison, so its "not" is removed, the
+      "then" block first and the "else" block last, which the "if-goto"
+      jumps to. Its label is the label of the "then" block with
+      ExecutionProfile.negated_suffix.
+    A while loop whose body runs at least ExecutionProfile.hot_count times
+    and whose condition ends with a comparison is rotated: its condition is
+    tested once before the loop, and again at the end of the body, jumping
+    back while it holds, so an iteration runs neither the "not" of the
+    condition nor the "goto" back. The body starts at the label the loop
+    ends at with ExecutionProfile.negated_suffix.
+    """
+    # the name, representation and dependencies of the pass (see PassManager).
+    # The other passes find loops by their "goto" back, so blocks are laid
+    # out once they ran:
+    name = "layout"
+    representation = "ir"
+    depends_on = ("inline", "cse", "licm", "unroll", "propagate", "evaluate", "strength")
+
+    # the commands that push either true (-1) or false (0):
+    comparisons = ("eq", "gt", "lt")
+
+    # the estimated Hack instructions of a "goto" and of a "not":
+    goto_cost = VMReport.command_cost(("goto", ""))
+    not_cost = VMReport.command_cost(("not",))
+
+    def __init__(self) -> None:
+        """Creates a new optimization."""
+        # the ExecutionProfile of the program, or None for no changes:
+        self.profile = None
+        # the number of if statements laid out and of loops rotated:
+        self.laid_out = 0
+        self.rotated = 0
+
+    def run(self, commands: list) -> list:
+        """
+        Args:
+            commands (list): the commands of a single function, starting with
+            its "function" command.
+
+        Returns:
+            list: the commands of the function, with its if statements laid
+            out and its hot loops rotated.
+        """
+        if self.profile is None:
+            return commands
+        for label in [commands[index][1] for index in range(len(commands) - 2)
+                      if commands[index][0] == "if-goto" and commands[index + 1][0] == "goto" and
+                      commands[index + 2] == ("label", commands[index][1])]:
+            commands = self._lay_out_if(commands, label)
+        for label in [command[1] for command in commands if command[0] == "goto"]:
+            commands = self._rotate_loop(commands, label)
+        return commands
+
+    def function_order(self, function_name: str) -> int:
+        """
+        Returns:
+            int: the key that orders the functions of a class, from the most
+            called one (see ExecutionProfile.function_order).
+        """
+        return self.profile.function_order(function_name)
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    @staticmethod
+    def _references(commands: list) -> dict:
+        """
+        Returns:
+            dict: maps every label to the number of jumps to it.
+        """
+        references = {}
+        for command in commands:
+            if command[0] in ("goto", "if-goto"):
+                references[command[1]] = references.get(command[1], 0) + 1
+        return references
+
+    def _negation(self, commands: list, end: int) -> tuple:
+        """
+        Returns:
+            tuple: (commands, cost): the commands of the condition that ends
+            at the given index negated, and the estimated Hack instructions
+            the negation adds, or (None, 0) if it cannot be negated.
+        """
+        if commands[end - 1] == ("not",) and commands[end - 2][0] in self.comparisons:
+            return commands[:end - 1], -self.not_cost
+        if commands[end - 1][0] in self.comparisons:
+            return commands[:end] + [("not",)], self.not_cost
+        return None, 0
+
+    def _lay_out_if(self, commands: list, label: str) -> list:
+        """
+        Returns:
+            list: the commands of the function, with the if statement whose
+            "then" block starts at the given label laid out.
+        """
+        references = self._references(commands)
+        index = commands.index(("label", label)) - 2
+        false_label = commands[index + 1][1]
+        if references[label] != 1 or references.get(false_label) != 1 or \
+                ("label", false_label) not in commands[index + 3:]:
+            return commands
+        false_index = commands.index(("label", false_label), index + 3)
+        counts = self.profile.branch(commands[0][1], label)
+        if counts is None or sum(counts) == 0:
+            return commands
+        n_then, n_else = counts
+        negated, negation_cost = self._negation(commands, index)
+        negated_label = label + ExecutionProfile.negated_suffix
+        end_label = commands[false_index - 1][1] if commands[false_index - 1][0] == "goto" else None
+        if end_label is not None and references.get(end_label) == 1 and \
+                ("label", end_label) in commands[false_index + 1:]:
+            end_index = commands.index(("label", end_label), false_index + 1)
+            then_block = commands[index + 3:false_index - 1]
+            else_block = commands[false_index + 1:end_index]
+            if negated is not None and \
+                    (n_then + n_else) * negation_cost + n_then * self.goto_cost < n_else * self.goto_cost:
+                self.laid_out += 1
+                return negated + [("if-goto", negated_label)] + then_block + [
+                    ("goto", end_label), ("label", negated_label)] + else_block + commands[end_index:]
+            self.laid_out += 1
+            return commands[:index + 1] + else_block + [("goto", end_label), ("label", label)] + then_block + \
+                commands[end_index:]
+        # an if statement without an "else" block:
+        if negated is None or (n_then + n_else) * negation_cost >= n_else * self.goto_cost:
+            return commands
+        self.laid_out += 1
+        return negated + [("if-goto", negated_label)] + commands[index + 3:false_index] + \
+            [("label", negated_label)] + commands[false_index + 1:]
+
+    def _rotate_loop(self, commands: list, label: str) -> list:
+        """
+        Returns:
+            list: the commands of the function, with the loop that starts at
+            the given label rotated, if it is a hot while loop.
+        """
+        if ("label", label) not in commands or ("goto", label) not in commands:
+            return commands
+        header = commands.index(("label", label))
+        back_edge = commands.index(("goto", label))
+        if back_edge < header or back_edge + 1 >= len(commands) or commands[back_edge + 1][0] != "label":
+            return commands
+        end_label = commands[back_edge + 1][1]
+        references = self._references(commands)
+        if references[label] != 1 or references.get(end_label) != 1:
+            return commands
+        test = header + 1
+        while commands[test][0] not in ("label", "goto", "if-goto", "return"):
+            test += 1
+        if commands[test] != ("if-goto", end_label) or commands[test - 1] != ("not",) or \
+                commands[test - 2][0] not in self.comparisons:
+            return commands
+        counts = self.profile.branch(commands[0][1], end_label)
+        if counts is None or counts[1] < self.profile.hot_count:
+            return commands
+        self.rotated += 1
+        condition = commands[header + 1:test - 1]
+        body_label = end_label + ExecutionProfile.negated_suffix
+        return commands[:header] + commands[header + 1:test + 1] + [("label", body_label)] + \
+            commands[test + 1:back_edge] + condition + [("if-goto", body_label)] + commands[back_edge + 1:]
@@ -0,0 +1,131 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+from BlockExpressions import BlockExpressions
+from ControlFlowGraph import ControlFlowGraph
+from VMReport import VMReport
+
+
+class CommonSubexpressionEliminator:
+    """An optimization that computes a pure subexpression that is repeated
+    within a basic block only once.
+
+    The first computation saves its value in a new local, and every repeated
+    computation is replaced by pushing that local. Calls to functions that
+    are not pure, and writes to memory, end the lifetime of every expression
+    that reads memory (see BlockExpressions). An expression is only
+    eliminated if the estimated Hack cost of the repeated computations is
+    higher than the cost of saving and pushing the local.
+
+    The compiler sets "pointer 1" right before every access to "that", so an
+    eliminated array read may skip its "pop pointer 1".
+    """
+    # the name, representation and dependencies of the pass (see PassManager):
+    name = "cse"
+    representation = "ir"
+    depends_on = ()
+
+    # the commands that save the value at the top of the stack to a local and
+    # push it back:
+    save_cost = VMReport.command_cost(("pop", "local", 0)) + VMReport.command_cost(("push", "local", 0))
+    reuse_cost = VMReport.command_cost(("push", "local", 0))
+
+    def __init__(self, pure_functions: dict = None) -> None:
+        """Creates a new eliminator.
+
+        Args:
+            pure_functions (dict): maps the names of the functions that compute
+            a value without side effects to their number of arguments. The
+            default is BlockExpressions.default_pure_functions.
+        """
+        self.pure_functions = pure_functions
+        # the number of computations eliminated from all optimized functions:
+        self.eliminated = 0
+
+    def run(self, commands: list) -> list:
+        """
+        Args:
+            commands (list): the commands of a single function, starting with
+            its "function" command.
+
+        Returns:
+            list: the commands of the function, with repeated subexpressions
+            computed once.
+        """
+        _, name, n_locals = commands[0]
+        # maps indices of commands to the commands to insert before them:
+        insertions = {}
+        # maps the start of every replaced range to its end and replacement:
+        replacements = {}
+        for start, end in ControlFlowGraph(commands).blocks:
+            expressions = BlockExpressions(commands, start, end, self.pure_functions)
+            for first, repeated in self._select(commands, expressions):
+                local_index = n_locals
+                n_locals += 1
+                insertions.setdefault(first[1], []).extend(
+                    [("pop", "local", local_index), ("push", "local", local_index)])
+                for repeated_start, repeated_end in repeated:
+                    replacements[repeated_start] = (repeated_end, ("push", "local", local_index))
+                self.eliminated += len(repeated)
+        if not replacements:
+            return commands
+        new_commands = [("function", name, n_locals)]
+        index = 1
+        while index < len(commands):
+            new_commands.extend(insertions.get(index, []))
+            if index in replacements:
+                index, replacement = replacements[index]
+                new_commands.append(replacement)
+            else:
+                new_commands.append(commands[index])
+                index += 1
+        new_commands.extend(insertions.get(index, []))
+        return new_commands
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    def _select(self, commands: list, expressions: BlockExpressions) -> list:
+        """
+        Args:
+            commands (list): the commands of the function.
+            expressions (BlockExpressions): the expressions of a single block.
+
+        Returns:
+            list: a ((start, end), [(start, end), ...]) tuple for every
+            expression to eliminate: the range of its first computation and
+            the ranges of the computations to replace.
+        """
+        ranges = {}
+        for node_id, start, end in expressions.occurrences:
+            ranges.setdefault(node_id, []).append((start, end))
+        # larger expressions first, so repeated subexpressions of an
+        # eliminated expression are not eliminated on their own:
+        candidates = sorted(
+            (node_id for node_id in ranges if len(ranges[node_id]) > 1),
+            key=lambda node_id: ranges[node_id][0][0] - ranges[node_id][0][1])
+        replaced = []
+        selected = []
+        for node_id in candidates:
+            node_ranges = [node_range for node_range in ranges[node_id]
+                           if not self._is_inside(node_range, replaced)]
+            if len(node_ranges) < 2:
+                continue
+            first, repeated = node_ranges[0], node_ranges[1:]
+            cost = VMReport.estimate_hack_cost(commands[first[0]:first[1]])
+            if len(repeated) * (cost - self.reuse_cost) <= self.save_cost:
+                continue
+            replaced.extend(repeated)
+            selected.append((first, repeated))
+        return selected
+
+    @staticmethod
+    def _is_inside(node_range: tuple, ranges: list) -> bool:
+        """
+        Returns:
+            bool: is the given range inside one of the given ranges?
+        """
+        return any(start <= node_range[0] and node_range[1] <= end for start, end in ranges)
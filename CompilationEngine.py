@@ -6,6 +6,7 @@ Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
 import typing
 import JackTokenizer
+from Diagnostic import CompilationError, Diagnostic
 import SymbolTable
 import VMWriter
 
@@ -39,43 +40,110 @@ class CompilationEngine:
         "THIS": "this"
     }
 
-    def __init__(self, input_stream: "JackTokenizer", output_stream) -> None:
+    # the inline VM code of the Jack OS functions the engine may expand
+    # instead of calling them, by name. The code gets the arguments of the
+    # call on the stack and leaves the value the function returns, using temp
+    # 0 and temp 1 for the arguments. Math.abs, Math.min and Math.max add the
+    # difference of the values, masked by the -1 or 0 a comparison leaves, so
+    # they need no branches. They compare with "lt" like the Jack OS does, so
+    # values more than 32767 apart compare as they would in the OS. Memory.poke
+    # leaves the 0 of a void function:
+    intrinsics_dictionary = {
+        "Memory.peek": (("POP", "POINTER", 1), ("PUSH", "THAT", 0)),
+        "Memory.poke": (("POP", "TEMP", 1), ("POP", "POINTER", 1), ("PUSH", "TEMP", 1), ("POP", "THAT", 0),
+                        ("PUSH", "CONST", 0)),
+        "Math.abs": (("POP", "TEMP", 0), ("PUSH", "TEMP", 0),
+                     ("PUSH", "TEMP", 0), ("NEG",), ("PUSH", "TEMP", 0), ("SUB",),
+                     ("PUSH", "TEMP", 0), ("PUSH", "CONST", 0), ("LT",), ("AND",), ("ADD",)),
+        "Math.min": (("POP", "TEMP", 1), ("POP", "TEMP", 0), ("PUSH", "TEMP", 1),
+                     ("PUSH", "TEMP", 0), ("PUSH", "TEMP", 1), ("SUB",),
+                     ("PUSH", "TEMP", 0), ("PUSH", "TEMP", 1), ("LT",), ("AND",), ("ADD",)),
+        "Math.max": (("POP", "TEMP", 1), ("POP", "TEMP", 0), ("PUSH", "TEMP", 0),
+                     ("PUSH", "TEMP", 1), ("PUSH", "TEMP", 0), ("SUB",),
+                     ("PUSH", "TEMP", 0), ("PUSH", "TEMP", 1), ("LT",), ("AND",), ("ADD",)),
+    }
+
+    def __init__(self, input_stream: "JackTokenizer", output_stream, optimizations: list = (),
+                 vm_writer: "VMWriter" = None, subroutine_cache: "SubroutineCache" = None,
+                 project_index: "ProjectIndex" = None,
+                 dependency_graph: "DependencyGraph" = None,
+                 intrinsic_rewrites: dict = None) -> None:
         """
         Creates a new compilation engine with the given input and output. The
         next routine called must be compileClass()
         :param input_stream: The input stream.
         :param output_stream: The output stream.
+        :param optimizations: optimizations the VM writer runs on every function.
+        :param vm_writer: writes the compiled commands instead of a new VMWriter
+        of the output stream, such as a HackWriter.
+        :param subroutine_cache: if given, subroutines that did not change since
+        they were cached are not compiled again (see SubroutineCache).
+        :param project_index: if given, the subroutines of the class are
+        recorded in it once the class compiles without errors.
+        :param dependency_graph: if given, the dependencies of the class are
+        recorded in it once the class compiles without errors.
+        :param intrinsic_rewrites: if given, maps the names of the functions of
+        intrinsics_dictionary to expand inline to the number of calls expanded
+        so far, which is counted up. Other calls are written as calls.
         """
         self._output_file = output_stream
         # inits the jack tokenizer, the vm writer and the symbol table which help to compile the input stream:
         self._jack_tokenizer = JackTokenizer.JackTokenizer(input_stream)
-        self._vm_writer = VMWriter.VMWriter(output_stream)
+        if vm_writer is None:
+            vm_writer = VMWriter.VMWriter(output_stream, optimizations)
+        self._vm_writer = vm_writer
         self._symbol_table = SymbolTable.SymbolTable()
         self._current_class_name = ""
         self._function_name = ""
+        # the problems found in the class, starting with the lexical errors
+        # of the tokenizer (see Diagnostic):
+        self.diagnostics = list(self._jack_tokenizer.diagnostics)
+        # the (name, kind, n_params, n_locals) signature of every subroutine
+        # of the class, where kind is "function", "method" or "constructor",
+        # n_params does not count "this" and n_locals counts the declared
+        # locals:
+        self.subroutines = []
+        self._subroutine_cache = subroutine_cache
+        self._project_index = project_index
+        # the fingerprints of the subroutines of the class, when caching:
+        self._subroutine_fingerprints = []
+        self._dependency_graph = dependency_graph
+        # the classes whose functions the class calls, and the classes that
+        # are the types of its variables, not counting the class itself:
+        self.called_classes = set()
+        self.type_classes = set()
+        # the same, for the subroutine currently compiled:
+        self._subroutine_called_classes = set()
+        self._subroutine_type_classes = set()
+        self._intrinsic_rewrites = intrinsic_rewrites
 
     def compile_class(self) -> None:
-        """Compiles a complete class."""
-        # advance in order to get "class":
-        self._jack_tokenizer.advance()
-        #  advance in order to get class_name:
-        self._current_class_name = self._advance_and_get_value_of_current_token()
-        #  advance in order to get "{":
-        self._jack_tokenizer.advance()
-        # checks if there is / are varDec and compile them:
-        if self._is_next_value_equals(self.keywords_dict["STATIC"]) or \
-                self._is_next_value_equals(self.keywords_dict["FIELD"]):
-            # if there are var dec compile them:
-            self.compile_class_var_dec()
-        # compiles all the subroutines:
-        while self._is_next_value_equals(self.keywords_dict["CONSTRUCTOR"]) or \
-                self._is_next_value_equals(self.keywords_dict["METHOD"]) or \
-                self._is_next_value_equals(self.keywords_dict["FUNCTION"]):
-            self.compile_subroutine()
-        #  advance in order to get  "}":
-        self._jack_tokenizer.advance()
-        # close file in the end of class- assuming files are valid:
+        """Compiles a complete class.
+
+        Raises:
+            CompilationError: if the class has errors. A syntax error stops the
+            compilation, other errors are all found before it is raised.
+        """
+        try:
+            self._compile_class_body()
+        except CompilationError as error:
+            raise CompilationError(self.diagnostics + error.diagnostics)
+        if self._subroutine_cache is not None:
+            self._subroutine_cache.retain(self._current_class_name, self._subroutine_fingerprints)
+        # a class with errors writes nothing more, since its code is not valid:
+        if any(diagnostic.severity == "error" for diagnostic in self.diagnostics):
+            raise CompilationError(self.diagnostics)
+        # close file in the end of class:
         self._close()
+        if self._project_index is not None:
+            self._project_index.update(self._current_class_name,
+                                       self._project_index.source_hash(self._jack_tokenizer.input_lines),
+                                       self.subroutines)
+        self.type_classes |= self._helper_type_classes(self._symbol_table.class_scope_table)
+        self.called_classes.discard(self._current_class_name)
+        self.type_classes.discard(self._current_class_name)
+        if self._dependency_graph is not None:
+            self._dependency_graph.update(self._current_class_name, self.called_classes, self.type_classes)
 
     def compile_class_var_dec(self) -> None:
         """Compiles a static declaration or a field declaration."""
@@ -98,7 +166,7 @@ class CompilationEngine:
                 # defines the var in the symbol table:
                 self._symbol_table.define(var_name, var_type, var_kind)
             # advance and in order to get ';':
-            self._jack_tokenizer.advance()
+            self._advance_over(";")
 
     def compile_subroutine(self) -> None:
         """
@@ -113,19 +181,23 @@ class CompilationEngine:
         #  advance in order to get subroutine's name:
         self._function_name = self._current_class_name + '.' + self._advance_and_get_value_of_current_token()
         self._symbol_table.start_subroutine()
+        self._subroutine_called_classes = set()
         #  advance in order to get '(':
-        self._jack_tokenizer.advance()
+        self._advance_over("(")
         if function_type == "METHOD":
             self._symbol_table.define(self.keywords_dict["THIS"], "self", 'ARG')
         self.compile_parameter_list()
         #  advance in order to get ')':
-        self._jack_tokenizer.advance()
+        self._advance_over(")")
         # compile subroutine body:
         #  advance in order to get '{':
-        self._jack_tokenizer.advance()
+        self._advance_over("{")
         while self._is_next_value_equals(self.keywords_dict["VAR"]):
             self.compile_var_dec()
         num_of_vars = self._symbol_table.var_count("VAR")
+        num_of_parameters = self._symbol_table.var_count("ARG") - (1 if function_type == "METHOD" else 0)
+        self.subroutines.append((self._function_name.split(".", 1)[1], self.keywords_dict[function_type],
+                                 num_of_parameters, num_of_vars))
         self._vm_writer.write_function(self._function_name, num_of_vars)
         if function_type == "METHOD":
             self._vm_writer.write_push("ARG", 0)
@@ -133,11 +205,14 @@ class CompilationEngine:
         if function_type == 'CONSTRUCTOR':
             num_of_class_vars = self._symbol_table.var_count("FIELD")
             self._vm_writer.write_push("CONST", num_of_class_vars)
-            self._vm_writer.write_call("Memory.alloc", 1)
+            self._write_call("Memory.alloc", 1)
             self._vm_writer.write_pop("POINTER", 0)
         self.compile_statements()
         #  advance in order to get '}':
-        self._jack_tokenizer.advance()
+        self._advance_over("}")
+        self._subroutine_type_classes = self._helper_type_classes(self._symbol_table.subroutines_scope_table)
+        self.called_classes |= self._subroutine_called_classes
+        self.type_classes |= self._subroutine_type_classes
         self._symbol_table.change_to_the_class_scope()
 
     def compile_parameter_list(self) -> None:
@@ -172,7 +247,7 @@ class CompilationEngine:
             # defines the var in the symbol table:
             self._symbol_table.define(var_name, var_type, var_kind)
         # advance and in order to get ';':
-        self._jack_tokenizer.advance()
+        self._advance_over(";")
 
     def compile_statements(self) -> None:
         """Compiles a sequence of statements, not including the enclosing 
@@ -201,7 +276,7 @@ class CompilationEngine:
         self._helper_to_compile_subroutine_call()
         self._vm_writer.write_pop("TEMP", 0)
         # advance and in order to get ';':
-        self._jack_tokenizer.advance()
+        self._advance_over(";")
 
     def compile_let(self) -> None:
         """Compiles a let statement."""
@@ -210,15 +285,16 @@ class CompilationEngine:
         is_array_object = False
         # advance and get var_name
         var_name = self._advance_and_get_value_of_current_token()
+        self._check_variable_is_defined(var_name)
         if self._is_next_value_equals("["):
             is_array_object = True
             self._helper_to_calculate_case_of_array(var_name)
         # advance and gets "=":
-        self._jack_tokenizer.advance()
+        self._advance_over("=")
         self.compile_expression()
         self._helper_to_compile_let_according_if_is_array(is_array_object, var_name)
         # advance and in order to get ';':
-        self._jack_tokenizer.advance()
+        self._advance_over(";")
 
     def compile_while(self) -> None:
         """Compiles a while statement."""
@@ -228,19 +304,19 @@ class CompilationEngine:
         # advance and get "while"
         self._jack_tokenizer.advance()
         # advance and get "("
-        self._jack_tokenizer.advance()
+        self._advance_over("(")
         self.compile_expression()
         self._vm_writer.write_arithmetic("NOT")
         self._vm_writer.write_if("WHILE_FINISHED_LABEL" + str(while_counter_val))
         # advance and get ")"
         # advance and get "{"
-        self._jack_tokenizer.advance()
-        self._jack_tokenizer.advance()
+        self._advance_over(")")
+        self._advance_over("{")
         self.compile_statements()
         self._vm_writer.write_goto("WHILE_EXPRESSION_LABEL" + str(while_counter_val))
         self._vm_writer.write_label("WHILE_FINISHED_LABEL" + str(while_counter_val))
         # advance and get "}"
-        self._jack_tokenizer.advance()
+        self._advance_over("}")
 
     def compile_return(self) -> None:
         """Compiles a return statement."""
@@ -267,17 +343,17 @@ class CompilationEngine:
             self._vm_writer.write_push("CONST", 0)
         self._vm_writer.write_return()
         # advance and gets ";"
-        self._jack_tokenizer.advance()
+        self._advance_over(";")
 
     def compile_if(self) -> None:
         """Compiles a if statement, possibly with a trailing else clause."""
         # advance and get "if"
         self._jack_tokenizer.advance()
         # advance and get "("
-        self._jack_tokenizer.advance()
+        self._advance_over("(")
         self.compile_expression()
         # advance and get ")"
-        self._jack_tokenizer.advance()
+        self._advance_over(")")
         if_counter_val = self._symbol_table.counters_dictionary["if_counter"]
         self._symbol_table.counters_dictionary["if_counter"] += 1
 
@@ -286,23 +362,16 @@ class CompilationEngine:
         self._vm_writer.write_label('IF_TRUE_LABEL' + str(if_counter_val))
 
         # advance and get "{"
-        self._jack_tokenizer.advance()
+        self._advance_over("{")
         self.compile_statements()
         # advance and get "}"
-        self._jack_tokenizer.advance()
+        self._advance_over("}")
         # compile else (if there is) block:
         self._helper_to_compile_else_block(if_counter_val)
 
     def compile_expression(self) -> None:
         """Compiles an expression."""
-        self.compile_term()
-        # a list of binary operations in the jack language:
-        _list_of_binary_operations = ['+', '-', '*', '/', '|', '=', '<', '>', '&']
-        while self._is_next_value_in_list(_list_of_binary_operations):
-            # advance and gets the operation:
-            current_operation = self._advance_and_get_value_of_current_token()
-            self.compile_term()
-            self._helper_writes_given_binary_operation(current_operation)
+        self._helper_compile_expression_iteratively(False)
 
     def compile_term(self) -> None:
         """Compiles a term. 
@@ -314,51 +383,13 @@ class CompilationEngine:
         to distinguish between the three possibilities. Any other token is not
         part of this term and should not be advanced over.
         """
-        # a list of unary operations in the jack language:
-        _list_of_unary_operations = ['-', '~', '^', '#']
-        # a list of constant keywords in the jack language:
-        _list_of_constant_keywords = ['true', 'false', 'null', 'this']
-
-        if self._is_next_token_type_equals("INT_CONST"):
-            current_token_value = self._advance_and_get_value_of_current_token()
-            self._vm_writer.write_push("CONST", current_token_value)
-
-        elif self._is_next_token_type_equals("STRING_CONST"):
-            self._helper_compile_string_const_in_term()
-
-        elif self._is_next_value_in_list(_list_of_constant_keywords):
-            self._helper_compile_constant_keywords_in_term()
-
-        elif self._is_next_token_type_equals("IDENTIFIER"):
-            self._helper_compile_identifier_in_term()
-
-        elif self._is_next_value_in_list(_list_of_unary_operations):
-            current_operation = self._advance_and_get_value_of_current_token()
-            self.compile_term()
-            self._helper_writes_given_unary_operation(current_operation)
-
-        elif self._is_next_value_equals("("):
-            # advance and get'(':
-            self._jack_tokenizer.advance()
-            self.compile_expression()
-            # advance and get ')':
-            self._jack_tokenizer.advance()
+        self._helper_compile_expression_iteratively(True)
 
     def compile_expression_list(self) -> int:
         """Compiles a (possibly empty) comma-separated list of expressions."""
-
-        # a list of unary operations in the jack language:
-        _list_of_unary_operations = ['-', '~', '^', '#']
-        # a list of constant keywords in the jack language:
-        _list_of_constant_keywords = ['true', 'false', 'null', 'this']
-
         num_of_expressions = 0
 
-        if self._is_next_token_type_equals("INT_CONST") or self._is_next_token_type_equals("STRING_CONST") \
-                or self._is_next_token_type_equals("IDENTIFIER") or \
-                (self._is_next_value_in_list(_list_of_unary_operations)) or \
-                (self._is_next_value_in_list(_list_of_constant_keywords)) or \
-                (self._is_next_value_equals('(')):
+        if self._helper_is_next_token_an_expression_start():
             self.compile_expression()
             num_of_expressions += 1
 
@@ -375,6 +406,117 @@ class CompilationEngine:
     # helpers- not part of the API:
     #######################################
 
+    def _compile_class_body(self) -> None:
+        """Compiles a complete class, without closing the output file."""
+        # advance in order to get "class":
+        self._advance_over(self.keywords_dict["CLASS"])
+        #  advance in order to get class_name:
+        self._current_class_name = self._advance_and_get_value_of_current_token()
+        #  advance in order to get "{":
+        self._advance_over("{")
+        # checks if there is / are varDec and compile them:
+        if self._is_next_value_equals(self.keywords_dict["STATIC"]) or \
+                self._is_next_value_equals(self.keywords_dict["FIELD"]):
+            # if there are var dec compile them:
+            self.compile_class_var_dec()
+        # compiles all the subroutines:
+        while self._is_next_value_equals(self.keywords_dict["CONSTRUCTOR"]) or \
+                self._is_next_value_equals(self.keywords_dict["METHOD"]) or \
+                self._is_next_value_equals(self.keywords_dict["FUNCTION"]):
+            if self._subroutine_cache is None:
+                self.compile_subroutine()
+            else:
+                self._compile_subroutine_with_cache()
+        #  advance in order to get  "}":
+        self._advance_over("}")
+        # nothing may follow the class, since a file has a single class:
+        if self._jack_tokenizer.has_more_tokens():
+            self._jack_tokenizer.advance()
+            self._syntax_error("end of file")
+
+    def _compile_subroutine_with_cache(self):
+        """
+        Function that reuses the cached VM code of the next subroutine if its
+        fingerprint did not change, and otherwise compiles and caches it.
+        """
+        n_tokens = self._helper_subroutine_length()
+        if n_tokens is None:
+            # the subroutine does not end, so compiling it reports the error:
+            self.compile_subroutine()
+            return
+        next_token_index = self._jack_tokenizer.next_token_index
+        tokens = tuple(self._jack_tokenizer.tokens_list[next_token_index:next_token_index + n_tokens])
+        class_symbols = tuple(sorted(
+            (value, self._symbol_table.class_scope_table[value]) for value in
+            {value for token_type, value in tokens if token_type == "IDENTIFIER"}
+            if value in self._symbol_table.class_scope_table))
+        n_fields = self._symbol_table.var_count("FIELD") \
+            if tokens[0][1] == self.keywords_dict["CONSTRUCTOR"] else None
+        fingerprint = self._subroutine_cache.fingerprint(self._current_class_name, tokens, class_symbols, n_fields,
+                                                         self._helper_code_options())
+        self._subroutine_fingerprints.append(fingerprint)
+        entry = self._subroutine_cache.get(fingerprint)
+        if entry is not None:
+            commands, signature, (called_classes, type_classes), intrinsic_rewrites = entry
+            self._jack_tokenizer.skip(n_tokens)
+            self._vm_writer.write_vm_commands(commands)
+            self.subroutines.append(signature)
+            self.called_classes |= called_classes
+            self.type_classes |= type_classes
+            # the reused calls were expanded inline, so they are counted again:
+            if self._intrinsic_rewrites is not None:
+                for name, count in intrinsic_rewrites.items():
+                    self._intrinsic_rewrites[name] += count
+            return
+        n_diagnostics = len(self.diagnostics)
+        rewrites_before = dict(self._intrinsic_rewrites or {})
+        self.compile_subroutine()
+        commands = self._vm_writer.flush()
+        # subroutines with errors are compiled again, to report them again:
+        if len(self.diagnostics) == n_diagnostics:
+            intrinsic_rewrites = {name: count - rewrites_before[name]
+                                  for name, count in (self._intrinsic_rewrites or {}).items()
+                                  if count != rewrites_before[name]}
+            self._subroutine_cache.put(fingerprint, commands, self.subroutines[-1], (
+                frozenset(self._subroutine_called_classes), frozenset(self._subroutine_type_classes)),
+                intrinsic_rewrites)
+
+    def _helper_code_options(self):
+        """
+        Function that returns the options of the engine that change the code
+        it emits: the intrinsics it expands inline, and the names of the
+        optimizations of the writer and of their passes.
+        """
+        intrinsics = None if self._intrinsic_rewrites is None else tuple(sorted(self._intrinsic_rewrites))
+        optimizations = tuple(
+            (getattr(optimization, "name", type(optimization).__name__),
+             tuple(getattr(optimization_pass, "name", type(optimization_pass).__name__)
+                   for optimization_pass in getattr(optimization, "passes", ())))
+            for optimization in getattr(self._vm_writer, "optimizations", ()))
+        return intrinsics, optimizations
+
+    def _helper_subroutine_length(self):
+        """
+        Function that counts the tokens of the next subroutine.
+            Returns:
+                int: the number of tokens up to and including the '}' that ends
+                the body of the subroutine, or None if the body does not end.
+         """
+        depth = 0
+        tokens_list = self._jack_tokenizer.tokens_list
+        next_token_index = self._jack_tokenizer.next_token_index
+        for index in range(next_token_index, len(tokens_list)):
+            token_type, token_value = tokens_list[index]
+            if token_type != "SYMBOL":
+                continue
+            if token_value == "{":
+                depth += 1
+            elif token_value == "}":
+                depth -= 1
+                if depth == 0:
+                    return index + 1 - next_token_index
+        return None
+
     def _advance_and_get_value_of_current_token(self):
         """
         Function that advance the jack_tokenizer and returns tuple of the current tpe and value.
@@ -430,11 +572,11 @@ class CompilationEngine:
             self._vm_writer.write_push("POINTER", 0)
             num_of_local_vars += 1
             final_full_of_name = self._current_class_name + '.' + first_part_of_name
-        self._jack_tokenizer.advance()
+        self._advance_over("(")
         num_of_local_vars += self.compile_expression_list()
-        self._vm_writer.write_call(final_full_of_name, num_of_local_vars)
+        self._write_call(final_full_of_name, num_of_local_vars)
         # advance and gets ')':
-        self._jack_tokenizer.advance()
+        self._advance_over(")")
 
     def _helper_to_compile_let_according_if_is_array(self, is_array_object: bool, var_name: str):
         """
@@ -469,7 +611,7 @@ class CompilationEngine:
         self._jack_tokenizer.advance()
         self.compile_expression()
         # advance and get "]":
-        self._jack_tokenizer.advance()
+        self._advance_over("]")
         if var_name in self._symbol_table.current_table:
             if self._symbol_table.kind_of(var_name) == "VAR":
                 self._vm_writer.write_push("LOCAL", self._symbol_table.index_of(var_name))
@@ -494,10 +636,10 @@ class CompilationEngine:
             # advance and get "else"
             self._jack_tokenizer.advance()
             # advance and get "{"
-            self._jack_tokenizer.advance()
+            self._advance_over("{")
             self.compile_statements()
             # advance and get "}"
-            self._jack_tokenizer.advance()
+            self._advance_over("}")
             self._vm_writer.write_label('IF_FINISH_LABEL' + str(if_counter_val))
         else:
             self._vm_writer.write_label('IF_FALSE_LABEL' + str(if_counter_val))
@@ -531,10 +673,10 @@ class CompilationEngine:
             self._vm_writer.write_arithmetic("AND")
 
         elif current_operation == '*':
-            self._vm_writer.write_call('Math.multiply', 2)
+            self._write_call('Math.multiply', 2)
 
         elif current_operation == '/':
-            self._vm_writer.write_call('Math.divide', 2)
+            self._write_call('Math.divide', 2)
 
     def _helper_writes_given_unary_operation(self, current_operation: str):
         """
@@ -559,10 +701,10 @@ class CompilationEngine:
          """
         current_token_value = self._advance_and_get_value_of_current_token()
         self._vm_writer.write_push("CONST", len(current_token_value))
-        self._vm_writer.write_call("String.new", 1)
+        self._write_call("String.new", 1)
         for each_char in current_token_value:
             self._vm_writer.write_push("CONST", ord(each_char))
-            self._vm_writer.write_call("String.appendChar", 2)
+            self._write_call("String.appendChar", 2)
 
     def _helper_compile_constant_keywords_in_term(self):
         """
@@ -577,65 +719,190 @@ class CompilationEngine:
             if current_token_value == "TRUE":
                 self._vm_writer.write_arithmetic("NOT")
 
-    def _helper_compile_identifier_in_term(self):
+    def _helper_compile_expression_iteratively(self, is_single_term: bool):
         """
-        Function that helps compile term in case of identifier in the term
-        it is called only if compile term needs to compile a identifier.
+        Function that compiles an expression, or a single term, without recursion.
+        Jack has no operator precedence: the binary operators of an expression
+        are applied from left to right, and a unary operator applies to the
+        term after it. Parentheses, unary operators, array indices and call
+        arguments that wait for an inner term or expression are kept on an
+        explicit stack instead of the call stack, so the depth of nesting is
+        only limited by memory, and every token is handled once.
+            Arguments:
+                boolean: is_single_term compile a single term, rather than an
+                expression.
+         """
+        # a list of binary operations in the jack language:
+        _list_of_binary_operations = ['+', '-', '*', '/', '|', '=', '<', '>', '&']
+        # a list of unary operations in the jack language:
+        _list_of_unary_operations = ['-', '~', '^', '#']
+        # a list of constant keywords in the jack language:
+        _list_of_constant_keywords = ['true', 'false', 'null', 'this']
+
+        # the constructs that wait for the term or expression compiled now, as
+        # [kind, ...] frames: "UNARY" and "BINARY" hold their operation and
+        # wait for a term, "PAREN" waits for an expression, "INDEX" holds the
+        # name of its array and "ARGS" the name of its subroutine and its
+        # number of arguments so far, and both wait for expressions:
+        pending = []
+        is_term_needed = True
+        while True:
+            if is_term_needed:
+                is_term_needed = False
+                if self._is_next_token_type_equals("INT_CONST"):
+                    current_token_value = self._advance_and_get_value_of_current_token()
+                    self._vm_writer.write_push("CONST", current_token_value)
+
+                elif self._is_next_token_type_equals("STRING_CONST"):
+                    self._helper_compile_string_const_in_term()
+
+                elif self._is_next_value_in_list(_list_of_constant_keywords):
+                    self._helper_compile_constant_keywords_in_term()
+
+                elif self._is_next_token_type_equals("IDENTIFIER"):
+                    is_term_needed = self._helper_start_identifier_in_term(pending)
+
+                elif self._is_next_value_in_list(_list_of_unary_operations):
+                    pending.append(["UNARY", self._advance_and_get_value_of_current_token()])
+                    is_term_needed = True
+
+                elif self._is_next_value_equals("("):
+                    # advance and get'(':
+                    self._jack_tokenizer.advance()
+                    pending.append(["PAREN"])
+                    is_term_needed = True
+
+                else:
+                    self._advance_and_get_value_of_current_token()
+                    self._syntax_error("an expression")
+                continue
+
+            # a term was completed, so the operations that wait for it are written:
+            while pending and pending[-1][0] == "UNARY":
+                self._helper_writes_given_unary_operation(pending.pop()[1])
+            if pending and pending[-1][0] == "BINARY":
+                self._helper_writes_given_binary_operation(pending.pop()[1])
+            if (pending or not is_single_term) and self._is_next_value_in_list(_list_of_binary_operations):
+                # advance and gets the operation:
+                pending.append(["BINARY", self._advance_and_get_value_of_current_token()])
+                is_term_needed = True
+                continue
+
+            # an expression was completed:
+            if not pending:
+                return
+            frame = pending[-1]
+            if frame[0] == "PAREN":
+                pending.pop()
+                # advance and get ')':
+                self._advance_over(")")
+            elif frame[0] == "INDEX":
+                pending.pop()
+                # advance and get "]":
+                self._advance_over("]")
+                self._helper_push_according_symbol_table(frame[1])
+                self._vm_writer.write_arithmetic("ADD")
+                self._helper_compile_identifier_array_and_vars_in_term(frame[1], True)
+            else:
+                frame[2] += 1
+                if self._is_next_value_equals(","):
+                    # advance and gets ',' :
+                    self._jack_tokenizer.advance()
+                    is_term_needed = True
+                else:
+                    self._helper_finish_call_in_term(pending)
+
+    def _helper_is_next_token_an_expression_start(self):
+        """ Function that return an boolean answer on the question:
+              Can the next token start an expression?
+            Returns:
+                boolean: answer to Can the next token start an expression?
+         """
+        # a list of unary operations in the jack language:
+        _list_of_unary_operations = ['-', '~', '^', '#']
+        # a list of constant keywords in the jack language:
+        _list_of_constant_keywords = ['true', 'false', 'null', 'this']
+        return self._is_next_token_type_equals("INT_CONST") or self._is_next_token_type_equals("STRING_CONST") \
+            or self._is_next_token_type_equals("IDENTIFIER") or \
+            (self._is_next_value_in_list(_list_of_unary_operations)) or \
+            (self._is_next_value_in_list(_list_of_constant_keywords)) or \
+            (self._is_next_value_equals('('))
+
+    def _helper_start_identifier_in_term(self, pending: list):
+        """
+        Function that helps compile term in case of identifier in the term.
+        A variable is pushed at once, while an array entry or a subroutine call
+        pushes its frame onto the pending frames of
+        _helper_compile_expression_iteratively.
+            Returns:
+                boolean: is a term needed, because the identifier starts an
+                array index or call arguments?
          """
-        is_array_object = False
         num_of_locals = 0
         current_name = self._advance_and_get_value_of_current_token()
+        if not self._is_next_value_equals("(") and not self._is_next_value_equals("."):
+            self._check_variable_is_defined(current_name)
         if self._is_next_value_equals("["):
-            is_array_object = True
-            self._helper_to_calculate_case_of_array(current_name)
+            # advance and get "[":
+            self._jack_tokenizer.advance()
+            pending.append(["INDEX", current_name])
+            return True
         if self._is_next_value_equals("("):
             num_of_locals += 1
             self._vm_writer.write_push("POINTER", 0)
             # advance and gets "("
             self._jack_tokenizer.advance()
-            num_of_locals += self.compile_expression_list()
-            # advance and gets ")"
+            return self._helper_start_call_in_term(
+                pending, self._current_class_name + "." + current_name, num_of_locals)
+        if self._is_next_value_equals("."):
+            # advance and gets "."
             self._jack_tokenizer.advance()
-            func_name_to_call = self._current_class_name + "." + current_name
-            self._vm_writer.write_call(func_name_to_call, num_of_locals)
-        elif self._is_next_value_equals("."):
-            self._helper_compile_identifier_function_call_in_term(current_name, num_of_locals)
-
-        else:
-            self._helper_compile_identifier_array_and_vars_in_term(current_name, is_array_object)
+            second_part_of_name = self._advance_and_get_value_of_current_token()
+            if current_name in self._symbol_table.current_table or \
+                    current_name in self._symbol_table.class_scope_table:
+                self._helper_push_according_symbol_table(current_name)
+                current_name = \
+                    self._symbol_table.type_of(current_name) + '.' + second_part_of_name
+                num_of_locals += 1
+            else:
+                current_name = current_name + '.' + second_part_of_name
+            # advance and gets "("
+            self._advance_over("(")
+            return self._helper_start_call_in_term(pending, current_name, num_of_locals)
+        self._helper_compile_identifier_array_and_vars_in_term(current_name, False)
+        return False
 
-    def _helper_compile_identifier_function_call_in_term(self, current_name: str, num_of_locals: int):
+    def _helper_start_call_in_term(self, pending: list, function_name: str, num_of_locals: int):
         """
-        Function that helps _helper_compile_identifier_in_term in
-        case of function call in the identifier that in the term
-        it is called only if compile term needs to compile a identifier that
-        contains call to a subroutine.
-        Arguments:
-                str: current_name that represents prt of the identifier
-                int: num_of_locals number represent the num of locals variables
+        Function that helps compile a subroutine call in a term, after its "(".
+        The call waits for its arguments as an "ARGS" frame of the pending
+        frames, and is written by _helper_finish_call_in_term.
+            Returns:
+                boolean: is a term needed, because the call has arguments?
+         """
+        pending.append(["ARGS", function_name, num_of_locals])
+        if self._helper_is_next_token_an_expression_start():
+            return True
+        if self._is_next_value_equals(","):
+            # advance and gets ',' :
+            self._jack_tokenizer.advance()
+            return True
+        self._helper_finish_call_in_term(pending)
+        return False
 
+    def _helper_finish_call_in_term(self, pending: list):
+        """
+        Function that writes the subroutine call of the "ARGS" frame on top of
+        the pending frames, once all its arguments were compiled.
          """
-        # advance and gets "."
-        self._jack_tokenizer.advance()
-        second_part_of_name = self._advance_and_get_value_of_current_token()
-        if current_name in self._symbol_table.current_table or \
-                current_name in self._symbol_table.class_scope_table:
-            self._helper_push_according_symbol_table(current_name)
-            current_name = \
-                self._symbol_table.type_of(current_name) + '.' + second_part_of_name
-            num_of_locals += 1
-        else:
-            current_name = current_name + '.' + second_part_of_name
-        # advance and gets "("
-        self._jack_tokenizer.advance()
-        num_of_locals += self.compile_expression_list()
+        _, function_name, num_of_locals = pending.pop()
         # advance and gets ")"
-        self._jack_tokenizer.advance()
-        self._vm_writer.write_call(current_name, num_of_locals)
+        self._advance_over(")")
+        self._write_call(function_name, num_of_locals)
 
     def _helper_compile_identifier_array_and_vars_in_term(self, current_name: str, is_array_object: bool):
         """
-        Function that helps _helper_compile_identifier_in_term in
+        Function that helps _helper_compile_expression_iteratively in
         case of array or vars in the identifier that in the term
         it is called only if compile term needs to compile a identifier that
         contains array or vars.
@@ -680,9 +947,68 @@ class CompilationEngine:
                 self._vm_writer.write_push("THIS", self._symbol_table.index_of(first_part_of_name))
 
 
+    def _advance_over(self, expected_value: str):
+        """
+        Function that advance the jack_tokenizer over a token that must have the
+        given value, such as the ';' in the end of a statement.
+            Raises:
+                CompilationError: if the token has a different value.
+        """
+        self._jack_tokenizer.advance()
+        if str(self._jack_tokenizer.current_token[1]) != expected_value:
+            self._syntax_error(repr(expected_value))
+
+    def _syntax_error(self, expected: str):
+        """
+        Function that stops the compilation of the class because the current
+        token is not the expected one.
+            Raises:
+                CompilationError: always.
+        """
+        raise CompilationError([Diagnostic(
+            "error", "expected {} but found {!r}".format(expected, self._jack_tokenizer.current_token[1]),
+            self._jack_tokenizer.current_line)])
+
+    def _check_variable_is_defined(self, var_name: str):
+        """
+        Function that records an error if the given variable is not defined in
+        the current scope. The compilation of the class goes on, so every
+        undefined variable is found.
+        """
+        if self._symbol_table.kind_of(var_name) == "NONE":
+            self.diagnostics.append(Diagnostic(
+                "error", "undefined variable {!r}".format(var_name), self._jack_tokenizer.current_line))
+
+    def _write_call(self, name: str, n_args: int) -> None:
+        """Writes a VM call command, or the inline code of an intrinsic, and
+        records the class of the called function as a dependency of the
+        class."""
+        self._subroutine_called_classes.add(name.split(".", 1)[0])
+        if self._intrinsic_rewrites is not None and name in self._intrinsic_rewrites:
+            self._intrinsic_rewrites[name] += 1
+            for command in self.intrinsics_dictionary[name]:
+                if command[0] == "PUSH":
+                    self._vm_writer.write_push(command[1], command[2])
+                elif command[0] == "POP":
+                    self._vm_writer.write_pop(command[1], command[2])
+                else:
+                    self._vm_writer.write_arithmetic(command[0])
+            return
+        self._vm_writer.write_call(name, n_args)
+
+    def _helper_type_classes(self, table: dict) -> set:
+        """
+        Function that finds the class types of the variables of a symbol table.
+            Returns:
+                set: the types of the variables of the table that are classes.
+         """
+        # keyword types, such as "int", are kept as their keyword:
+        return {var_type for var_type, _, _ in table.values()
+                if var_type not in self.keywords_dict and var_type != "self"}
+
     def _close(self) -> None:
-        """Closes the output file."""
-        self._output_file.close()
+        """Writes the remaining VM code and closes the output file."""
+        self._vm_writer.close()
 
     def _is_next_value_in_list(self, list_to_check):
         """ Function that return an boolean answer on the question:
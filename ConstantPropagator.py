@@ -0,0 +1,183 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+from ControlFlowGraph import ControlFlowGraph
+from DataflowAnalysis import ReachingDefinitions
+from VMReport import VMReport
+
+
+class ConstantPropagator:
+    """An optimization that propagates constants and copies across the
+    statements of a function, using its reaching definitions (see
+    ReachingDefinitions).
+
+    - A push of a variable whose every reaching definition writes the same
+      constant pushes the constant instead, and arithmetic on constants is
+      folded into a single constant.
+    - A push of a variable that is a copy of another variable, such as p
+      after "let p = q;", pushes the other variable instead, as long as
+      neither was written since, and pushing it costs no more.
+    - A local that is written but not read before it is written again or
+      the function returns is not written at all, if its value is a
+      constant or a variable, so the copies and constants whose uses were
+      replaced are removed.
+
+    Statics and fields are only propagated until a call or a write through
+    "that" may change them. For every function, the pass counts the loads it
+    eliminated: the pushes of variables that it removed or replaced by
+    constants.
+    """
+    # the name, representation and dependencies of the pass (see PassManager).
+    # The counters of unrolled loops are constants in every copy of the body:
+    name = "propagate"
+    representation = "ir"
+    depends_on = ("cse", "licm", "unroll")
+
+    def __init__(self) -> None:
+        """Creates a new optimization."""
+        # maps the name of every optimized function that has eliminated
+        # loads to their number:
+        self.eliminated_loads = {}
+
+    def run(self, commands: list) -> list:
+        """
+        Args:
+            commands (list): the commands of a single function, starting with
+            its "function" command.
+
+        Returns:
+            list: the commands of the function, with constants and copies
+            propagated.
+        """
+        new_commands = self._eliminate_dead_stores(self._propagate(commands))
+        eliminated_loads = self._count_loads(commands) - self._count_loads(new_commands)
+        if eliminated_loads:
+            self.eliminated_loads[commands[0][1]] = eliminated_loads
+        return new_commands
+
+    @staticmethod
+    def constant_commands(value: int) -> list:
+        """
+        Args:
+            value (int): a 16-bit constant, from -32768 to 32767.
+
+        Returns:
+            list: the commands that push the constant.
+        """
+        if value >= 0:
+            return [("push", "constant", value)]
+        if value == -0x8000:
+            return [("push", "constant", 0x7fff), ("not",)]
+        return [("push", "constant", -value), ("neg",)]
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    @staticmethod
+    def _count_loads(commands: list) -> int:
+        """
+        Returns:
+            int: the number of pushes of anything but a constant.
+        """
+        return sum(command[0] == "push" and command[1] != "constant" for command in commands)
+
+    def _propagate(self, commands: list) -> list:
+        """
+        Returns:
+            list: the commands of the function, with the pushes of constant
+            and copied variables replaced, and arithmetic on constants
+            folded.
+        """
+        analysis = ReachingDefinitions(commands)
+        new_commands = commands[:1]
+        for block_index, (start, end) in enumerate(analysis.graph.blocks):
+            state = analysis.block_in[block_index]
+            if state is None:
+                new_commands.extend(commands[start:end])
+                continue
+            state = dict(state)
+            stack = []
+            # for every value on the stack, the index in new_commands its
+            # commands start at, if they only compute constants:
+            constant_starts = []
+            for index in range(start, end):
+                command = commands[index]
+                analysis.step(state, stack, index)
+                if command[0] == "push":
+                    value = stack[-1]
+                    replacement = [command]
+                    if value is not None and value[0] == "constant":
+                        replacement = self.constant_commands(value[1])
+                    elif value is not None and value[1] != (command[1], int(command[2])):
+                        replacement = [("push",) + value[1]]
+                    if VMReport.estimate_hack_cost(replacement) <= VMReport.command_cost(command):
+                        command = replacement
+                    else:
+                        command = [command]
+                    constant_starts.append(len(new_commands) if command[0][1] == "constant" else None)
+                    new_commands.extend(command)
+                    continue
+                n_operands = 1 if command[0] in ("neg", "not") else 2
+                if command[0] in analysis.operations_dictionary:
+                    operand_starts = constant_starts[-n_operands:]
+                    del constant_starts[-n_operands:]
+                    if len(operand_starts) == n_operands and None not in operand_starts:
+                        # the operands only compute constants, so the result
+                        # replaces them:
+                        del new_commands[operand_starts[0]:]
+                        constant_starts.append(len(new_commands))
+                        new_commands.extend(self.constant_commands(stack[-1][1]))
+                        continue
+                    constant_starts.append(None)
+                elif command[0] == "pop" or command[0] in ("if-goto", "return"):
+                    del constant_starts[-1:]
+                elif command[0] == "call":
+                    del constant_starts[max(len(constant_starts) - int(command[2]), 0):]
+                    constant_starts.append(None)
+                new_commands.append(command)
+        return new_commands
+
+    def _eliminate_dead_stores(self, commands: list) -> list:
+        """
+        Returns:
+            list: the commands of the function, without the writes of locals
+            that are not read later, and the pushes of the values they write,
+            if those are constants or variables.
+        """
+        while True:
+            graph = ControlFlowGraph(commands)
+            _, live_out = graph.live_locals()
+            dead = set()
+            for block_index, (start, end) in enumerate(graph.blocks):
+                live = set(live_out[block_index])
+                for index in range(end - 1, start - 1, -1):
+                    command = commands[index]
+                    if command[:2] == ("pop", "local"):
+                        value_length = self._simple_value_length(commands, index, start)
+                        if command[2] not in live and value_length:
+                            dead.update(range(index - value_length, index + 1))
+                        live.discard(command[2])
+                    elif command[:2] == ("push", "local"):
+                        live.add(command[2])
+            if not dead:
+                return commands
+            commands = [command for index, command in enumerate(commands) if index not in dead]
+
+    @staticmethod
+    def _simple_value_length(commands: list, index: int, start: int) -> int:
+        """
+        Returns:
+            int: the number of commands of the block before the given index
+            that push a single constant or variable, or 0 if they do not.
+        """
+        if index - 1 < start:
+            return 0
+        previous = commands[index - 1]
+        if previous[0] == "push" and previous[1] not in ("that", "pointer", "temp"):
+            return 1
+        if previous in (("neg",), ("not",)) and index - 2 >= start and commands[index - 2][:2] == ("push", "constant"):
+            return 2
+        return 0
@@ -0,0 +1,130 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+
+
+class ControlFlowGraph:
+    """Splits the commands of a single VM function into basic blocks and
+    connects them by the possible flow of control.
+
+    A basic block is a range of commands that is always executed from its
+    first command to its last one. Blocks start at the first command after
+    "function", at every "label" and after every "goto", "if-goto" and
+    "return".
+    """
+
+    def __init__(self, commands: list) -> None:
+        """Builds the graph of the given function.
+
+        Args:
+            commands (list): the commands of a single function, starting
+            with its "function" command.
+        """
+        self.commands = commands
+        # a list of (start, end) ranges of commands, one for every block:
+        self.blocks = []
+        # maps every label to the index of the block it starts:
+        self.label_blocks = {}
+        self._init_blocks()
+        # the indices of the blocks control may flow to from every block:
+        self.successors = [self._find_successors(index) for index in range(len(self.blocks))]
+        self.predecessors = [[] for _ in self.blocks]
+        for index, successors in enumerate(self.successors):
+            for successor in successors:
+                self.predecessors[successor].append(index)
+
+    def block_commands(self, block_index: int) -> list:
+        """
+        Args:
+            block_index (int): index of a block.
+
+        Returns:
+            list: the commands of the block.
+        """
+        start, end = self.blocks[block_index]
+        return self.commands[start:end]
+
+    def live_locals(self) -> tuple:
+        """Computes which "local" slots are live, meaning they hold a value
+        that may be read later, at the start and the end of every block.
+
+        Returns:
+            tuple: (live_in, live_out), two lists of sets of local indices, one
+            set for every block.
+        """
+        uses = []
+        definitions = []
+        for start, end in self.blocks:
+            block_uses = set()
+            block_definitions = set()
+            for command in self.commands[start:end]:
+                if len(command) == 3 and command[1] == "local":
+                    if command[0] == "push" and command[2] not in block_definitions:
+                        block_uses.add(command[2])
+                    elif command[0] == "pop":
+                        block_definitions.add(command[2])
+            uses.append(block_uses)
+            definitions.append(block_definitions)
+
+        live_in = [set() for _ in self.blocks]
+        live_out = [set() for _ in self.blocks]
+        worklist = list(range(len(self.blocks)))
+        in_worklist = set(worklist)
+        while worklist:
+            index = worklist.pop()
+            in_worklist.discard(index)
+            new_live_out = set()
+            for successor in self.successors[index]:
+                new_live_out |= live_in[successor]
+            new_live_in = uses[index] | (new_live_out - definitions[index])
+            live_out[index] = new_live_out
+            if new_live_in != live_in[index]:
+                live_in[index] = new_live_in
+                for predecessor in self.predecessors[index]:
+                    if predecessor not in in_worklist:
+                        worklist.append(predecessor)
+                        in_worklist.add(predecessor)
+        return live_in, live_out
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    def _init_blocks(self):
+        """
+        init the blocks list and the label_blocks dictionary
+        Returns:
+           Nothing- just init this.blocks and this.label_blocks
+        """
+        start = 1
+        for index in range(1, len(self.commands)):
+            command_word = self.commands[index][0]
+            if command_word == "label" and index > start:
+                self.blocks.append((start, index))
+                start = index
+            if command_word == "label":
+                self.label_blocks[self.commands[index][1]] = len(self.blocks)
+            elif command_word in ("goto", "if-goto", "return"):
+                self.blocks.append((start, index + 1))
+                start = index + 1
+        if start < len(self.commands):
+            self.blocks.append((start, len(self.commands)))
+
+    def _find_successors(self, block_index: int) -> list:
+        """
+        Args:
+            block_index (int): index of a block.
+
+        Returns:
+            list: the indices of the blocks control may flow to from the block.
+        """
+        start, end = self.blocks[block_index]
+        last_command = self.commands[end - 1]
+        successors = []
+        if last_command[0] in ("goto", "if-goto") and last_command[1] in self.label_blocks:
+            successors.append(self.label_blocks[last_command[1]])
+        if last_command[0] not in ("goto", "return") and block_index + 1 < len(self.blocks):
+            successors.append(block_index + 1)
+        return successors
@@ -0,0 +1,293 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from ControlFlowGraph import ControlFlowGraph
+
+
+class DataflowAnalysis:
+    """A forward dataflow analysis of a single VM function, solved over the
+    blocks of its ControlFlowGraph with a worklist.
+
+    A subclass gives the state at the entry of the function, how the states
+    of the predecessors of a block merge, and how a block changes a state.
+    The state at the start of every block is in block_in and the state at
+    its end is in block_out. Blocks that cannot be reached keep None.
+    """
+
+    def __init__(self, commands: list) -> None:
+        """Analyzes a function.
+
+        Args:
+            commands (list): the commands of a single function, starting
+            with its "function" command.
+        """
+        self.commands = commands
+        self.graph = ControlFlowGraph(commands)
+        self.block_in = [None] * len(self.graph.blocks)
+        self.block_out = [None] * len(self.graph.blocks)
+        self._solve()
+
+    def entry_state(self) -> object:
+        """
+        Returns:
+            object: the state at the entry of the function.
+        """
+        raise NotImplementedError
+
+    def merge(self, states: list) -> object:
+        """
+        Args:
+            states (list): the states at the end of the predecessors of a
+            block that were reached, and the entry state for the first block.
+
+        Returns:
+            object: the state at the start of the block.
+        """
+        raise NotImplementedError
+
+    def transfer(self, state: object, start: int, end: int) -> object:
+        """
+        Args:
+            state (object): the state at the start of a block.
+            start (int): the index of the first command of the block.
+            end (int): the index after the last command of the block.
+
+        Returns:
+            object: the state at the end of the block, without changing the
+            given state.
+        """
+        raise NotImplementedError
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    def _solve(self):
+        """computes block_in and block_out, until they do not change"""
+        if not self.graph.blocks:
+            return
+        worklist = [0]
+        in_worklist = {0}
+        while worklist:
+            index = worklist.pop()
+            in_worklist.discard(index)
+            states = [self.block_out[predecessor] for predecessor in self.graph.predecessors[index]
+                      if self.block_out[predecessor] is not None]
+            if index == 0:
+                states.append(self.entry_state())
+            state = self.merge(states)
+            if state == self.block_in[index] and self.block_out[index] is not None:
+                continue
+            self.block_in[index] = state
+            start, end = self.graph.blocks[index]
+            out_state = self.transfer(state, start, end)
+            if out_state == self.block_out[index]:
+                continue
+            self.block_out[index] = out_state
+            for successor in self.graph.successors[index]:
+                if successor not in in_worklist:
+                    worklist.append(successor)
+                    in_worklist.add(successor)
+
+
+class ReachingDefinitions(DataflowAnalysis):
+    """The definitions of every variable that may reach every command of a
+    function, with the constant lattice value of every definition.
+
+    The variables are locals, arguments, statics and the fields of "this".
+    A definition is a (index, value) pair: the index of the "pop" command
+    that writes the variable, or 0 for its value at the entry of the
+    function, and the value it writes:
+
+    - ("constant", c): a known 16-bit constant. Locals are 0 at the entry.
+    - ("copy", variable, sites): the value of another variable, as long as
+      the definitions of that variable that reach a use are still the ones
+      at the given frozenset of indices. Only the indices are kept, so the
+      values do not nest and the analysis ends in loops that copy back and
+      forth.
+    - None: an unknown value.
+
+    The state maps every variable to the frozenset of its definitions that
+    may reach a command. Statics and fields are memory that other code can
+    change: a call or a write through "that" may change all of them, and
+    setting "pointer 0" changes every field, so then they are left out of
+    the state, and their value is unknown until they are written again.
+    """
+    # the segments of the variables of the analysis:
+    variable_segments = ("local", "argument", "static", "this")
+
+    # the segments of the variables other code may change:
+    memory_segments = ("static", "this")
+
+    # the 16-bit results of the VM commands on constants:
+    operations_dictionary = {
+        "add": lambda first, second: first + second,
+        "sub": lambda first, second: first - second,
+        "and": lambda first, second: first & second,
+        "or": lambda first, second: first | second,
+        "eq": lambda first, second: -1 if first == second else 0,
+        # the VM compares by the sign of the 16-bit difference:
+        "gt": lambda first, second: -1 if ReachingDefinitions.to_word(first - second) > 0 else 0,
+        "lt": lambda first, second: -1 if ReachingDefinitions.to_word(first - second) < 0 else 0,
+        "neg": lambda operand: -operand,
+        "not": lambda operand: ~operand
+    }
+
+    def entry_state(self) -> dict:
+        """
+        Returns:
+            dict: every local is defined as 0 at the entry.
+        """
+        return {("local", index): frozenset({(0, ("constant", 0))}) for index in range(self.commands[0][2])}
+
+    def merge(self, states: list) -> dict:
+        """
+        Returns:
+            dict: every definition that may reach the block through any of
+            the states. A memory variable that some state left out is left
+            out, since its value is unknown on that path.
+        """
+        merged = {}
+        for variable in set().union(*states):
+            definitions = set()
+            for state in states:
+                state_definitions = self.definitions(state, variable)
+                if state_definitions is None:
+                    break
+                definitions |= state_definitions
+            else:
+                merged[variable] = frozenset(definitions)
+        return merged
+
+    def transfer(self, state: dict, start: int, end: int) -> dict:
+        """
+        Returns:
+            dict: the definitions that reach the end of the block.
+        """
+        state = dict(state)
+        stack = []
+        for index in range(start, end):
+            self.step(state, stack, index)
+        return state
+
+    @staticmethod
+    def to_word(value: int) -> int:
+        """
+        Returns:
+            int: the value as a 16-bit two's complement word.
+        """
+        return (value + 0x8000) % 0x10000 - 0x8000
+
+    @staticmethod
+    def definitions(state: dict, variable: tuple) -> typing.Optional[frozenset]:
+        """
+        Args:
+            state (dict): a state of the analysis.
+            variable (tuple): a (segment, index) variable.
+
+        Returns:
+            frozenset: the definitions of the variable in the state, or None
+            if its value is unknown. An argument that is not in the state has
+            its value from the entry.
+        """
+        if variable in state:
+            return state[variable]
+        if variable[0] == "argument":
+            return frozenset({(0, None)})
+        return None
+
+    def value(self, state: dict, variable: tuple) -> typing.Optional[tuple]:
+        """
+        Args:
+            state (dict): a state of the analysis.
+            variable (tuple): a (segment, index) variable.
+
+        Returns:
+            tuple: the value of the variable in the state: a constant, or a
+            copy of the variable that holds it, or of the variable itself if
+            it is not a copy. None if it is unknown.
+        """
+        definitions = self.definitions(state, variable)
+        if definitions is None:
+            return None
+        values = {definition[1] for definition in definitions}
+        if len(values) == 1:
+            value = values.pop()
+            if value is not None and value[0] == "constant":
+                return value
+            if value is not None and self._sites(self.definitions(state, value[1])) == value[2]:
+                return value
+        return "copy", variable, self._sites(definitions)
+
+    def step(self, state: dict, stack: list, index: int) -> None:
+        """Runs a single command on a state and a stack of values.
+
+        Args:
+            state (dict): the state before the command, which is changed to
+            the state after it.
+            stack (list): the values the block pushed, which is changed like
+            the command changes the stack. An empty stack pops None.
+            index (int): the index of the command.
+        """
+        command = self.commands[index]
+        command_word = command[0]
+        if command_word == "push":
+            if command[1] == "constant":
+                stack.append(("constant", int(command[2])))
+            elif command[1] in self.variable_segments:
+                stack.append(self.value(state, (command[1], int(command[2]))))
+            else:
+                stack.append(None)
+        elif command_word == "pop":
+            value = stack.pop() if stack else None
+            variable = (command[1], int(command[2]))
+            if command[1] in self.variable_segments:
+                state[variable] = frozenset({(index, value)})
+            elif command[1] == "that":
+                self._clobber(state, self.memory_segments)
+            elif variable == ("pointer", 0):
+                self._clobber(state, ("this",))
+        elif command_word in ("neg", "not"):
+            operand = stack.pop() if stack else None
+            stack.append(self._fold(command_word, [operand]))
+        elif command_word in self.operations_dictionary:
+            second = stack.pop() if stack else None
+            first = stack.pop() if stack else None
+            stack.append(self._fold(command_word, [first, second]))
+        elif command_word == "call":
+            del stack[max(len(stack) - int(command[2]), 0):]
+            stack.append(None)
+            self._clobber(state, self.memory_segments)
+        elif command_word in ("if-goto", "return") and stack:
+            stack.pop()
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    def _fold(self, command_word: str, operands: list) -> typing.Optional[tuple]:
+        """
+        Returns:
+            tuple: the constant result of the command, or None if an operand
+            is not a constant.
+        """
+        if any(operand is None or operand[0] != "constant" for operand in operands):
+            return None
+        return "constant", self.to_word(self.operations_dictionary[command_word](
+            *(operand[1] for operand in operands)))
+
+    @staticmethod
+    def _sites(definitions: typing.Optional[frozenset]) -> typing.Optional[frozenset]:
+        """
+        Returns:
+            frozenset: the indices of the given definitions.
+        """
+        return None if definitions is None else frozenset(index for index, _ in definitions)
+
+    @staticmethod
+    def _clobber(state: dict, segments: tuple):
+        """leaves the variables of the given segments out of the state"""
+        for variable in [variable for variable in state if variable[0] in segments]:
+            del state[variable]
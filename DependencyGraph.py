@@ -0,0 +1,172 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import json
+import os
+import sys
+from OutputFile import OutputFile
+
+
+class DependencyGraph:
+    """The classes every class of a project depends on: the classes whose
+    functions it calls, and the classes that are the types of its variables.
+
+    The graph is built during compilation, and saved as JSON that maps the
+    name of every class to its "calls", "types" and "dependents" (the
+    classes that depend on it). For make, the dependencies of a single class
+    are written as a .d file (see make_rule).
+    """
+
+    def __init__(self) -> None:
+        """Creates a new empty graph."""
+        # maps the name of every class to its (called classes, type classes):
+        self._dependencies = {}
+
+    @classmethod
+    def load(cls, path: str) -> "DependencyGraph":
+        """
+        Args:
+            path (str): path of a JSON dependency graph.
+
+        Returns:
+            DependencyGraph: the graph saved in the file, or an empty graph if
+            there is no such file.
+        """
+        graph = cls()
+        try:
+            with open(path, 'r') as graph_file:
+                saved = json.load(graph_file)
+        except FileNotFoundError:
+            return graph
+        for class_name, entry in saved.items():
+            graph._dependencies[class_name] = (set(entry["calls"]), set(entry["types"]))
+        return graph
+
+    def save(self, path: str) -> None:
+        """Writes the graph as JSON, only replacing the file if it changed.
+
+        Args:
+            path (str): path of the JSON file.
+        """
+        with OutputFile(path) as graph_file:
+            json.dump(self.to_dict(), graph_file, indent=2, sort_keys=True)
+            graph_file.write("\n")
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            dict: maps the name of every class to its sorted "calls", "types"
+            and "dependents".
+        """
+        return {class_name: {"calls": sorted(calls), "types": sorted(types),
+                             "dependents": self.dependents(class_name)}
+                for class_name, (calls, types) in self._dependencies.items()}
+
+    def class_names(self) -> list:
+        """
+        Returns:
+            list: the names of all the classes in the graph.
+        """
+        return sorted(self._dependencies)
+
+    def update(self, class_name: str, calls: set, types: set) -> None:
+        """Sets the dependencies of a class.
+
+        Args:
+            class_name (str): name of the class.
+            calls (set): the classes whose functions it calls.
+            types (set): the classes that are the types of its variables.
+        """
+        self._dependencies[class_name] = (set(calls), set(types))
+
+    def merge(self, other: "DependencyGraph") -> None:
+        """Sets the dependencies of the classes of another graph, such as of
+        one a class was compiled into in a worker process.
+
+        Args:
+            other (DependencyGraph): the graph to take the classes of.
+        """
+        for class_name, (calls, types) in other._dependencies.items():
+            self.update(class_name, calls, types)
+
+    def remove(self, class_name: str) -> None:
+        """Removes a class from the graph, if it is there.
+
+        Args:
+            class_name (str): name of the class.
+        """
+        self._dependencies.pop(class_name, None)
+
+    def dependencies(self, class_name: str) -> list:
+        """
+        Args:
+            class_name (str): name of a class in the graph.
+
+        Returns:
+            list: the sorted names of the classes the class depends on.
+        """
+        calls, types = self._dependencies[class_name]
+        return sorted(calls | types)
+
+    def dependents(self, class_name: str) -> list:
+        """
+        Args:
+            class_name (str): name of a class.
+
+        Returns:
+            list: the sorted names of the classes of the graph that depend on
+            the class directly.
+        """
+        return sorted(name for name, (calls, types) in self._dependencies.items()
+                      if class_name in calls or class_name in types)
+
+    def affected(self, class_names: set) -> set:
+        """
+        Args:
+            class_names (set): names of classes that changed.
+
+        Returns:
+            set: the changed classes and every class of the graph that depends
+            on them, directly or through other classes.
+        """
+        affected = set(class_names)
+        to_visit = list(class_names)
+        while to_visit:
+            for dependent in self.dependents(to_visit.pop()):
+                if dependent not in affected:
+                    affected.add(dependent)
+                    to_visit.append(dependent)
+        return affected
+
+    def make_rule(self, class_name: str, target: str, directory: str) -> str:
+        """
+        Args:
+            class_name (str): name of a class in the graph.
+            target (str): the output file of the class, such as "Main.vm".
+            directory (str): the directory of the .jack files of the project.
+
+        Returns:
+            str: a make rule that makes the target and the .d file depend on
+            the .jack file of the class and of every class it depends on that
+            has a .jack file in the directory. Like "gcc -MP", every
+            dependency also gets an empty rule, so deleting a class does not
+            break the build.
+        """
+        prerequisites = [os.path.join(directory, name + ".jack")
+                         for name in [class_name] + self.dependencies(class_name)]
+        prerequisites = [prerequisites[0]] + [path for path in prerequisites[1:] if os.path.exists(path)]
+        dependency_path = os.path.splitext(target)[0] + ".d"
+        lines = ["{} {}: {}\n".format(target, dependency_path, " ".join(prerequisites))]
+        lines += ["\n{}:\n".format(path) for path in prerequisites[1:]]
+        return "".join(lines)
+
+
+if "__main__" == __name__:
+    # Prints the classes that are affected by a change to the given classes.
+    if len(sys.argv) < 3:
+        sys.exit("Invalid usage, please use: DependencyGraph <graph file> <class name> ...")
+    dependency_graph = DependencyGraph.load(sys.argv[1])
+    print("\n".join(sorted(dependency_graph.affected(set(sys.argv[2:])))))
@@ -0,0 +1,66 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+
+class Diagnostic:
+    """A problem the compiler found in a Jack class, such as a syntax error or
+    an undefined variable, with the line it was found in.
+    """
+
+    def __init__(self, severity: str, message: str, line: int,
+                 source: typing.Optional[str] = None) -> None:
+        """Creates a new diagnostic.
+
+        Args:
+            severity (str): "error" or "warning".
+            message (str): describes the problem.
+            line (int): the line of the problem, counted from 1.
+            source (str): the name of the compiled class or file, if known.
+        """
+        self.severity = severity
+        self.message = message
+        self.line = line
+        self.source = source
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            dict: the diagnostic as a dictionary that can be written as JSON.
+        """
+        return {"severity": self.severity, "message": self.message,
+                "line": self.line, "source": self.source}
+
+    def __str__(self) -> str:
+        """
+        Returns:
+            str: the diagnostic in the "source:line: severity: message" format
+            of other compilers.
+        """
+        source = "<source>" if self.source is None else self.source
+        return "{}:{}: {}: {}".format(source, self.line, self.severity, self.message)
+
+
+class CompilationError(Exception):
+    """Raised when a Jack class has errors. Holds every diagnostic found in
+    the class, including the warnings.
+    """
+
+    def __init__(self, diagnostics: list) -> None:
+        """
+        Args:
+            diagnostics (list): the diagnostics of the class.
+        """
+        super().__init__("\n".join(str(diagnostic) for diagnostic in diagnostics))
+        self.diagnostics = diagnostics
+
+    def errors(self) -> list:
+        """
+        Returns:
+            list: the diagnostics that are errors.
+        """
+        return [diagnostic for diagnostic in self.diagnostics if diagnostic.severity == "error"]
@@ -0,0 +1,162 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+import typing
+
+
+class DirectoryWatcher:
+    """Reports which files of a directory with a given extension were
+    written, created, moved or deleted.
+
+    On Linux the changes are reported by inotify, which is called through
+    ctypes, so no package has to be installed. Elsewhere, or if inotify
+    cannot be used, the directory is polled and files whose modification
+    time or size changed are reported.
+    """
+    # the inotify events of files that were written or replaced, such as by
+    # an editor that saves to a temporary file and renames it, or removed:
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    watched_events = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    # the fixed part of an inotify event: wd, mask, cookie and name length:
+    event_header = struct.Struct("iIII")
+
+    def __init__(self, directory: str, extension: str, poll_interval: float = 0.5) -> None:
+        """Starts watching the directory.
+
+        Args:
+            directory (str): the directory to watch.
+            extension (str): only files with this extension are reported,
+            such as ".jack".
+            poll_interval (float): the seconds between two scans of the
+            directory, when it is polled.
+        """
+        self.directory = directory
+        self.extension = extension
+        self.poll_interval = poll_interval
+        self._inotify_fd = self._start_inotify()
+        # the (modification time, size) of every file, when polling:
+        self._snapshot = self._scan() if self._inotify_fd is None else {}
+
+    def uses_inotify(self) -> bool:
+        """
+        Returns:
+            bool: are changes reported by inotify, rather than by polling?
+        """
+        return self._inotify_fd is not None
+
+    def wait_for_changes(self, timeout: typing.Optional[float] = None) -> set:
+        """Waits until files change.
+
+        Args:
+            timeout (float): the maximal number of seconds to wait, or None to
+            wait until a file changes.
+
+        Returns:
+            set: the names of the files that changed, which is empty if none
+            changed before the timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if self._inotify_fd is not None:
+                changed = self._read_inotify(remaining)
+            else:
+                changed = self._poll(remaining)
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self) -> None:
+        """Stops watching the directory."""
+        if self._inotify_fd is not None:
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    def _start_inotify(self) -> typing.Optional[int]:
+        """
+        Returns:
+            int: the file descriptor of an inotify instance that watches the
+            directory, or None if inotify cannot be used.
+        """
+        if not hasattr(select, "poll"):
+            return None
+        library_name = ctypes.util.find_library("c")
+        if library_name is None:
+            return None
+        try:
+            libc = ctypes.CDLL(library_name, use_errno=True)
+            inotify_init = libc.inotify_init
+            inotify_add_watch = libc.inotify_add_watch
+        except (OSError, AttributeError):
+            return None
+        inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        fd = inotify_init()
+        if fd < 0:
+            return None
+        if inotify_add_watch(fd, os.fsencode(self.directory), self.watched_events) < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def _read_inotify(self, timeout: typing.Optional[float]) -> set:
+        """
+        Returns:
+            set: the names of the files inotify reported within the timeout.
+        """
+        poller = select.poll()
+        poller.register(self._inotify_fd, select.POLLIN)
+        if not poller.poll(None if timeout is None else int(timeout * 1000)):
+            return set()
+        data = os.read(self._inotify_fd, 64 * 1024)
+        changed = set()
+        position = 0
+        while position < len(data):
+            _, _, _, name_length = self.event_header.unpack_from(data, position)
+            position += self.event_header.size
+            name = os.fsdecode(data[position:position + name_length].rstrip(b"\0"))
+            position += name_length
+            if name.endswith(self.extension):
+                changed.add(name)
+        return changed
+
+    def _scan(self) -> dict:
+        """
+        Returns:
+            dict: maps the name of every watched file to its (modification
+            time, size).
+        """
+        snapshot = {}
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.extension) and entry.is_file():
+                status = entry.stat()
+                snapshot[entry.name] = (status.st_mtime_ns, status.st_size)
+        return snapshot
+
+    def _poll(self, timeout: typing.Optional[float]) -> set:
+        """
+        Returns:
+            set: the names of the files that changed since the last scan,
+            after waiting a poll interval (or the timeout, if shorter).
+        """
+        time.sleep(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+        snapshot = self._scan()
+        changed = {name for name in snapshot.keys() | self._snapshot.keys()
+                   if snapshot.get(name) != self._snapshot.get(name)}
+        self._snapshot = snapshot
+        return changed
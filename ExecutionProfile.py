@@ -0,0 +1,286 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import json
+import re
+import typing
+from ControlFlowGraph import ControlFlowGraph
+from VMParser import VMParser
+from VMReport import VMReport
+
+
+class ExecutionProfile:
+    """The execution counts of runs of a program: how many times every
+    function was called, and how many times every "if-goto" of every
+    function jumped and did not jump.
+
+    A profile is saved as JSON, such as:
+
+        {
+          "functions": {
+            "Main.main": {"calls": 1, "branches": {"WHILE_FINISHED_LABEL0": [1, 100]}},
+            "Main.max": {"calls": 100, "branches": {"IF_TRUE_LABEL0": [30, 70]}}
+          }
+        }
+
+    where every branch is named by the label its "if-goto" jumps to, and
+    counts [jumped, did not jump]. A function with no "branches" has none.
+    VMEmulator records profiles (see VMEmulator.py --profile), and any other
+    tool may write the same format. Labels are the ones of the .vm files the
+    profile was recorded from, so it is recorded from a build without a
+    profile: the compiler names labels the same in every build, and looks up
+    the labels of inlined functions, of unrolled loops and of branches that
+    were turned around by the labels they were made from.
+    """
+    # the number of runs from which a call site or the body of a loop is hot:
+    hot_count = 64
+
+    # the labels of functions inlined into a call site, such as
+    # "Main.max.3:IF_TRUE_LABEL0" (see ProfileGuidedInliner). The name of a
+    # subroutine starts with a letter or "_", unlike the number of a copy
+    # of an unrolled loop:
+    inlined_label_pattern = re.compile(r"^([A-Za-z_]\w*\.[A-Za-z_]\w*)\.[0-9]+:(.+)$")
+
+    # the labels of the copies of an unrolled loop, such as "IF_TRUE_LABEL0.3"
+    # (see LoopUnroller):
+    copy_label_pattern = re.compile(r"^(.*)\.[0-9]+$")
+
+    # the labels partially unrolled loops end at, such as
+    # "WHILE_FINISHED_LABEL0:4" for a loop that tests its condition every 4
+    # iterations (see LoopUnroller):
+    unrolled_label_pattern = re.compile(r"^(.*):([0-9]+)$")
+
+    # the suffix of a label an "if-goto" jumps to exactly when the "if-goto"
+    # of the label without it would not (see BlockLayout):
+    negated_suffix = "_NOT"
+
+    def __init__(self) -> None:
+        """Creates an empty profile."""
+        # maps the name of every function to its number of calls:
+        self.calls = {}
+        # maps the name of every function to a dict that maps every label it
+        # branches to, to a [jumped, did not jump] list:
+        self.branches = {}
+
+    @classmethod
+    def load(cls, path: str) -> "ExecutionProfile":
+        """
+        Args:
+            path (str): path of a JSON profile.
+
+        Returns:
+            ExecutionProfile: the profile saved in the file.
+
+        Raises:
+            ValueError: if the file is not a profile.
+        """
+        with open(path, 'r') as profile_file:
+            saved = json.load(profile_file)
+        profile = cls()
+        try:
+            for function_name, entry in saved["functions"].items():
+                profile.calls[function_name] = int(entry.get("calls", 0))
+                profile.branches[function_name] = {
+                    label: [int(jumped), int(not_jumped)]
+                    for label, (jumped, not_jumped) in entry.get("branches", {}).items()}
+        except (AttributeError, KeyError, TypeError, ValueError):
+            raise ValueError("{} is not an execution profile".format(path))
+        return profile
+
+    def save(self, path: str) -> None:
+        """
+        Args:
+            path (str): path of the JSON file to write the profile to.
+        """
+        with open(path, 'w') as profile_file:
+            json.dump(self.to_dict(), profile_file, indent=2, sort_keys=True)
+            profile_file.write("\n")
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            dict: the profile, as it is saved.
+        """
+        functions = {}
+        for function_name in set(self.calls) | set(self.branches):
+            functions[function_name] = {"calls": self.calls.get(function_name, 0)}
+            if self.branches.get(function_name):
+                functions[function_name]["branches"] = self.branches[function_name]
+        return {"functions": functions}
+
+    def merge(self, other: "ExecutionProfile") -> None:
+        """Adds the counts of another profile, such as of another run.
+
+        Args:
+            other (ExecutionProfile): the profile to add.
+        """
+        for function_name, n_calls in other.calls.items():
+            self.calls[function_name] = self.calls.get(function_name, 0) + n_calls
+        for function_name, branches in other.branches.items():
+            for label, (jumped, not_jumped) in branches.items():
+                counts = self.branches.setdefault(function_name, {}).setdefault(label, [0, 0])
+                counts[0] += jumped
+                counts[1] += not_jumped
+
+    def record_call(self, function_name: str) -> None:
+        """Counts a call of a function."""
+        self.calls[function_name] = self.calls.get(function_name, 0) + 1
+
+    def record_branch(self, function_name: str, label: str, jumped: bool) -> None:
+        """Counts a single run of an "if-goto" of a function."""
+        counts = self.branches.setdefault(function_name, {}).setdefault(label, [0, 0])
+        counts[0 if jumped else 1] += 1
+
+    def branch(self, function_name: str, label: str) -> typing.Optional[tuple]:
+        """
+        Args:
+            function_name (str): name of a function.
+            label (str): the label an "if-goto" of the function jumps to. The
+            labels of an inlined function ("Callee.site:label", see
+            ProfileGuidedInliner), of unrolled loops and of negated branches
+            are looked up by the labels they were made from.
+
+        Returns:
+            tuple: (jumped, not jumped), the number of times the "if-goto"
+            jumped and did not jump, or None if the profile does not have it.
+        """
+        counts = self.branches.get(function_name, {}).get(label)
+        if counts is not None:
+            return tuple(counts)
+        match = self.inlined_label_pattern.match(label)
+        if match is not None:
+            return self.branch(match.group(1), match.group(2))
+        if label.endswith(self.negated_suffix):
+            counts = self.branch(function_name, label[:-len(self.negated_suffix)])
+            return None if counts is None else counts[::-1]
+        match = self.unrolled_label_pattern.match(label)
+        if match is not None:
+            counts = self.branch(function_name, match.group(1))
+            return None if counts is None else (counts[0], counts[1] / int(match.group(2)))
+        match = self.copy_label_pattern.match(label)
+        if match is not None:
+            return self.branch(function_name, match.group(1))
+        return None
+
+    def block_frequencies(self, commands: list) -> list:
+        """Estimates how many times every block of a function runs in a
+        single call of the function, by the chances of its branches.
+
+        Args:
+            commands (list): the commands of a single function, starting
+            with its "function" command.
+
+        Returns:
+            list: the estimated number of runs of every block of the
+            function's ControlFlowGraph, in a single call. Branches the
+            profile does not have are taken as even chances.
+        """
+        graph = ControlFlowGraph(commands)
+        # the equation of every block: its runs, minus the runs of every
+        # predecessor times the chance it continues to the block, are 1 for
+        # the first block and 0 for the others:
+        rows = [{index: 1.0} for index in range(len(graph.blocks))]
+        values = [0.0] * len(graph.blocks)
+        if values:
+            values[0] = 1.0
+        for index in range(len(graph.blocks)):
+            for successor, chance in self._successor_chances(graph, commands[0][1], index):
+                rows[successor][index] = rows[successor].get(index, 0.0) - chance
+        return self._solve(rows, values)
+
+    def estimate_cost(self, commands: list, removed_calls: dict = None) -> float:
+        """Estimates the Hack instructions the given functions run in all the
+        profiled runs, counting every function as called as many times as
+        in the profile.
+
+        Args:
+            commands (list): the commands of the functions of a program.
+            removed_calls (dict): maps the name of a function to the number
+            of its profiled calls the program no longer makes, since they
+            were inlined.
+
+        Returns:
+            float: the estimated number of Hack instructions.
+        """
+        removed_calls = removed_calls or {}
+        total = 0.0
+        for function_name, _, function_commands in VMParser.split_to_functions(commands):
+            n_calls = self.calls.get(function_name, 0) - removed_calls.get(function_name, 0)
+            if n_calls <= 0:
+                continue
+            graph = ControlFlowGraph(function_commands)
+            frequencies = self.block_frequencies(function_commands)
+            cost = VMReport.command_cost(function_commands[0])
+            for block_index, frequency in enumerate(frequencies):
+                cost += frequency * VMReport.estimate_hack_cost(graph.block_commands(block_index))
+            total += n_calls * cost
+        return total
+
+    def function_order(self, function_name: str) -> int:
+        """
+        Returns:
+            int: the key that orders functions from the most called one to
+            the least called one.
+        """
+        return -self.calls.get(function_name, 0)
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    def _successor_chances(self, graph: ControlFlowGraph, function_name: str, block_index: int) -> list:
+        """
+        Returns:
+            list: (successor, chance) for every block control flows to from
+            the given block.
+        """
+        successors = graph.successors[block_index]
+        start, end = graph.blocks[block_index]
+        last_command = graph.commands[end - 1]
+        if last_command[0] != "if-goto" or len(successors) < 2:
+            return [(successor, 1.0) for successor in successors]
+        counts = self.branch(function_name, last_command[1])
+        chance = 0.5 if counts is None or sum(counts) == 0 else counts[0] / sum(counts)
+        # a loop that never ends in the profile ends after many runs:
+        chance = min(max(chance, 1e-9), 1 - 1e-9)
+        return [(successors[0], chance), (successors[1], 1 - chance)]
+
+    @staticmethod
+    def _solve(rows: list, values: list) -> list:
+        """
+        Solves sparse linear equations by Gaussian elimination, in the order
+        of the blocks, which keeps the equations of structured code sparse.
+        Returns:
+            list: the value of every variable
+        """
+        n_variables = len(rows)
+        # the equations after the pivot that still have every variable:
+        columns = {}
+        for row_index, row in enumerate(rows):
+            for variable in row:
+                columns.setdefault(variable, set()).add(row_index)
+        for pivot_index in range(n_variables):
+            pivot_row = rows[pivot_index]
+            pivot = pivot_row.get(pivot_index, 0.0)
+            if abs(pivot) < 1e-12:
+                pivot = pivot_row[pivot_index] = 1e-12
+            for row_index in sorted(columns.get(pivot_index, ())):
+                if row_index <= pivot_index:
+                    continue
+                row = rows[row_index]
+                factor = row.pop(pivot_index) / pivot
+                columns[pivot_index].discard(row_index)
+                for variable, coefficient in pivot_row.items():
+                    if variable != pivot_index:
+                        row[variable] = row.get(variable, 0.0) - factor * coefficient
+                        columns.setdefault(variable, set()).add(row_index)
+                values[row_index] -= factor * values[pivot_index]
+        solution = [0.0] * n_variables
+        for index in range(n_variables - 1, -1, -1):
+            row = rows[index]
+            value = values[index] - sum(coefficient * solution[variable]
+                                        for variable, coefficient in row.items() if variable > index)
+            solution[index] = max(value / row[index], 0.0)
+        return solution
@@ -0,0 +1,267 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+import VMWriter
+
+
+class HackWriter(VMWriter.VMWriter):
+    """Writes the VM commands the compilation engine emits directly as Hack
+    assembly, instead of as VM code, so no .vm text is written and parsed
+    back by a separate VM translator.
+
+    All the classes of a program share a single writer, since the program is
+    a single .asm file. The translation is optimized in three ways:
+    - Stack-top caching: the top of the stack is kept in D, and is only
+      written to the stack when another value is pushed over it or control
+      may reach a label. A push followed by a pop or an arithmetic command
+      therefore never goes through memory.
+    - Shared call and return stubs: every call and return jumps to a single
+      copy of the code that saves and restores the frame.
+    - Direct segment addressing: constant indices are folded into the
+      addressing code, so "local 0" and "local 1" need no index arithmetic
+      and static, temp and pointer entries are addressed directly.
+    """
+    # the pointers of the segments that are relative to a pointer:
+    pointer_segments_dictionary = {"local": "LCL", "argument": "ARG", "this": "THIS", "that": "THAT"}
+
+    # the base address of the fixed segments:
+    fixed_segments_dictionary = {"pointer": 3, "temp": 5}
+
+    # the Hack computations of the binary commands, where M is the first
+    # operand and D the second:
+    binary_computations_dictionary = {"add": "D=D+M", "sub": "D=M-D", "and": "D=D&M", "or": "D=D|M"}
+
+    # the Hack computations of the unary commands:
+    unary_computations_dictionary = {"neg": "D=-D", "not": "D=!D", "shiftleft": "D=D<<", "shiftright": "D=D>>"}
+
+    # the Hack jumps of the comparison commands:
+    comparison_jumps_dictionary = {"eq": "JEQ", "gt": "JGT", "lt": "JLT"}
+
+    # the largest index of a pointer segment that is addressed by
+    # incrementing A, instead of by adding the index through a register:
+    max_incremented_index = 6
+
+    # the largest number of locals that are initialized without a loop:
+    max_unrolled_locals = 8
+
+    def __init__(self, output_stream: typing.TextIO, optimizations: list = ()) -> None:
+        """Creates a new writer and writes the bootstrap code of the program.
+
+        Args:
+            output_stream (typing.TextIO): the stream to write Hack assembly to.
+            optimizations (list): optimizations to run on every function
+            before it is written, as in VMWriter.
+        """
+        super().__init__(output_stream, optimizations)
+        self._label_counter = 0
+        self._top_in_d = False
+        self._function_name = ""
+        self._lines = []
+        self._write_bootstrap()
+
+    def close(self) -> None:
+        """Writes the last function of the current class. The output stream
+        stays open for the next classes of the program.
+        """
+        self._flush()
+        self._write_class()
+
+    def finish(self) -> None:
+        """Writes the shared call and return stubs and closes the output
+        stream.
+        """
+        self._flush()
+        self._write_class()
+        self._write_stubs()
+        self._output_file.close()
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    def _write_commands(self, commands: list) -> None:
+        """Writes the given commands to the output stream as Hack assembly."""
+        self._lines = []
+        for command in commands:
+            self._translate(command)
+        self._spill()
+        self._output_file.write(''.join(line + '\n' for line in self._lines))
+
+    def _emit(self, *lines: str):
+        """adds the given lines of assembly to the current translation"""
+        self._lines.extend(lines)
+
+    def _new_label(self, prefix: str) -> str:
+        """
+        Returns:
+            str: a label that is unique in the whole program.
+        """
+        self._label_counter += 1
+        return "{}.{}".format(prefix, self._label_counter)
+
+    def _spill(self):
+        """writes the cached top of the stack to the stack"""
+        if self._top_in_d:
+            self._emit("@SP", "AM=M+1", "A=A-1", "M=D")
+            self._top_in_d = False
+
+    def _pop_to_d(self):
+        """makes D hold the top of the stack, and removes it from the stack"""
+        if self._top_in_d:
+            self._top_in_d = False
+        else:
+            self._emit("@SP", "AM=M-1", "D=M")
+
+    def _address_to_a(self, segment: str, index: int):
+        """makes A hold the address of the given segment entry, without
+        changing D"""
+        if segment in self.fixed_segments_dictionary:
+            self._emit("@" + str(self.fixed_segments_dictionary[segment] + index))
+        elif segment == "static":
+            self._emit("@{}.{}".format(self._function_name.split(".")[0], index))
+        else:
+            self._emit("@" + self.pointer_segments_dictionary[segment], "A=M")
+            self._emit(*["A=A+1"] * index)
+
+    def _translate(self, command: tuple):
+        """adds the assembly of the given command to the current translation"""
+        command_word = command[0]
+        if command_word == "push":
+            self._translate_push(command[1], command[2])
+        elif command_word == "pop":
+            self._translate_pop(command[1], command[2])
+        elif command_word in self.binary_computations_dictionary:
+            self._pop_to_d()
+            self._emit("@SP", "AM=M-1", self.binary_computations_dictionary[command_word])
+            self._top_in_d = True
+        elif command_word in self.unary_computations_dictionary:
+            self._pop_to_d()
+            self._emit(self.unary_computations_dictionary[command_word])
+            self._top_in_d = True
+        elif command_word in self.comparison_jumps_dictionary:
+            self._translate_comparison(self.comparison_jumps_dictionary[command_word])
+        elif command_word == "label":
+            self._spill()
+            self._emit("({}${})".format(self._function_name, command[1]))
+        elif command_word == "goto":
+            self._spill()
+            self._emit("@{}${}".format(self._function_name, command[1]), "0;JMP")
+        elif command_word == "if-goto":
+            self._pop_to_d()
+            self._emit("@{}${}".format(self._function_name, command[1]), "D;JNE")
+        elif command_word == "call":
+            self._translate_call(command[1], command[2])
+        elif command_word == "function":
+            self._translate_function(command[1], command[2])
+        elif command_word == "return":
+            self._pop_to_d()
+            self._emit("@$$RETURN", "0;JMP")
+
+    def _translate_push(self, segment: str, index: int):
+        """adds the assembly of a push command"""
+        self._spill()
+        if segment == "constant":
+            if index in (0, 1):
+                self._emit("D=" + str(index))
+            else:
+                self._emit("@" + str(index), "D=A")
+        elif segment in self.pointer_segments_dictionary and index > self.max_incremented_index:
+            self._emit("@" + self.pointer_segments_dictionary[segment], "D=M",
+                       "@" + str(index), "A=D+A", "D=M")
+        else:
+            self._address_to_a(segment, index)
+            self._emit("D=M")
+        self._top_in_d = True
+
+    def _translate_pop(self, segment: str, index: int):
+        """adds the assembly of a pop command"""
+        self._pop_to_d()
+        if segment in self.pointer_segments_dictionary and index > self.max_incremented_index:
+            # D holds the value, so the address is computed through R13:
+            self._emit("@R13", "M=D", "@" + self.pointer_segments_dictionary[segment], "D=M",
+                       "@" + str(index), "D=D+A", "@R14", "M=D", "@R13", "D=M", "@R14", "A=M", "M=D")
+        else:
+            self._address_to_a(segment, index)
+            self._emit("M=D")
+
+    def _translate_comparison(self, jump: str):
+        """adds the assembly of an eq, gt or lt command"""
+        true_label = self._new_label("$$COMPARISON_TRUE")
+        end_label = self._new_label("$$COMPARISON_END")
+        self._pop_to_d()
+        self._emit("@SP", "AM=M-1", "D=M-D", "@" + true_label, "D;" + jump,
+                   "D=0", "@" + end_label, "0;JMP",
+                   "({})".format(true_label), "D=-1",
+                   "({})".format(end_label))
+        self._top_in_d = True
+
+    def _translate_call(self, function_name: str, n_args: int):
+        """adds the assembly of a call command, which jumps to the shared
+        call stub with R13 holding the called function, R14 the number of
+        arguments and D the return address"""
+        self._spill()
+        return_label = self._new_label(self._function_name + "$ret")
+        self._emit("@" + str(n_args), "D=A", "@R14", "M=D",
+                   "@" + function_name, "D=A", "@R13", "M=D",
+                   "@" + return_label, "D=A", "@$$CALL", "0;JMP",
+                   "({})".format(return_label))
+
+    def _translate_function(self, function_name: str, n_locals: int):
+        """adds the assembly of a function command"""
+        self._function_name = function_name
+        self._top_in_d = False
+        self._emit("({})".format(function_name))
+        if n_locals == 0:
+            return
+        if n_locals <= self.max_unrolled_locals:
+            self._emit("@SP", "A=M")
+            for local_index in range(n_locals):
+                if local_index > 0:
+                    self._emit("A=A+1")
+                self._emit("M=0")
+            self._emit("D=A+1", "@SP", "M=D")
+            return
+        loop_label = self._new_label(function_name + "$$INIT_LOCALS")
+        self._emit("@" + str(n_locals), "D=A",
+                   "({})".format(loop_label),
+                   "@SP", "AM=M+1", "A=A-1", "M=0",
+                   "@" + loop_label, "D=D-1;JGT")
+
+    def _write_bootstrap(self):
+        """writes the code that sets the stack pointer, calls Sys.init and halts
+        if it returns"""
+        self._function_name = "$$BOOTSTRAP"
+        self._lines = ["@256", "D=A", "@SP", "M=D"]
+        self._translate_call("Sys.init", 0)
+        self._emit("($$HALT)", "@$$HALT", "0;JMP")
+        self._output_file.write(''.join(line + '\n' for line in self._lines))
+
+    def _write_stubs(self):
+        """writes the shared call and return stubs"""
+        self._output_file.write('\n'.join([
+            # saves the frame of the caller and jumps to the called function:
+            "($$CALL)",
+            "@SP", "AM=M+1", "A=A-1", "M=D",
+            "@LCL", "D=M", "@SP", "AM=M+1", "A=A-1", "M=D",
+            "@ARG", "D=M", "@SP", "AM=M+1", "A=A-1", "M=D",
+            "@THIS", "D=M", "@SP", "AM=M+1", "A=A-1", "M=D",
+            "@THAT", "D=M", "@SP", "AM=M+1", "A=A-1", "M=D",
+            "@R14", "D=M", "@5", "D=D+A", "@SP", "D=M-D", "@ARG", "M=D",
+            "@SP", "D=M", "@LCL", "M=D",
+            "@R13", "A=M", "0;JMP",
+            # gets the return value in D, restores the frame of the caller
+            # and returns to it:
+            "($$RETURN)",
+            "@R13", "M=D",
+            "@LCL", "D=M", "@5", "A=D-A", "D=M", "@R14", "M=D",
+            "@R13", "D=M", "@ARG", "A=M", "M=D",
+            "@ARG", "D=M+1", "@SP", "M=D",
+            "@LCL", "AM=M-1", "D=M", "@THAT", "M=D",
+            "@LCL", "AM=M-1", "D=M", "@THIS", "M=D",
+            "@LCL", "AM=M-1", "D=M", "@ARG", "M=D",
+            "@LCL", "A=M-1", "D=M", "@LCL", "M=D",
+            "@R14", "A=M", "0;JMP"
+        ]) + '\n')
@@ -4,20 +4,54 @@ https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
 and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
 Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import copy
+import io
 import os
 import sys
+import time
 import typing
+import VMWriter
 from CompilationEngine import CompilationEngine
+from DependencyGraph import DependencyGraph
+from Diagnostic import CompilationError
+from DirectoryWatcher import DirectoryWatcher
+from ExecutionProfile import ExecutionProfile
+from HackWriter import HackWriter
+from JackTokenizer import JackTokenizer
+from JobServer import JobServer
+from LoopUnroller import LoopUnroller
+from OutputFile import OutputFile
+from PartialEvaluator import PartialEvaluator
+from PassManager import PassManager
+from ProjectArchive import ProjectArchive
+from ProjectIndex import ProjectIndex
+from SubroutineCache import SubroutineCache
+from VMBytecode import VMBytecode, VMBytecodeWriter
+from VMParser import VMParser
+from VMReport import VMReport
 
 
 
 def compile_file(
-        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+        input_file: typing.TextIO, output_file: typing.TextIO,
+        optimizations: list = (), subroutine_cache: SubroutineCache = None,
+        project_index: ProjectIndex = None, dependency_graph: DependencyGraph = None,
+        intrinsic_rewrites: dict = None) -> None:
     """Compiles a single file.
 
     Args:
         input_file (typing.TextIO): the file to compile.
         output_file (typing.TextIO): writes all output to this file.
+        optimizations (list): optimizations to run on every compiled function.
+        subroutine_cache (SubroutineCache): if given, only the subroutines that
+        changed since they were cached are compiled.
+        project_index (ProjectIndex): if given, the subroutines of the class
+        are recorded in it.
+        dependency_graph (DependencyGraph): if given, the dependencies of the
+        class are recorded in it.
+        intrinsic_rewrites (dict): if given, calls to the Jack OS functions it
+        names are expanded inline, and counted in it (see CompilationEngine).
     """
     """
     The proposed implementation is based on morphing the syntax analyzer
@@ -83,32 +117,1040 @@ def compile_file(
     it and compare your compiler to it.
     """
     # construct an CompilationEngine object:
-    compilation_engine = CompilationEngine(input_file, output_file)
+    compilation_engine = CompilationEngine(
+        input_file, output_file, optimizations, subroutine_cache=subroutine_cache,
+        project_index=project_index, dependency_graph=dependency_graph,
+        intrinsic_rewrites=intrinsic_rewrites)
 
     # compiles the class of the input_file and closes the output file:
     compilation_engine.compile_class()
 
 
+class CompilationResult:
+    """The result of compiling a single class with compile_many."""
+
+    def __init__(self, vm_code: typing.Optional[str], diagnostics: list) -> None:
+        """
+        Args:
+            vm_code (str): the VM code of the class, or None if it has errors.
+            diagnostics (list): the problems found in the class (see
+            Diagnostic).
+        """
+        self.vm_code = vm_code
+        self.diagnostics = diagnostics
+
+    def succeeded(self) -> bool:
+        """
+        Returns:
+            bool: was the class compiled without errors?
+        """
+        return self.vm_code is not None
+
+
+class _InMemoryVMWriter(VMWriter.VMWriter):
+    """A VMWriter that keeps its output stream open when the class ends, so
+    the VM code can be read from it."""
+
+    def close(self) -> None:
+        """Writes the last function of the class."""
+        self._flush()
+        self._write_class()
+
+
+def compile_source(text: str, optimizations: list = (),
+                   subroutine_cache: SubroutineCache = None,
+                   project_index: ProjectIndex = None,
+                   dependency_graph: DependencyGraph = None,
+                   intrinsic_rewrites: dict = None) -> str:
+    """Compiles the source code of a single class, without using any files.
+
+    Args:
+        text (str): the Jack source code of the class.
+        optimizations (list): optimizations to run on every compiled function.
+        subroutine_cache (SubroutineCache): if given, only the subroutines that
+        changed since they were cached are compiled, so compiling an edited
+        class again takes time in proportion to the edited subroutines.
+        project_index (ProjectIndex): if given, the subroutines of the class
+        are recorded in it.
+        dependency_graph (DependencyGraph): if given, the dependencies of the
+        class are recorded in it.
+        intrinsic_rewrites (dict): if given, calls to the Jack OS functions it
+        names are expanded inline, and counted in it (see CompilationEngine).
+
+    Returns:
+        str: the VM code of the class.
+
+    Raises:
+        CompilationError: if the class has errors.
+    """
+    output_stream = io.StringIO()
+    vm_writer = _InMemoryVMWriter(output_stream, optimizations)
+    CompilationEngine(io.StringIO(text), output_stream, vm_writer=vm_writer,
+                      subroutine_cache=subroutine_cache, project_index=project_index,
+                      dependency_graph=dependency_graph,
+                      intrinsic_rewrites=intrinsic_rewrites).compile_class()
+    return output_stream.getvalue()
+
+
+def compile_many(sources: dict, optimizations: list = (),
+                 subroutine_cache: SubroutineCache = None,
+                 project_index: ProjectIndex = None,
+                 dependency_graph: DependencyGraph = None,
+                 intrinsic_rewrites: dict = None) -> dict:
+    """Compiles the source code of many classes, without using any files.
+
+    The compiled token pattern of the tokenizer and the given optimizations,
+    with their statistics, are shared by all the classes. Every class gets a
+    fresh engine, since its symbol table and label counters are its own.
+
+    Args:
+        sources (dict): maps the name of every class, such as "Main", to its
+        Jack source code.
+        optimizations (list): optimizations to run on every compiled function.
+        subroutine_cache (SubroutineCache): if given, only the subroutines that
+        changed since they were cached are compiled.
+        project_index (ProjectIndex): if given, the subroutines of every class
+        are recorded in it.
+        dependency_graph (DependencyGraph): if given, the dependencies of every
+        class are recorded in it.
+        intrinsic_rewrites (dict): if given, calls to the Jack OS functions it
+        names are expanded inline, and counted in it (see CompilationEngine).
+
+    Returns:
+        dict: maps the name of every class to its CompilationResult. The
+        source of every diagnostic is the name of its class.
+    """
+    results = {}
+    for name, text in sources.items():
+        try:
+            results[name] = CompilationResult(compile_source(
+                text, optimizations, subroutine_cache, project_index, dependency_graph,
+                intrinsic_rewrites), [])
+        except CompilationError as error:
+            results[name] = CompilationResult(None, error.diagnostics)
+        for diagnostic in results[name].diagnostics:
+            diagnostic.source = name
+    return results
+
+
+def compile_file_to_bytecode(
+        input_file: typing.TextIO, output_file: typing.BinaryIO,
+        optimizations: list = (), project_index: ProjectIndex = None,
+        dependency_graph: DependencyGraph = None, intrinsic_rewrites: dict = None) -> None:
+    """Compiles a single file into a compact binary .vmb file (see
+    VMBytecode).
+
+    Args:
+        input_file (typing.TextIO): the file to compile.
+        output_file (typing.BinaryIO): writes all output to this binary file.
+        optimizations (list): optimizations to run on every compiled function.
+        project_index (ProjectIndex): if given, the subroutines of the class
+        are recorded in it.
+        dependency_graph (DependencyGraph): if given, the dependencies of the
+        class are recorded in it.
+        intrinsic_rewrites (dict): if given, calls to the Jack OS functions it
+        names are expanded inline, and counted in it (see CompilationEngine).
+    """
+    bytecode_writer = VMBytecodeWriter(output_file, optimizations)
+    CompilationEngine(input_file, output_file, vm_writer=bytecode_writer,
+                      project_index=project_index, dependency_graph=dependency_graph,
+                      intrinsic_rewrites=intrinsic_rewrites).compile_class()
+
+
+def compile_files_to_hack(
+        input_paths: list, output_file: typing.TextIO,
+        optimizations: list = (), project_index: ProjectIndex = None,
+        dependency_graph: DependencyGraph = None, intrinsic_rewrites: dict = None) -> None:
+    """Compiles Jack files directly into a single Hack assembly program.
+
+    .vm and .vmb files of classes that have no .jack file among the input
+    paths, such as the classes of the Jack OS, are translated into the
+    program as well.
+
+    Args:
+        input_paths (list): paths of the .jack, .vm and .vmb files of the
+        program.
+        output_file (typing.TextIO): writes the program to this file.
+        optimizations (list): optimizations to run on every compiled function.
+        project_index (ProjectIndex): if given, the subroutines of every
+        compiled class are recorded in it.
+        dependency_graph (DependencyGraph): if given, the dependencies of every
+        compiled class are recorded in it.
+        intrinsic_rewrites (dict): if given, calls to the Jack OS functions it
+        names are expanded inline, and counted in it (see CompilationEngine).
+    """
+    hack_writer = HackWriter(output_file, optimizations)
+    jack_classes = {os.path.splitext(os.path.basename(input_path))[0]
+                    for input_path in input_paths if input_path.lower().endswith(".jack")}
+    for input_path in sorted(input_paths):
+        filename, extension = os.path.splitext(input_path)
+        if extension.lower() == ".jack":
+            with open(input_path, 'r') as input_file:
+                try:
+                    CompilationEngine(input_file, output_file, vm_writer=hack_writer,
+                                      project_index=project_index,
+                                      dependency_graph=dependency_graph,
+                                      intrinsic_rewrites=intrinsic_rewrites).compile_class()
+                except CompilationError as error:
+                    for diagnostic in error.diagnostics:
+                        diagnostic.source = input_path
+                    raise
+        elif extension.lower() in (".vm", ".vmb") and os.path.basename(filename) not in jack_classes:
+            hack_writer.write_vm_commands(VMBytecode.load_commands(input_path))
+            # a class that has both a .vm and a .vmb file is translated once:
+            jack_classes.add(os.path.basename(filename))
+    hack_writer.finish()
+
+
+def compile_to_archive(
+        sources: typing.Iterable, output_archive: ProjectArchive,
+        optimizations: list = (), bytecode: bool = False, intrinsic_rewrites: dict = None) -> list:
+    """Compiles Jack files into the members of an archive, without writing
+    any other file.
+
+    Args:
+        sources (typing.Iterable): the (name, text) of every .jack file, such
+        as the members ProjectArchive.read_members reads from an archive.
+        output_archive (ProjectArchive): the output of every file is added to
+        this archive, with the name of the file and a .vm extension.
+        optimizations (list): optimizations to run on every compiled function.
+        bytecode (bool): add compact binary .vmb files instead of .vm files.
+        intrinsic_rewrites (dict): if given, calls to the Jack OS functions it
+        names are expanded inline, and counted in it (see CompilationEngine).
+
+    Returns:
+        list: the diagnostics of the files that have errors, whose source is
+        the name of their file. Their output is left out of the archive.
+    """
+    diagnostics = []
+    for name, text in sources:
+        try:
+            vm_code = compile_source(text, optimizations, intrinsic_rewrites=intrinsic_rewrites)
+        except CompilationError as error:
+            for diagnostic in error.diagnostics:
+                diagnostic.source = name
+            diagnostics += error.diagnostics
+            continue
+        if bytecode:
+            output_archive.add(ProjectArchive.output_name(name, ".vmb"),
+                               VMBytecode.encode(VMParser.parse_text(vm_code)))
+        else:
+            output_archive.add(ProjectArchive.output_name(name, ".vm"), vm_code)
+    return diagnostics
+
+
+def compile_files(
+        input_paths: list, job_server: JobServer, optimizations: list = (), bytecode: bool = False,
+        if_changed: bool = False, project_index: ProjectIndex = None,
+        dependency_graph: DependencyGraph = None, intrinsic_rewrites: dict = None) -> list:
+    """Compiles Jack files into the .vm or .vmb files next to them, every
+    file as a job of its own, so they are compiled in parallel (see
+    JobServer).
+
+    Every worker process compiles with its own copy of the optimizations,
+    and what the copies count, such as the statistics of a PassManager, is
+    added to the given ones, as are the classes the jobs record into an
+    index, a dependency graph and intrinsic counts. An output file is only
+    written once its class compiled without errors, so a class with errors
+    leaves its previous output in place.
+
+    Args:
+        input_paths (list): paths of .jack files.
+        job_server (JobServer): the job slots the files are compiled in.
+        optimizations (list): optimizations to run on every compiled function.
+        bytecode (bool): write compact binary .vmb files instead of .vm files.
+        if_changed (bool): only replace output files whose content changed
+        (see OutputFile).
+        project_index (ProjectIndex): if given, the subroutines of every class
+        are recorded in it.
+        dependency_graph (DependencyGraph): if given, the dependencies of every
+        class are recorded in it.
+        intrinsic_rewrites (dict): if given, calls to the Jack OS functions it
+        names are expanded inline, and counted in it (see CompilationEngine).
+
+    Returns:
+        list: (output_path, diagnostics, changed) for every input path: the
+        path of its output file, the diagnostics of its errors, whose source
+        is the input path, and whether its output file was replaced, which is
+        None unless if_changed is given and it has no errors.
+    """
+    context = (list(optimizations), bytecode, if_changed, project_index is not None, dependency_graph is not None,
+               None if intrinsic_rewrites is None else list(intrinsic_rewrites), JackTokenizer.default_backend)
+    compiled = []
+    for output_path, diagnostics, changed, job_index, job_graph, job_rewrites, counters in job_server.map(
+            _compile_job, input_paths, _start_compile_jobs, (context,)):
+        for pass_manager, (before, after) in zip(_pass_managers(optimizations), counters):
+            pass_manager.add_counters(before, after)
+        if project_index is not None:
+            project_index.merge(job_index)
+        if dependency_graph is not None:
+            dependency_graph.merge(job_graph)
+        if intrinsic_rewrites is not None:
+            for name, count in job_rewrites.items():
+                intrinsic_rewrites[name] += count
+        compiled.append((output_path, diagnostics, changed))
+    return compiled
+
+
+# the options of the jobs of compile_files, with this process's copy of the
+# optimizations (see _start_compile_jobs):
+_compile_job_context = None
+
+
+def _start_compile_jobs(context: tuple) -> None:
+    """Keeps the options of the jobs of compile_files, with a copy of the
+    optimizations for the jobs of this process."""
+    global _compile_job_context
+    _compile_job_context = copy.deepcopy(context)
+    JackTokenizer.default_backend = context[-1]
+
+
+def _pass_managers(optimizations: list) -> list:
+    """
+    Returns:
+        list: the optimizations that are a PassManager, which counts.
+    """
+    return [optimization for optimization in optimizations if isinstance(optimization, PassManager)]
+
+
+def _compile_job(input_path: str) -> tuple:
+    """Compiles a single file of compile_files into its output file.
+
+    Returns:
+        tuple: (output_path, diagnostics, changed, project_index,
+        dependency_graph, intrinsic_rewrites, counters): the result of the
+        file (see compile_files), the index, graph and intrinsic counts of
+        its class, and (before, after) the counters of every PassManager.
+    """
+    optimizations, bytecode, if_changed, is_indexed, has_dependencies, intrinsic_names, _ = _compile_job_context
+    output_path = os.path.splitext(input_path)[0] + (".vmb" if bytecode else ".vm")
+    project_index = ProjectIndex() if is_indexed else None
+    dependency_graph = DependencyGraph() if has_dependencies else None
+    intrinsic_rewrites = None if intrinsic_names is None else dict.fromkeys(intrinsic_names, 0)
+    before = [pass_manager.counters() for pass_manager in _pass_managers(optimizations)]
+    diagnostics = []
+    try:
+        with open(input_path, 'r') as input_file, \
+                OutputFile(output_path, bytecode, if_changed) as output_file:
+            if bytecode:
+                compile_file_to_bytecode(input_file, output_file, optimizations, project_index,
+                                         dependency_graph, intrinsic_rewrites)
+            else:
+                compile_file(input_file, output_file, optimizations, project_index=project_index,
+                             dependency_graph=dependency_graph, intrinsic_rewrites=intrinsic_rewrites)
+    except CompilationError as error:
+        diagnostics = error.diagnostics
+        for diagnostic in diagnostics:
+            diagnostic.source = input_path
+    # an output with errors is not committed, and keeps its previous file:
+    changed = output_file.changed if if_changed else None
+    counters = [(before_counters, pass_manager.counters())
+                for before_counters, pass_manager in zip(before, _pass_managers(optimizations))]
+    return output_path, diagnostics, changed, project_index, dependency_graph, intrinsic_rewrites, counters
+
+
+class _CheckWriter(VMWriter.VMWriter):
+    """A VMWriter that drops every command, so classes are checked without
+    generating or writing code."""
+
+    def close(self) -> None:
+        """Drops the last function of the class."""
+        self._function_commands = []
+
+    def _flush(self) -> list:
+        """Drops the function currently written, without optimizing it."""
+        commands = self._function_commands
+        self._function_commands = []
+        return commands
+
+
+def check_source(text: str) -> list:
+    """Checks the source code of a single class: tokenizes it, parses it and
+    resolves its names through a SymbolTable, without generating code.
+
+    Args:
+        text (str): the Jack source code of the class.
+
+    Returns:
+        list: the diagnostics of the class, which is empty if it compiles.
+    """
+    try:
+        CompilationEngine(io.StringIO(text), None, vm_writer=_CheckWriter(None)).compile_class()
+    except CompilationError as error:
+        return error.diagnostics
+    return []
+
+
+def check_sources(sources: typing.Iterable, job_server: JobServer) -> list:
+    """Checks many classes, every class as a job of its own, so they are
+    checked in parallel (see check_source and JobServer).
+
+    Args:
+        sources (typing.Iterable): the (name, text) of every .jack file.
+        job_server (JobServer): the job slots the classes are checked in.
+
+    Returns:
+        list: the diagnostics of all the classes, in the order of the
+        sources, whose source is the name of their file.
+    """
+    diagnostics = []
+    for name, class_diagnostics in job_server.map(_check_job, sources, _start_check_jobs,
+                                                  (JackTokenizer.default_backend,)):
+        for diagnostic in class_diagnostics:
+            diagnostic.source = name
+        diagnostics += class_diagnostics
+    return diagnostics
+
+
+def _start_check_jobs(tokenizer_backend: str) -> None:
+    """Tokenizes the jobs of check_sources with the tokenizer backend of the
+    process that started them."""
+    JackTokenizer.default_backend = tokenizer_backend
+
+
+def _check_job(source: tuple) -> tuple:
+    """Checks a single class of check_sources.
+
+    Returns:
+        tuple: (name, diagnostics) of the class.
+    """
+    name, text = source
+    return name, check_source(text)
+
+
+def write_report(vm_path: str, if_changed: bool = False, program_commands: list = None) -> None:
+    """Writes the static code-size, cost and stack report of a .vm file next
+    to it.
+
+    Args:
+        vm_path (str): path of the .vm or .vmb file. The report is written to the
+        same path, with a ".report.json" extension instead.
+        if_changed (bool): only replace the report if its content changed.
+        Either way the report is replaced at once (see OutputFile).
+        program_commands (list): the VM commands of the whole program, for
+        the stack usage along call chains (see load_program).
+    """
+    report_path = os.path.splitext(vm_path)[0] + ".report.json"
+    report = VMReport(VMBytecode.load_commands(vm_path), program_commands)
+    with OutputFile(report_path, if_changed=if_changed) as report_file:
+        report.write(report_file)
+
+
+def load_program(directory: str, extension: str = ".vm") -> list:
+    """
+    Args:
+        directory (str): a directory of .vm and .vmb files.
+        extension (str): the extension whose file is loaded for a class that
+        has both a .vm and a .vmb file.
+
+    Returns:
+        list: the VM commands of every class of the directory.
+    """
+    paths = {}
+    for filename in sorted(os.listdir(directory)):
+        class_name, file_extension = os.path.splitext(filename)
+        if file_extension in (".vm", ".vmb") and (class_name not in paths or file_extension == extension):
+            paths[class_name] = os.path.join(directory, filename)
+    commands = []
+    for class_name in sorted(paths):
+        commands += VMBytecode.load_commands(paths[class_name])
+    return commands
+
+
+def compile_program(sources: typing.Iterable, directory: typing.Optional[str] = None,
+                    optimizations: list = (), intrinsic_rewrites: dict = None) -> list:
+    """Compiles every class of a program into memory, by default without
+    optimizations, for the optimizations that analyze the whole program (see
+    PartialEvaluator).
+
+    Args:
+        sources (typing.Iterable): the (name, text) of every .jack file of the
+        program.
+        directory (str): if given, the functions of the .vm and .vmb files of
+        this directory whose classes have no .jack file, such as the Jack OS,
+        are part of the program as well.
+        optimizations (list): optimizations to run on every compiled function.
+        intrinsic_rewrites (dict): if given, calls to the Jack OS functions it
+        names are expanded inline, and counted in it (see CompilationEngine).
+
+    Returns:
+        list: the VM commands of every class of the program. Classes with
+        errors are left out, and their errors are reported once they are
+        compiled.
+    """
+    commands = []
+    class_names = set()
+    for name, text in sources:
+        class_names.add(os.path.splitext(os.path.basename(name))[0])
+        try:
+            commands += VMParser.parse_text(compile_source(text, optimizations,
+                                                           intrinsic_rewrites=intrinsic_rewrites))
+        except CompilationError:
+            continue
+    if directory is not None:
+        for function_name, _, function_commands in VMParser.split_to_functions(load_program(directory)):
+            if function_name.split(".", 1)[0] not in class_names:
+                commands += function_commands
+    return commands
+
+
+def read_sources(paths: list) -> typing.Iterator:
+    """Reads Jack files one at a time.
+
+    Args:
+        paths (list): paths of .jack files.
+
+    Yields:
+        tuple: (name, text): the name of every file, without its directory,
+        and its text.
+    """
+    for path in paths:
+        with open(path, 'r') as input_file:
+            yield os.path.basename(path), input_file.read()
+
+
+def write_dependencies(dependency_graph: DependencyGraph, class_name: str, output_path: str) -> None:
+    """Writes the make rule of the dependencies of a class next to its output
+    file (see DependencyGraph.make_rule), only replacing it if it changed.
+
+    Args:
+        dependency_graph (DependencyGraph): a graph the class was compiled into.
+        class_name (str): name of the class.
+        output_path (str): path of the .vm or .vmb file of the class. The rule
+        is written to the same path, with a ".d" extension instead.
+    """
+    with OutputFile(os.path.splitext(output_path)[0] + ".d") as dependency_file:
+        dependency_file.write(dependency_graph.make_rule(class_name, output_path, os.path.dirname(output_path)))
+
+
+class _WatchedProject:
+    """The in-memory state of a watched directory: the source and the VM code
+    of every class, and the compiled subroutines of every class (see
+    SubroutineCache)."""
+
+    def __init__(self, directory: str, optimizations: list, report: bool,
+                 index_path: typing.Optional[str], graph_path: typing.Optional[str],
+                 intrinsic_rewrites: dict = None) -> None:
+        """
+        Args:
+            directory (str): the watched directory.
+            optimizations (list): optimizations to run on every compiled function.
+            report (bool): write a report next to every written .vm file.
+            index_path (str): if given, the project index is kept up to date
+            in this file.
+            graph_path (str): if given, the dependency graph is kept up to date
+            in this file, and a .d file is written next to every .vm file.
+            intrinsic_rewrites (dict): if given, calls to the Jack OS functions
+            it names are expanded inline, and counted in it.
+        """
+        self.directory = directory
+        self.optimizations = optimizations
+        self.report = report
+        self.index_path = index_path
+        self.project_index = None if index_path is None else ProjectIndex.load(index_path)
+        self.graph_path = graph_path
+        self.dependency_graph = None if graph_path is None else DependencyGraph.load(graph_path)
+        self.intrinsic_rewrites = intrinsic_rewrites
+        self.subroutine_cache = SubroutineCache()
+        # the last source and VM code of every class:
+        self.sources = {}
+        self.vm_codes = {}
+        # was the directory built once, so the reports are up to date?
+        self.is_built = False
+
+    def rebuild(self, filenames: set, after_save: bool) -> None:
+        """Compiles the given .jack files of the directory again, and writes
+        the .vm files whose content changed. The outputs of a class whose
+        .jack file was deleted are removed.
+
+        Args:
+            filenames (set): names of changed .jack files.
+            after_save (bool): log the latency from the save of every file to
+            its updated output, instead of the time the build took.
+        """
+        start = time.perf_counter()
+        n_written = 0
+        # the first build writes every report, since they may be missing or
+        # older than the .vm files:
+        are_reports_stale = self.report and not self.is_built
+        for filename in sorted(filenames):
+            class_name = os.path.splitext(filename)[0]
+            jack_path = os.path.join(self.directory, filename)
+            try:
+                with open(jack_path, 'r') as input_file:
+                    text = input_file.read()
+                saved_at = os.stat(jack_path).st_mtime
+            except FileNotFoundError:
+                if class_name in self.sources:
+                    self._remove_outputs(class_name)
+                    # a class changes the stack usage of the classes that call it:
+                    are_reports_stale = self.report
+                self.sources.pop(class_name, None)
+                self.vm_codes.pop(class_name, None)
+                self.subroutine_cache.retain(class_name, [])
+                if self.project_index is not None:
+                    self.project_index.remove(class_name)
+                if self.dependency_graph is not None:
+                    self.dependency_graph.remove(class_name)
+                continue
+            if self.sources.get(class_name) == text:
+                continue
+            self.sources[class_name] = text
+            misses = self.subroutine_cache.misses
+            try:
+                vm_code = compile_source(text, self.optimizations, self.subroutine_cache, self.project_index,
+                                         self.dependency_graph, self.intrinsic_rewrites)
+            except CompilationError as error:
+                for diagnostic in error.diagnostics:
+                    diagnostic.source = jack_path
+                    print(diagnostic, file=sys.stderr)
+                continue
+            is_written = self._write_if_changed(class_name, vm_code)
+            if is_written and self.report:
+                # a class changes the stack usage of the classes that call it:
+                are_reports_stale = True
+            if self.dependency_graph is not None:
+                write_dependencies(self.dependency_graph, class_name,
+                                   os.path.join(self.directory, class_name + ".vm"))
+            n_written += is_written
+            if after_save:
+                print("{}: compiled {} subroutine(s), {} {}.vm, {:.0f} ms after save".format(
+                    filename, self.subroutine_cache.misses - misses,
+                    "wrote" if is_written else "unchanged", class_name, (time.time() - saved_at) * 1000))
+        if are_reports_stale:
+            program_commands = load_program(self.directory)
+            for class_name in sorted(self.vm_codes):
+                write_report(os.path.join(self.directory, class_name + ".vm"), True, program_commands)
+        if self.project_index is not None:
+            self.project_index.save(self.index_path)
+        if self.dependency_graph is not None:
+            self.dependency_graph.save(self.graph_path)
+        self.is_built = True
+        if not after_save:
+            print("built {} class(es), wrote {} .vm file(s) in {:.0f} ms".format(
+                len(filenames), n_written, (time.perf_counter() - start) * 1000))
+
+    def _write_if_changed(self, class_name: str, vm_code: str) -> bool:
+        """
+        Returns:
+            bool: was the .vm file of the class written, because its content
+            changed?
+        """
+        vm_path = os.path.join(self.directory, class_name + ".vm")
+        if class_name not in self.vm_codes and os.path.exists(vm_path):
+            with open(vm_path, 'r') as vm_file:
+                self.vm_codes[class_name] = vm_file.read()
+        if self.vm_codes.get(class_name) == vm_code:
+            return False
+        with OutputFile(vm_path) as vm_file:
+            vm_file.write(vm_code)
+        self.vm_codes[class_name] = vm_code
+        return True
+
+    def _remove_outputs(self, class_name: str) -> None:
+        """Removes the .vm file of a class, and its .d file and report."""
+        for extension in (".vm", ".d", ".report.json"):
+            try:
+                os.remove(os.path.join(self.directory, class_name + extension))
+            except FileNotFoundError:
+                pass
+
+
+def watch(directory: str, optimizations: list = (), report: bool = False,
+          debounce: float = 0.1, index_path: typing.Optional[str] = None,
+          graph_path: typing.Optional[str] = None, intrinsic_rewrites: dict = None) -> None:
+    """Compiles every .jack file of the directory, and then keeps compiling
+    the files that change until interrupted.
+
+    Only the subroutines that changed are compiled again, and only .vm files
+    whose content changed are written. A burst of saves is built once, after
+    no file changed for the debounce time.
+
+    Args:
+        directory (str): the directory to watch.
+        optimizations (list): optimizations to run on every compiled function.
+        report (bool): write a report next to every written .vm file.
+        debounce (float): the seconds to wait for more changes.
+        index_path (str): if given, the project index is kept up to date in
+        this file (see ProjectIndex).
+        graph_path (str): if given, the dependency graph is kept up to date in
+        this file, and a .d file is written next to every .vm file (see
+        DependencyGraph).
+        intrinsic_rewrites (dict): if given, calls to the Jack OS functions it
+        names are expanded inline, and counted in it (see CompilationEngine).
+    """
+    project = _WatchedProject(directory, optimizations, report, index_path, graph_path, intrinsic_rewrites)
+    watcher = DirectoryWatcher(directory, ".jack")
+    print("watching {} ({})".format(directory, "inotify" if watcher.uses_inotify() else "polling"))
+    project.rebuild({filename for filename in os.listdir(directory) if filename.endswith(".jack")}, False)
+    try:
+        while True:
+            changed = watcher.wait_for_changes()
+            while True:
+                more_changed = watcher.wait_for_changes(debounce)
+                if not more_changed:
+                    break
+                changed |= more_changed
+            project.rebuild(changed, True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
 if "__main__" == __name__:
     # Parses the input path and calls compile_file on each input file.
     # This opens both the input and the output files!
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: JackCompiler <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    parser = argparse.ArgumentParser(
+        prog="JackCompiler", usage="JackCompiler <input path> [options]")
+    parser.add_argument("input_path")
+    parser.add_argument(
+        "--report", action="store_true",
+        help="write a static code-size and cost report next to every .vm file")
+    parser.add_argument(
+        "-O", dest="level", type=int, choices=sorted(PassManager.levels), default=1,
+        help="the optimization level: -O0 runs no passes, -O1 (the default) shares local slots, "
+             "and -O2 runs every pass")
+    parser.add_argument(
+        "--enable", action="append", default=[], choices=PassManager.pass_classes, metavar="PASS",
+        help="run a pass on top of the optimization level: " + ", ".join(PassManager.pass_classes))
+    parser.add_argument(
+        "--disable", action="append", default=[], choices=PassManager.pass_classes, metavar="PASS",
+        help="do not run a pass of the optimization level")
+    parser.add_argument(
+        "--time-passes", action="store_true",
+        help="print the time every pass took and the instructions it removed")
+    parser.add_argument(
+        "--no-reuse-locals", action="store_true",
+        help="give every declared local its own slot (for debugging), like --disable slots")
+    parser.add_argument(
+        "--cse", action="store_true",
+        help="compute repeated pure subexpressions within a basic block once, like --enable cse")
+    parser.add_argument(
+        "--licm", action="store_true",
+        help="compute loop-invariant expressions once, before their loop, like --enable licm")
+    parser.add_argument(
+        "--unroll-budget", type=int, default=LoopUnroller.default_size_budget, metavar="N",
+        help="the estimated Hack instructions a single loop may be unrolled into by the unroll pass "
+             "(default %(default)s)")
+    parser.add_argument(
+        "--evaluate-steps", type=int, default=PartialEvaluator.default_step_limit, metavar="N",
+        help="the VM commands a single call may run when the evaluate pass evaluates it at compile time "
+             "(default %(default)s)")
+    parser.add_argument(
+        "--profile", metavar="PROFILE",
+        help="guide inlining, unrolling, block layout and the order of functions by an execution profile, "
+             "as VMEmulator.py --profile records")
+    parser.add_argument(
+        "--intrinsics", nargs="?", const=",".join(CompilationEngine.intrinsics_dictionary), metavar="NAMES",
+        help="expand calls to Jack OS functions inline, all of them or the comma-separated given ones: " +
+             ", ".join(CompilationEngine.intrinsics_dictionary))
+    parser.add_argument(
+        "--asm", action="store_true",
+        help="compile the whole program directly into a single Hack .asm file")
+    parser.add_argument(
+        "--bytecode", action="store_true",
+        help="write compact binary .vmb files instead of .vm files")
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="keep running, and compile the .jack files of the directory again when they change")
+    parser.add_argument(
+        "--index", action="store_true",
+        help="keep an index of the subroutines of every class in Dir/Dir.jidx")
+    parser.add_argument(
+        "--tokenizer", choices=JackTokenizer.backends, default=JackTokenizer.default_backend,
+        help="the tokenizer backend: a single regular expression, or a table-driven scanner")
+    parser.add_argument(
+        "--deps", action="store_true",
+        help="write a make dependency file next to every output file, and the dependency graph in Dir/Dir.deps.json")
+    parser.add_argument(
+        "--if-changed", action="store_true",
+        help="compile into memory, and only replace output files whose content changed")
+    parser.add_argument(
+        "--check", action="store_true",
+        help="only tokenize, parse and resolve the names of the .jack files of the tree, and report their errors, "
+             "without generating or writing anything")
+    parser.add_argument(
+        "-j", "--jobs", type=int, metavar="N",
+        help="compile up to N files at once (default: the number of CPUs); run by make -jN, only take the job "
+             "slots of make that are free")
+    parser.add_argument(
+        "--output-archive", metavar="ARCHIVE",
+        help="write the .vm files into a tar or zip archive, which is the default for an archive input path")
+    arguments = parser.parse_args()
+    JackTokenizer.default_backend = arguments.tokenizer
+    if arguments.jobs is not None and arguments.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if arguments.watch and (arguments.asm or arguments.bytecode):
+        parser.error("--watch writes .vm files, and cannot be used with --asm or --bytecode")
+    # an archive input path is compiled into an archive, by default next to
+    # it with a ".vm" before its suffix:
+    is_archive_input = ProjectArchive.archive_format(arguments.input_path) is not None and \
+        os.path.isfile(arguments.input_path)
+    if arguments.check:
+        if arguments.watch or arguments.asm or arguments.bytecode or arguments.report or arguments.index or \
+                arguments.deps or arguments.if_changed or arguments.output_archive is not None or \
+                arguments.profile is not None:
+            parser.error("--check writes nothing, and cannot be used with --watch, --asm, --bytecode, --report, "
+                         "--index, --deps, --if-changed, --output-archive or --profile")
+        check_path = os.path.abspath(arguments.input_path)
+        if is_archive_input:
+            sources_to_check = list(ProjectArchive.read_members(check_path, ".jack"))
+        else:
+            if os.path.isdir(check_path):
+                paths_to_check = sorted(os.path.join(directory, filename)
+                                     for directory, _, filenames in os.walk(check_path)
+                                     for filename in filenames if filename.endswith(".jack"))
+            else:
+                paths_to_check = [check_path]
+            sources_to_check = []
+            for path in paths_to_check:
+                with open(path, 'r') as input_file:
+                    sources_to_check.append((path, input_file.read()))
+        check_job_server = JobServer.from_environment(arguments.jobs)
+        try:
+            check_diagnostics = check_sources(sources_to_check, check_job_server)
+        finally:
+            check_job_server.close()
+        for diagnostic in check_diagnostics:
+            print(diagnostic, file=sys.stderr)
+        check_errors = [diagnostic for diagnostic in check_diagnostics if diagnostic.severity == "error"]
+        print("check: checked {} file(s), found {} error(s) in {} file(s)".format(
+            len(sources_to_check), len(check_errors), len({diagnostic.source for diagnostic in check_errors})))
+        sys.exit(1 if check_errors else 0)
+    output_archive_path = arguments.output_archive
+    if is_archive_input and output_archive_path is None:
+        archive_stem, archive_suffix = ProjectArchive.split_suffix(arguments.input_path)
+        output_archive_path = archive_stem + (".vmb" if arguments.bytecode else ".vm") + archive_suffix
+    if output_archive_path is not None:
+        if ProjectArchive.archive_format(output_archive_path) is None:
+            parser.error("the output archive must end with one of " + ", ".join(ProjectArchive.formats_dictionary))
+        if arguments.watch or arguments.asm or arguments.report or arguments.index or arguments.deps:
+            parser.error("archives cannot be used with --watch, --asm, --report, --index or --deps")
+    enabled_passes = arguments.enable + ["cse"] * arguments.cse + ["licm"] * arguments.licm
+    disabled_passes = arguments.disable + ["slots"] * arguments.no_reuse_locals
+    if arguments.watch:
+        # the cached subroutines of a watched project would keep the values
+        # of calls to functions that changed since:
+        disabled_passes.append("evaluate")
+    profile = None
+    if arguments.profile is not None:
+        if arguments.watch:
+            parser.error("--watch compiles only the changed subroutines, and cannot be used with --profile")
+        try:
+            profile = ExecutionProfile.load(arguments.profile)
+        except (OSError, ValueError) as error:
+            parser.error("cannot read the profile: {}".format(error))
+        enabled_passes += ["inline", "layout"]
+    pass_manager = PassManager(arguments.level, enabled_passes, disabled_passes)
+    optimizations = [pass_manager]
+    intrinsic_rewrites = None
+    if arguments.intrinsics is not None:
+        intrinsic_rewrites = {name: 0 for name in arguments.intrinsics.split(",") if name}
+        for name in intrinsic_rewrites:
+            if name not in CompilationEngine.intrinsics_dictionary:
+                parser.error("unknown intrinsic {!r}".format(name))
+    argument_path = os.path.abspath(arguments.input_path)
+    project_directory = argument_path if os.path.isdir(argument_path) else os.path.dirname(argument_path)
+    # the whole program, without optimizations, for the passes that analyze it:
+    program_commands = None
+    if pass_manager.get("evaluate") is not None or profile is not None:
+        if is_archive_input:
+            program_commands = compile_program(ProjectArchive.read_members(argument_path, ".jack"))
+        else:
+            program_commands = compile_program(read_sources(sorted(
+                os.path.join(project_directory, filename)
+                for filename in os.listdir(project_directory) if filename.endswith(".jack"))), project_directory)
+
+    def configure_passes(new_pass_manager: PassManager, new_profile: typing.Optional[ExecutionProfile]) -> None:
+        """Gives the passes of a build their options, the profile and the
+        whole program."""
+        if new_pass_manager.get("unroll") is not None:
+            new_pass_manager.get("unroll").size_budget = arguments.unroll_budget
+            new_pass_manager.get("unroll").profile = new_profile
+        if new_pass_manager.get("evaluate") is not None:
+            new_pass_manager.get("evaluate").step_limit = arguments.evaluate_steps
+            new_pass_manager.get("evaluate").load_program(program_commands)
+        if new_pass_manager.get("inline") is not None:
+            new_pass_manager.get("inline").profile = new_profile
+            new_pass_manager.get("inline").load_program(program_commands or [])
+        if new_pass_manager.get("layout") is not None:
+            new_pass_manager.get("layout").profile = new_profile
+
+    configure_passes(pass_manager, profile)
+    index_path = None
+    project_index = None
+    if arguments.index:
+        index_path = os.path.join(project_directory, os.path.basename(project_directory) + ".jidx")
+        project_index = ProjectIndex.load(index_path)
+    graph_path = None
+    dependency_graph = None
+    if arguments.deps:
+        graph_path = os.path.join(project_directory, os.path.basename(project_directory) + ".deps.json")
+        dependency_graph = DependencyGraph.load(graph_path)
+    if arguments.watch:
+        watch(project_directory, optimizations, arguments.report, index_path=index_path, graph_path=graph_path,
+              intrinsic_rewrites=intrinsic_rewrites)
+        sys.exit(0)
     if os.path.isdir(argument_path):
         files_to_assemble = [
             os.path.join(argument_path, filename)
             for filename in os.listdir(argument_path)]
+        # classes whose files were deleted leave the index and the graph:
+        jack_classes = {os.path.splitext(filename)[0] for filename in os.listdir(argument_path)
+                        if filename.endswith(".jack")}
+        if project_index is not None:
+            for indexed_class in project_index.class_names():
+                if indexed_class not in jack_classes:
+                    project_index.remove(indexed_class)
+        if dependency_graph is not None:
+            for graph_class in dependency_graph.class_names():
+                if graph_class not in jack_classes:
+                    dependency_graph.remove(graph_class)
     else:
         files_to_assemble = [argument_path]
-    for input_path in files_to_assemble:
-        filename, extension = os.path.splitext(input_path)
-        if extension.lower() != ".jack":
+    # the .jack files of the build:
+    jack_paths = sorted(input_path for input_path in files_to_assemble if input_path.lower().endswith(".jack"))
+
+    def open_output(path: str, binary: bool = False):
+        """Opens an output file in memory, so it is only written once it is
+        complete, and only if it changed when only changed files are written."""
+        output_files.append(OutputFile(path, binary, arguments.if_changed))
+        return output_files[-1]
+
+    # the output files that were opened:
+    output_files = []
+    if arguments.asm:
+        if os.path.isdir(argument_path):
+            asm_path = os.path.join(argument_path, os.path.basename(argument_path) + ".asm")
+        else:
+            asm_path = os.path.splitext(argument_path)[0] + ".asm"
+        try:
+            with open_output(asm_path) as asm_file:
+                compile_files_to_hack(files_to_assemble, asm_file, optimizations, project_index, dependency_graph,
+                                      intrinsic_rewrites)
+        except CompilationError as error:
+            sys.exit("\n".join(str(diagnostic) for diagnostic in error.diagnostics))
+        files_to_assemble = []
+    has_errors = False
+    if output_archive_path is not None:
+        if is_archive_input:
+            sources = ProjectArchive.read_members(argument_path, ".jack")
+        else:
+            sources = read_sources(jack_paths)
+        with open_output(output_archive_path, binary=True) as archive_file, \
+                ProjectArchive(archive_file, ProjectArchive.archive_format(output_archive_path)) as output_archive:
+            archive_diagnostics = compile_to_archive(sources, output_archive, optimizations, arguments.bytecode,
+                                                     intrinsic_rewrites)
+        for diagnostic in archive_diagnostics:
+            print(diagnostic, file=sys.stderr)
+        has_errors = bool(archive_diagnostics)
+        files_to_assemble = []
+    # the .vm or .vmb files to write reports of, once the whole program is written:
+    written_outputs = []
+    # was every output file the jobs wrote in memory replaced:
+    compiled_changes = []
+    jack_inputs = [input_path for input_path in files_to_assemble if input_path.lower().endswith(".jack")]
+    if jack_inputs:
+        job_server = JobServer.from_environment(arguments.jobs)
+        try:
+            compiled = compile_files(jack_inputs, job_server, optimizations, arguments.bytecode,
+                                     arguments.if_changed, project_index, dependency_graph, intrinsic_rewrites)
+        finally:
+            job_server.close()
+    else:
+        compiled = []
+    for input_path, (output_path, diagnostics, changed) in zip(jack_inputs, compiled):
+        if diagnostics:
+            for diagnostic in diagnostics:
+                print(diagnostic, file=sys.stderr)
+            has_errors = True
             continue
-        output_path = filename + ".vm"
-        with open(input_path, 'r') as input_file, \
-                open(output_path, 'w') as output_file:
-            compile_file(input_file, output_file)
+        compiled_changes.append(changed)
+        if arguments.report:
+            written_outputs.append(output_path)
+        if dependency_graph is not None:
+            # the rule names the files as the input path does, so make matches them:
+            write_dependencies(dependency_graph, os.path.basename(os.path.splitext(input_path)[0]),
+                               output_path if os.path.isabs(arguments.input_path) else os.path.relpath(output_path))
+    if written_outputs:
+        program_commands = load_program(project_directory, ".vmb" if arguments.bytecode else ".vm")
+        for output_path in written_outputs:
+            write_report(output_path, arguments.if_changed, program_commands)
+    if project_index is not None:
+        project_index.save(index_path)
+    if dependency_graph is not None:
+        dependency_graph.save(graph_path)
+    if pass_manager.get("inline") is not None:
+        inlined = pass_manager.get("inline").inlined
+        print("inline: inlined {} call site(s) of {} function(s)".format(sum(inlined.values()), len(inlined)))
+        for function_name, n_sites in sorted(inlined.items()):
+            print("  {:<40} {:>6}".format(function_name, n_sites))
+    if pass_manager.get("cse") is not None:
+        print("cse: eliminated {} repeated subexpressions".format(pass_manager.get("cse").eliminated))
+    if pass_manager.get("licm") is not None:
+        print("licm: hoisted {} loop-invariant expressions".format(pass_manager.get("licm").hoisted))
+    if pass_manager.get("unroll") is not None:
+        print("unroll: unrolled {} loop(s) fully and {} partially".format(
+            pass_manager.get("unroll").unrolled, pass_manager.get("unroll").partially_unrolled))
+    if pass_manager.get("propagate") is not None:
+        eliminated_loads = pass_manager.get("propagate").eliminated_loads
+        print("propagate: eliminated {} load(s) in {} function(s)".format(
+            sum(eliminated_loads.values()), len(eliminated_loads)))
+        for function_name, n_loads in sorted(eliminated_loads.items()):
+            print("  {:<40} {:>6}".format(function_name, n_loads))
+    if pass_manager.get("evaluate") is not None:
+        evaluated = pass_manager.get("evaluate").evaluated
+        print("evaluate: replaced {} call(s) of {} pure function(s) with constants, {} call(s) over the step "
+              "limit".format(sum(evaluated.values()), len(evaluated), pass_manager.get("evaluate").steps_exceeded))
+        for function_name, n_calls in sorted(evaluated.items()):
+            print("  {:<40} {:>6}".format(function_name, n_calls))
+    if pass_manager.get("strength") is not None:
+        strength_reducer = pass_manager.get("strength")
+        print("strength: reduced {} address(es) in loops ({} loop test(s) moved), folded {} zero offset(s), "
+              "computed {} array write(s) value first, reused pointer 1 {} time(s)".format(
+                  strength_reducer.reduced, strength_reducer.tests_replaced, strength_reducer.folded,
+                  strength_reducer.stores, strength_reducer.pointer_reuses))
+    if pass_manager.get("layout") is not None:
+        print("layout: laid out {} if statement(s) and rotated {} loop(s) by the profile".format(
+            pass_manager.get("layout").laid_out, pass_manager.get("layout").rotated))
+    if profile is not None:
+        # the gains of the profile, against the same build without it:
+        if is_archive_input:
+            profiled_sources = list(ProjectArchive.read_members(argument_path, ".jack"))
+        else:
+            profiled_sources = list(read_sources(jack_paths))
+        baseline_pass_manager = PassManager(arguments.level, enabled_passes, disabled_passes + ["inline", "layout"])
+        profiled_pass_manager = PassManager(arguments.level, enabled_passes, disabled_passes)
+        configure_passes(baseline_pass_manager, None)
+        configure_passes(profiled_pass_manager, profile)
+        # the intrinsics of these builds are not counted again:
+        baseline_cost = profile.estimate_cost(compile_program(
+            profiled_sources, optimizations=[baseline_pass_manager],
+            intrinsic_rewrites=None if intrinsic_rewrites is None else dict(intrinsic_rewrites)))
+        profiled_cost = profile.estimate_cost(compile_program(
+            profiled_sources, optimizations=[profiled_pass_manager],
+            intrinsic_rewrites=None if intrinsic_rewrites is None else dict(intrinsic_rewrites)),
+            profiled_pass_manager.get("inline").inlined_calls)
+        unroll = pass_manager.get("unroll")
+        if unroll is not None:
+            print("profile: gave {} hot loop(s) {} times the unroll budget, and did not unroll {} loop(s) that did "
+                  "not run".format(unroll.hot_loops, unroll.hot_budget_factor, unroll.cold_loops))
+        print("profile: estimated {:.0f} Hack instructions in the profiled runs, {:.0f} without the profile "
+              "({:+.1f}%)".format(profiled_cost, baseline_cost,
+                                  100 * (profiled_cost - baseline_cost) / baseline_cost if baseline_cost else 0.0))
+    if intrinsic_rewrites is not None:
+        print("intrinsics: expanded {} call(s) inline{}".format(
+            sum(intrinsic_rewrites.values()),
+            "".join(", {} {}".format(name, count) for name, count in intrinsic_rewrites.items() if count)))
+    if arguments.time_passes:
+        pass_manager.write_report(sys.stdout)
+    if arguments.if_changed:
+        changes = [output_file.changed for output_file in output_files] + compiled_changes
+        print("if-changed: wrote {} file(s), {} unchanged".format(
+            sum(changed is True for changed in changes), sum(changed is False for changed in changes)))
+    if has_errors:
+        sys.exit(1)
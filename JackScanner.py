@@ -0,0 +1,163 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import re
+from Diagnostic import Diagnostic
+
+
+class JackScanner:
+    """A table-driven scanner of Jack source code: the "dfa" backend of
+    JackTokenizer.
+
+    The scanner reads the source once, from left to right, as a DFA whose
+    states are the kinds of tokens. The class of the first character of a
+    token, looked up in a table of characters (characters outside it are
+    classified once and remembered), picks the state that reads the rest of
+    it: a symbol, a run of whitespace, a word, an integer, a string or a
+    comment. A state never goes back, so it reads its whole run at once: the
+    runs of whitespace, words and integers are matched by a precompiled
+    pattern of a single character class, and the bodies of comments and
+    strings are skipped with a single search for their end. Only the tokens
+    themselves are sliced out of the source.
+
+    The tokens, lines and diagnostics are exactly those of the "regex"
+    backend of JackTokenizer (see tests/test_tokenizer_backends.py).
+    """
+    # the classes of characters:
+    OTHER, SPACE, DIGIT, WORD, QUOTE, SLASH, SYMBOL = range(7)
+
+    # the runs of the states that read more than a single character:
+    space_run = re.compile(r'\s+')
+    word_run = re.compile(r'\w+')
+    digit_run = re.compile(r'\d+')
+
+    def __init__(self, keywords: set, regex_for_symbols: str, max_integer_constant: int) -> None:
+        """Creates a new scanner.
+
+        Args:
+            keywords (set): the keywords of the jack language.
+            regex_for_symbols (str): the pattern of a single symbol.
+            max_integer_constant (int): the largest integer constant.
+        """
+        self.keywords = keywords
+        self.max_integer_constant = max_integer_constant
+        self._symbols_pattern = re.compile(regex_for_symbols)
+        # maps every character that was seen, starting with the first 256,
+        # to its class:
+        self.character_classes = {chr(code): self._classify(chr(code)) for code in range(256)}
+
+    def scan(self, text: str) -> tuple:
+        """
+        Args:
+            text (str): Jack source code.
+
+        Returns:
+            tuple: (tokens, lines, diagnostics): the (type, value) tokens of the
+            text, the line of every token, and the lexical errors.
+        """
+        character_classes = self.character_classes
+        keywords = self.keywords
+        match_space = self.space_run.match
+        match_word = self.word_run.match
+        match_digits = self.digit_run.match
+        SPACE, DIGIT, WORD, QUOTE, SLASH, SYMBOL = \
+            self.SPACE, self.DIGIT, self.WORD, self.QUOTE, self.SLASH, self.SYMBOL
+        length = len(text)
+        tokens = []
+        lines = []
+        add_token = tokens.append
+        add_line = lines.append
+        diagnostics = []
+        line = 1
+        position = 0
+        while position < length:
+            character = text[position]
+            character_class = character_classes.get(character)
+            if character_class is None:
+                character_class = character_classes[character] = self._classify(character)
+
+            if character_class == SYMBOL:
+                add_token(("SYMBOL", character))
+                add_line(line)
+                position += 1
+
+            elif character_class == SPACE:
+                end = match_space(text, position).end()
+                line += text.count('\n', position, end)
+                position = end
+
+            elif character_class == WORD:
+                end = match_word(text, position).end()
+                word = text[position:end]
+                add_token(("KEYWORD" if word in keywords else "IDENTIFIER", word))
+                add_line(line)
+                position = end
+
+            elif character_class == DIGIT:
+                end = match_digits(text, position).end()
+                word = text[position:end]
+                if int(word) > self.max_integer_constant:
+                    diagnostics.append(Diagnostic("error", "integer constant {} is larger than {}".format(
+                        word, self.max_integer_constant), line))
+                add_token(("INT_CONST", word))
+                add_line(line)
+                position = end
+
+            elif character_class == QUOTE:
+                quote = text.find('"', position + 1)
+                newline = text.find('\n', position + 1)
+                if quote != -1 and (newline == -1 or quote < newline):
+                    add_token(("STRING_CONST", text[position + 1:quote]))
+                    add_line(line)
+                    position = quote + 1
+                else:
+                    diagnostics.append(Diagnostic("error", "unterminated string constant", line))
+                    position = length if newline == -1 else newline
+
+            elif character_class == SLASH and text.startswith("//", position):
+                newline = text.find('\n', position + 2)
+                position = length if newline == -1 else newline
+
+            elif character_class == SLASH and text.startswith("/*", position):
+                end = text.find("*/", position + 2)
+                if end == -1:
+                    diagnostics.append(Diagnostic("error", "unterminated comment", line))
+                    break
+                line += text.count('\n', position, end)
+                position = end + 2
+
+            elif character_class == SLASH:
+                add_token(("SYMBOL", character))
+                add_line(line)
+                position += 1
+
+            else:
+                diagnostics.append(Diagnostic("error", "unexpected character {!r}".format(character), line))
+                position += 1
+        return tokens, lines, diagnostics
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    def _classify(self, character: str) -> int:
+        """
+        Returns:
+            int: the class of the character, as the patterns of the regex
+            backend see it.
+        """
+        if re.match(r'\s', character):
+            return self.SPACE
+        if re.match(r'\d', character):
+            return self.DIGIT
+        if re.match(r'\w', character):
+            return self.WORD
+        if character == '"':
+            return self.QUOTE
+        if character == '/':
+            return self.SLASH
+        if self._symbols_pattern.match(character):
+            return self.SYMBOL
+        return self.OTHER
@@ -0,0 +1,223 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import concurrent.futures
+import os
+import re
+import stat
+import sys
+import typing
+
+
+class JobServer:
+    """Runs jobs in worker processes, in as many job slots as the build may
+    use.
+
+    When "make -jN" runs the compiler, make advertises its jobserver in
+    MAKEFLAGS: a pipe ("--jobserver-auth=R,W", or "--jobserver-fds=R,W"
+    before GNU make 4.2) or a named FIFO ("--jobserver-auth=fifo:PATH",
+    since GNU make 4.4) holding a token byte for every free job slot. Every
+    process make runs owns a single implicit slot, so the first job runs
+    without a token, and every job that runs beside it first reads a token
+    and writes the same byte back once it ends. A token is only taken
+    without waiting, so the running jobs go on while every slot is busy.
+
+    Outside make, or when make runs jobs one at a time, the jobs run in up
+    to n_workers processes of their own. When make advertises a jobserver
+    the compiler cannot open, such as from a rule that is not marked with
+    "+", or cannot read without blocking, the jobs run one at a time, as
+    GNU make asks of its sub-makes.
+    """
+    # the option of MAKEFLAGS that advertises the jobserver. make passes the
+    # option on to every sub-make, so the last one is the jobserver of the
+    # make that runs the compiler:
+    auth_pattern = re.compile(r"--jobserver-(?:auth|fds)=(\S+)")
+
+    # the seconds between two attempts to take a token while jobs wait for
+    # a free slot:
+    poll_interval = 0.05
+
+    def __init__(self, n_workers: int, read_fd: typing.Optional[int] = None,
+                 write_fd: typing.Optional[int] = None) -> None:
+        """Creates the job slots of a build.
+
+        Args:
+            n_workers (int): the maximal number of jobs that run at once.
+            read_fd (int): the nonblocking file descriptor tokens are read
+            from, or None for no jobserver.
+            write_fd (int): the file descriptor tokens are written back to.
+        """
+        self.n_workers = max(1, n_workers)
+        self._read_fd = read_fd
+        self._write_fd = write_fd
+        # the file descriptors the job server opened, and closes:
+        self._opened_fds = []
+
+    @classmethod
+    def from_environment(cls, n_workers: typing.Optional[int] = None,
+                         makeflags: typing.Optional[str] = None) -> "JobServer":
+        """
+        Args:
+            n_workers (int): the maximal number of jobs that run at once, or
+            None for the number of CPUs.
+            makeflags (str): the flags make passes to the compiler, by default
+            the MAKEFLAGS environment variable.
+
+        Returns:
+            JobServer: the job slots of the jobserver of the make that runs
+            the compiler, if any, and otherwise n_workers slots of its own.
+        """
+        if n_workers is None:
+            n_workers = os.cpu_count() or 1
+        if makeflags is None:
+            makeflags = os.environ.get("MAKEFLAGS", "")
+        auths = cls.auth_pattern.findall(makeflags)
+        if not auths or n_workers <= 1:
+            return cls(n_workers)
+        auth = auths[-1]
+        try:
+            if auth.startswith("fifo:"):
+                job_server = cls._open_fifo(n_workers, auth[len("fifo:"):])
+            else:
+                read_fd, write_fd = (int(fd) for fd in auth.split(","))
+                job_server = cls._open_pipe(n_workers, read_fd, write_fd)
+        except (OSError, ValueError):
+            job_server = None
+        if job_server is None:
+            print("JackCompiler: warning: the make jobserver is not available, compiling one file at a time "
+                  "(add '+' to the make rule)", file=sys.stderr)
+            return cls(1)
+        return job_server
+
+    def uses_make(self) -> bool:
+        """
+        Returns:
+            bool: are the job slots taken from the jobserver of make?
+        """
+        return self._read_fd is not None
+
+    def map(self, function: typing.Callable, arguments: typing.Iterable,
+            initializer: typing.Optional[typing.Callable] = None, initargs: tuple = ()) -> list:
+        """Runs a function on every argument, as a job in a worker process.
+
+        A single job, or a single slot, runs the function in this process.
+
+        Args:
+            function (typing.Callable): a function of a module, so it can be
+            run in another process.
+            arguments (typing.Iterable): the argument of every job.
+            initializer (typing.Callable): if given, every worker process
+            calls it with initargs before it runs jobs, and so does this
+            process if it runs the jobs.
+            initargs (tuple): the arguments of initializer.
+
+        Returns:
+            list: what the function returned for every argument, in their
+            order.
+        """
+        arguments = list(arguments)
+        n_workers = min(self.n_workers, len(arguments))
+        if n_workers <= 1:
+            if initializer is not None:
+                initializer(*initargs)
+            return [function(argument) for argument in arguments]
+        results = [None] * len(arguments)
+        # maps every running job to its index and its token, which is None
+        # for the implicit slot:
+        running = {}
+        try:
+            with concurrent.futures.ProcessPoolExecutor(n_workers, initializer=initializer,
+                                                        initargs=initargs) as executor:
+                next_index = 0
+                while next_index < len(arguments) or running:
+                    while next_index < len(arguments) and len(running) < n_workers:
+                        token = None
+                        if any(running_token is None for _, running_token in running.values()):
+                            token = self._acquire()
+                            if token is None:
+                                break
+                        running[executor.submit(function, arguments[next_index])] = next_index, token
+                        next_index += 1
+                    is_waiting_for_slot = next_index < len(arguments) and len(running) < n_workers
+                    done, _ = concurrent.futures.wait(
+                        running, self.poll_interval if is_waiting_for_slot else None,
+                        concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        index, token = running.pop(future)
+                        self._release(token)
+                        results[index] = future.result()
+        finally:
+            # the tokens of jobs that were stopped by an error go back to make:
+            for _, token in running.values():
+                self._release(token)
+        return results
+
+    def close(self) -> None:
+        """Closes the file descriptors the job server opened."""
+        for fd in self._opened_fds:
+            os.close(fd)
+        self._opened_fds = []
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    @classmethod
+    def _open_fifo(cls, n_workers: int, path: str) -> typing.Optional["JobServer"]:
+        """
+        Returns:
+            JobServer: the job slots of the jobserver FIFO at the given path,
+            or None if it is not a FIFO.
+        """
+        if not stat.S_ISFIFO(os.stat(path).st_mode):
+            return None
+        read_fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        write_fd = os.open(path, os.O_WRONLY)
+        job_server = cls(n_workers, read_fd, write_fd)
+        job_server._opened_fds = [read_fd, write_fd]
+        return job_server
+
+    @classmethod
+    def _open_pipe(cls, n_workers: int, read_fd: int, write_fd: int) -> typing.Optional["JobServer"]:
+        """
+        Returns:
+            JobServer: the job slots of the jobserver pipe make passed as the
+            given file descriptors, or None if they are not a pipe, since make
+            closed them, or the pipe cannot be read without blocking.
+        """
+        if not stat.S_ISFIFO(os.fstat(read_fd).st_mode) or not stat.S_ISFIFO(os.fstat(write_fd).st_mode):
+            return None
+        # make and the other jobs read the same pipe, so it is not made
+        # nonblocking for all of them: on Linux it is opened again, as a
+        # nonblocking file of its own. Where it cannot be, a blocking read
+        # could take a token another job was just given and stop the whole
+        # build, so the jobs run one at a time instead:
+        try:
+            own_read_fd = os.open("/proc/self/fd/{}".format(read_fd), os.O_RDONLY | os.O_NONBLOCK)
+        except OSError:
+            return None
+        job_server = cls(n_workers, own_read_fd, write_fd)
+        job_server._opened_fds = [own_read_fd]
+        return job_server
+
+    def _acquire(self) -> typing.Optional[bytes]:
+        """
+        Returns:
+            bytes: a token of a free job slot, which is empty outside make, or
+            None if every slot is busy.
+        """
+        if self._read_fd is None:
+            return b""
+        try:
+            # an empty read is a jobserver that was closed:
+            return os.read(self._read_fd, 1) or None
+        except (BlockingIOError, InterruptedError):
+            return None
+
+    def _release(self, token: typing.Optional[bytes]) -> None:
+        """Gives the token of a job slot back, unless it is the implicit slot
+        or there is no jobserver."""
+        if token:
+            os.write(self._write_fd, token)
@@ -0,0 +1,106 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+from ControlFlowGraph import ControlFlowGraph
+
+
+class LocalSlotAllocator:
+    """An optimization that lets locals whose live ranges do not overlap
+    share a single "local" slot, which lowers the number of locals the
+    "function" command declares. The VM initializes every declared local on
+    every call, so fewer locals make function entry cheaper and frames
+    smaller.
+
+    A local that is read before it is written relies on the zero the VM
+    initializes it with. Such a local is live from the start of the function,
+    so it never shares a slot with a local that is written while it is live.
+    """
+    # the name, representation and dependencies of the pass (see PassManager).
+    # The locals other passes add get slots as well:
+    name = "slots"
+    representation = "ir"
+    depends_on = ("inline", "cse", "licm", "unroll", "propagate", "strength", "layout")
+
+    def __init__(self) -> None:
+        """Creates a new allocator."""
+        # the number of local slots removed from all the optimized functions:
+        self.slots_saved = 0
+
+    def run(self, commands: list) -> list:
+        """
+        Args:
+            commands (list): the commands of a single function, starting with
+            its "function" command.
+
+        Returns:
+            list: the commands of the function, with local slots reassigned.
+        """
+        _, name, n_locals = commands[0]
+        if n_locals == 0:
+            return commands
+        interference = self._build_interference(commands)
+        slots = self._assign_slots(interference)
+        new_n_locals = max(slots.values()) + 1 if slots else 0
+        self.slots_saved += n_locals - new_n_locals
+        new_commands = [("function", name, new_n_locals)]
+        for command in commands[1:]:
+            if len(command) == 3 and command[1] == "local":
+                command = (command[0], "local", slots[command[2]])
+            new_commands.append(command)
+        return new_commands
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    @staticmethod
+    def _build_interference(commands: list) -> dict:
+        """
+        Args:
+            commands (list): the commands of a single function.
+
+        Returns:
+            dict: maps every local the function uses to the set of locals it
+            may not share a slot with.
+        """
+        graph = ControlFlowGraph(commands)
+        _, live_out = graph.live_locals()
+        interference = {}
+        for block_index in range(len(graph.blocks)):
+            live = set(live_out[block_index])
+            # walks the block backwards, keeping the set of live locals:
+            for command in reversed(graph.block_commands(block_index)):
+                if len(command) != 3 or command[1] != "local":
+                    continue
+                local_index = command[2]
+                neighbours = interference.setdefault(local_index, set())
+                if command[0] == "pop":
+                    live.discard(local_index)
+                    for other_index in live:
+                        neighbours.add(other_index)
+                        interference.setdefault(other_index, set()).add(local_index)
+                else:
+                    live.add(local_index)
+        return interference
+
+    @staticmethod
+    def _assign_slots(interference: dict) -> dict:
+        """
+        Args:
+            interference (dict): as returned by _build_interference.
+
+        Returns:
+            dict: maps every local to its new slot. Locals are assigned in
+            the order of their original index, each to the lowest slot none of
+            its interfering locals was assigned.
+        """
+        slots = {}
+        for local_index in sorted(interference):
+            taken_slots = {slots[other] for other in interference[local_index] if other in slots}
+            slot = 0
+            while slot in taken_slots:
+                slot += 1
+            slots[local_index] = slot
+        return slots
@@ -0,0 +1,206 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+from BlockExpressions import BlockExpressions
+from ControlFlowGraph import ControlFlowGraph
+from VMReport import VMReport
+
+
+class LoopInvariantCodeMotion:
+    """An optimization that computes the pure expressions a loop does not
+    change once, in a preheader before the loop, and keeps their values in new
+    locals.
+
+    A loop is a "label" together with a later "goto" back to it, such as the
+    loops compile_while emits, that is only entered through its label. An
+    expression is invariant if every variable it reads is not written in the
+    loop. Fields, statics and array elements are only invariant in loops
+    that neither write memory nor call functions that are not pure, so in
+    such loops field and static reads are replaced by locals as part of the
+    hoisted expressions. An expression is hoisted only if it costs more than
+    pushing a local, so a lone field or static read, which costs the same as
+    or less than a local read, stays in the loop.
+
+    The preheader runs even if the loop runs zero times, so functions that
+    may fail, like Math.divide, are never hoisted.
+    """
+    # the name, representation and dependencies of the pass (see PassManager).
+    # Expressions a block repeats are eliminated before they are hoisted:
+    name = "licm"
+    representation = "ir"
+    depends_on = ("cse",)
+
+    # pure functions that may fail and so may not run more often than
+    # the program asks for:
+    unsafe_functions = {"Math.divide"}
+
+    # the estimated cost of pushing a local, which replaces a hoisted
+    # expression in the loop:
+    reuse_cost = VMReport.command_cost(("push", "local", 0))
+
+    def __init__(self, pure_functions: dict = None) -> None:
+        """Creates a new optimization.
+
+        Args:
+            pure_functions (dict): maps the names of the functions that compute
+            a value without side effects to their number of arguments. The
+            default is BlockExpressions.default_pure_functions.
+        """
+        self.pure_functions = pure_functions
+        # the number of expressions hoisted from all optimized functions:
+        self.hoisted = 0
+
+    def run(self, commands: list) -> list:
+        """
+        Args:
+            commands (list): the commands of a single function, starting with
+            its "function" command.
+
+        Returns:
+            list: the commands of the function, with loop-invariant
+            expressions computed before their loops.
+        """
+        # inner loops first, so what is hoisted from them may be hoisted
+        # again from their outer loops:
+        for label in self._loop_labels(commands):
+            commands = self._hoist(commands, label)
+        return commands
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    @staticmethod
+    def _loop_labels(commands: list) -> list:
+        """
+        Returns:
+            list: the labels that start loops, inner loops first.
+        """
+        label_indices = {}
+        loops = {}
+        for index, command in enumerate(commands):
+            if command[0] == "label":
+                label_indices[command[1]] = index
+            elif command[0] == "goto" and command[1] in label_indices:
+                loops[command[1]] = index - label_indices[command[1]]
+        return sorted(loops, key=lambda label: loops[label])
+
+    @staticmethod
+    def _find_loop(commands: list, label: str) -> tuple:
+        """
+        Returns:
+            tuple: (header, back_edge), the indices of the label of the loop and
+            of the last "goto" back to it, or None if the loop may be entered
+            other than through its label.
+        """
+        header = commands.index(("label", label))
+        back_edge = max(index for index, command in enumerate(commands)
+                        if command == ("goto", label) and index > header)
+        if commands[header - 1][0] in ("goto", "return"):
+            return None
+        inner_labels = {command[1] for command in commands[header + 1:back_edge + 1]
+                        if command[0] == "label"}
+        for index, command in enumerate(commands):
+            if command[0] not in ("goto", "if-goto") or header < index <= back_edge:
+                continue
+            if command[1] == label or command[1] in inner_labels:
+                return None
+        return header, back_edge
+
+    def _hoist(self, commands: list, label: str) -> list:
+        """
+        Returns:
+            list: the commands of the function, with the invariant expressions
+            of the loop that starts at the given label hoisted.
+        """
+        loop = self._find_loop(commands, label)
+        if loop is None:
+            return commands
+        header, back_edge = loop
+        written, memory_written = self._find_writes(commands[header + 1:back_edge])
+        ranges = []
+        for start, end in ControlFlowGraph(commands).blocks:
+            if header <= start and end <= back_edge + 1:
+                expressions = BlockExpressions(commands, start, end, self.pure_functions)
+                ranges.extend(self._invariant_ranges(expressions, written, memory_written))
+        selected = []
+        for start, end in sorted(ranges, key=lambda node_range: (node_range[0], -node_range[1])):
+            if selected and start < selected[-1][1]:
+                continue
+            if VMReport.estimate_hack_cost(commands[start:end]) > self.reuse_cost:
+                selected.append((start, end))
+        if not selected:
+            return commands
+
+        _, name, n_locals = commands[0]
+        preheader = []
+        expression_locals = {}
+        replacements = {}
+        for start, end in selected:
+            expression = tuple(commands[start:end])
+            if expression not in expression_locals:
+                expression_locals[expression] = n_locals
+                preheader.extend(expression)
+                preheader.append(("pop", "local", n_locals))
+                n_locals += 1
+            replacements[start] = (end, ("push", "local", expression_locals[expression]))
+        self.hoisted += len(expression_locals)
+
+        new_commands = [("function", name, n_locals)] + commands[1:header] + preheader
+        index = header
+        while index < len(commands):
+            if index in replacements:
+                index, replacement = replacements[index]
+                new_commands.append(replacement)
+            else:
+                new_commands.append(commands[index])
+                index += 1
+        return new_commands
+
+    def _find_writes(self, loop_commands: list) -> tuple:
+        """
+        Returns:
+            tuple: (written, memory_written): the set of (segment, index)
+            variables the loop writes, and whether it may write memory.
+        """
+        pure_functions = BlockExpressions.default_pure_functions \
+            if self.pure_functions is None else self.pure_functions
+        written = set()
+        memory_written = False
+        for command in loop_commands:
+            if command[0] == "pop":
+                written.add((command[1], command[2]))
+                if command[1] in BlockExpressions.memory_segments or command[1:] == ("pointer", 0):
+                    memory_written = True
+            elif command[0] == "call" and pure_functions.get(command[1]) != command[2]:
+                memory_written = True
+        return written, memory_written
+
+    def _invariant_ranges(self, expressions: BlockExpressions, written: set, memory_written: bool) -> list:
+        """
+        Returns:
+            list: the (start, end) ranges of the computations of the block that
+            read nothing the loop changes.
+        """
+        invariant = []
+        for node_id, key in enumerate(expressions.keys):
+            if key[0] == "push":
+                segment, index = key[1], key[2]
+                if segment == "constant":
+                    is_invariant = True
+                elif segment in ("local", "argument"):
+                    is_invariant = (segment, index) not in written
+                elif segment in BlockExpressions.memory_segments or segment == "pointer":
+                    is_invariant = not memory_written and (segment, index) not in written
+                else:
+                    is_invariant = False
+            elif key[0] == "load":
+                is_invariant = not memory_written and invariant[key[1]]
+            elif key[0] == "call" and key[1] in self.unsafe_functions:
+                is_invariant = False
+            else:
+                is_invariant = all(invariant[child] for child in expressions.children(node_id))
+            invariant.append(is_invariant)
+        return [(start, end) for node_id, start, end in expressions.occurrences if invariant[node_id]]
@@ -0,0 +1,279 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from VMReport import VMReport
+
+
+class LoopUnroller:
+    """An optimization that unrolls while loops whose number of iterations is
+    known at compile time, so they do not test their condition and jump back
+    on every iteration.
+
+    The loops are the ones compile_while emits for a counter local, such as
+    "while (i < 8) { ...; let i = i + 1; }":
+
+        label L; push local i; push constant N; lt; not; if-goto END
+        ...; push local i; push constant S; add; pop local i; goto L
+        label END
+
+    where the condition is "lt" or "gt", N may be negated, the step is an
+    "add" or a "sub" of a constant, the loop writes the counter only in its
+    last statement, and the loop is only entered through its label. The
+    value of the counter before the loop must be a constant the straight-line
+    code before the loop gives it, or the 0 the VM initializes locals with.
+    The iterations are counted by running the counter with the 16-bit
+    arithmetic of the VM.
+
+    A loop is unrolled fully when all its iterations fit in the code-size
+    budget, in estimated Hack instructions (see VMReport). Otherwise it is
+    unrolled partially: the body is repeated k times in the loop, and the
+    remaining iterations run once before it, so the condition is only tested
+    every k iterations, with the largest k that fits in the budget. The
+    labels of every copy of the body get the number of the copy as a suffix,
+    and the label the loop ends at gets ":k", so its profiled branch counts
+    are looked up per k iterations (see ExecutionProfile).
+
+    Given an execution profile (see ExecutionProfile), a loop whose body
+    did not run in the profiled runs is not unrolled, and a loop whose body
+    ran at least ExecutionProfile.hot_count times gets hot_budget_factor
+    times the budget.
+    """
+    # the name, representation and dependencies of the pass (see PassManager).
+    # Invariant expressions are hoisted before the body is copied:
+    name = "unroll"
+    representation = "ir"
+    depends_on = ("cse", "licm")
+
+    # the default code-size budget of a single unrolled loop, in estimated
+    # Hack instructions:
+    default_size_budget = 512
+
+    # the number of iterations after which the counter is assumed to never
+    # end the loop:
+    max_iterations = 1 << 16
+
+    # how many times the budget of a loop is, when it is hot:
+    hot_budget_factor = 4
+
+    def __init__(self, size_budget: int = default_size_budget) -> None:
+        """Creates a new optimization.
+
+        Args:
+            size_budget (int): the maximal estimated Hack instructions of the
+            copies of the body of a single unrolled loop.
+        """
+        self.size_budget = size_budget
+        # the ExecutionProfile of the program, or None to unroll by the
+        # budget alone:
+        self.profile = None
+        # the number of loops unrolled fully and partially in all the
+        # optimized functions:
+        self.unrolled = 0
+        self.partially_unrolled = 0
+        # the number of counted loops the profile showed are hot, and did
+        # not run:
+        self.hot_loops = 0
+        self.cold_loops = 0
+
+    def run(self, commands: list) -> list:
+        """
+        Args:
+            commands (list): the commands of a single function, starting with
+            its "function" command.
+
+        Returns:
+            list: the commands of the function, with its counted loops
+            unrolled.
+        """
+        # inner loops first, so their copies are unrolled into the outer loops:
+        for label in self._loop_labels(commands):
+            if ("label", label) in commands:
+                commands = self._unroll(commands, label)
+        return commands
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    @staticmethod
+    def _loop_labels(commands: list) -> list:
+        """
+        Returns:
+            list: the labels that start loops, inner loops first.
+        """
+        label_indices = {}
+        loops = {}
+        for index, command in enumerate(commands):
+            if command[0] == "label":
+                label_indices[command[1]] = index
+            elif command[0] == "goto" and command[1] in label_indices:
+                loops[command[1]] = index - label_indices[command[1]]
+        return sorted(loops, key=lambda label: loops[label])
+
+    @staticmethod
+    def _to_word(value: int) -> int:
+        """
+        Returns:
+            int: the value as a 16-bit two's complement word.
+        """
+        return (value + 0x8000) % 0x10000 - 0x8000
+
+    @staticmethod
+    def _constant(commands: list, index: int) -> tuple:
+        """
+        Returns:
+            tuple: (value, length): the constant the commands push starting at
+            the given index, and the number of commands that push it, or
+            (None, 0) if they do not push a constant.
+        """
+        if index >= len(commands) or commands[index][:2] != ("push", "constant"):
+            return None, 0
+        if index + 1 < len(commands) and commands[index + 1] == ("neg",):
+            return -int(commands[index][2]), 2
+        return int(commands[index][2]), 1
+
+    def _match(self, commands: list, label: str) -> typing.Optional[tuple]:
+        """
+        Returns:
+            tuple: (header, body_start, back_edge, counter, bound, comparison,
+            step) of the counted loop that starts at the given label, or None
+            if it is not a loop this pass unrolls.
+        """
+        header = commands.index(("label", label))
+        if header < 1 or commands[header - 1][0] in ("goto", "return"):
+            return None
+        counter = commands[header + 1] if header + 1 < len(commands) else None
+        if counter is None or counter[:2] != ("push", "local"):
+            return None
+        bound, length = self._constant(commands, header + 2)
+        condition = header + 2 + length
+        if bound is None or len(commands) < condition + 3 or commands[condition][0] not in ("lt", "gt") \
+                or commands[condition + 1] != ("not",) or commands[condition + 2][0] != "if-goto":
+            return None
+        end_label = commands[condition + 2][1]
+        body_start = condition + 3
+        back_edges = [index for index, command in enumerate(commands) if command == ("goto", label)]
+        if len(back_edges) != 1 or back_edges[0] < body_start + 4:
+            return None
+        back_edge = back_edges[0]
+        if back_edge + 1 >= len(commands) or commands[back_edge + 1] != ("label", end_label):
+            return None
+        increment = commands[back_edge - 4:back_edge]
+        if increment[0] != counter or increment[1][:2] != ("push", "constant") \
+                or increment[2][0] not in ("add", "sub") or increment[3] != ("pop", "local", counter[2]):
+            return None
+        step = int(increment[1][2]) if increment[2][0] == "add" else -int(increment[1][2])
+        # the counter is only written by the increment, and the loop is only
+        # entered through its label and left through its condition:
+        if ("pop", "local", counter[2]) in commands[body_start:back_edge - 1]:
+            return None
+        inner_labels = {command[1] for command in commands[header:back_edge + 2] if command[0] == "label"}
+        for index, command in enumerate(commands):
+            if command[0] not in ("goto", "if-goto") or index in (condition + 2, back_edge):
+                continue
+            if command[1] in (label, end_label) or \
+                    (command[1] in inner_labels and not body_start <= index < back_edge):
+                return None
+        return header, body_start, back_edge, counter[2], bound, commands[condition][0], step
+
+    def _initial_value(self, commands: list, header: int, counter: int) -> typing.Optional[int]:
+        """
+        Returns:
+            int: the value of the counter local when the straight-line code
+            before the loop reaches it, or None if it is not a known constant.
+        """
+        for index in range(header - 1, 0, -1):
+            command = commands[index]
+            if command[0] == "label":
+                return None
+            if command == ("pop", "local", counter):
+                for length in (1, 2):
+                    value, constant_length = self._constant(commands, index - length)
+                    if value is not None and constant_length == length:
+                        return self._to_word(value)
+                return None
+        return 0
+
+    def _count_iterations(self, value: int, bound: int, comparison: str, step: int) -> typing.Optional[int]:
+        """
+        Returns:
+            int: the number of iterations of the loop, comparing as the VM
+            does, by the sign of the 16-bit difference, or None if it does not
+            end within max_iterations.
+        """
+        for iterations in range(self.max_iterations):
+            difference = self._to_word(value - bound)
+            if not (difference < 0 if comparison == "lt" else difference > 0):
+                return iterations
+            value = self._to_word(value + step)
+        return None
+
+    def _size_budget(self, function_name: str, end_label: str) -> int:
+        """
+        Returns:
+            int: the code-size budget of the loop that ends at the given
+            label, by how many times the profile shows its body ran.
+        """
+        counts = None if self.profile is None else self.profile.branch(function_name, end_label)
+        if counts is None:
+            return self.size_budget
+        if counts[1] == 0:
+            self.cold_loops += 1
+            return 0
+        if counts[1] >= self.profile.hot_count:
+            self.hot_loops += 1
+            return self.size_budget * self.hot_budget_factor
+        return self.size_budget
+
+    @staticmethod
+    def _copy(body: list, copy_index: int) -> list:
+        """
+        Returns:
+            list: the commands of the body, with the number of the copy added
+            to the labels it defines.
+        """
+        labels = {command[1] for command in body if command[0] == "label"}
+        return [(command[0], "{}.{}".format(command[1], copy_index))
+                if command[0] in ("label", "goto", "if-goto") and command[1] in labels else command
+                for command in body]
+
+    def _unroll(self, commands: list, label: str) -> list:
+        """
+        Returns:
+            list: the commands of the function, with the loop that starts at
+            the given label unrolled, if it is a counted loop that fits in the
+            budget.
+        """
+        loop = self._match(commands, label)
+        if loop is None:
+            return commands
+        header, body_start, back_edge, counter, bound, comparison, step = loop
+        value = self._initial_value(commands, header, counter)
+        if value is None:
+            return commands
+        iterations = self._count_iterations(value, bound, comparison, step)
+        if iterations is None:
+            return commands
+        size_budget = self._size_budget(commands[0][1], commands[body_start - 1][1])
+        body = commands[body_start:back_edge]
+        body_cost = max(VMReport.estimate_hack_cost(body), 1)
+        if iterations * body_cost <= size_budget:
+            self.unrolled += 1
+            unrolled = [command for copy_index in range(iterations) for command in self._copy(body, copy_index)]
+            return commands[:header] + unrolled + commands[back_edge + 2:]
+        for factor in range(min(iterations, size_budget // body_cost), 1, -1):
+            if (factor + iterations % factor) * body_cost <= size_budget:
+                break
+        else:
+            return commands
+        self.partially_unrolled += 1
+        n_remaining = iterations % factor
+        end_label = "{}:{}".format(commands[body_start - 1][1], factor)
+        unrolled = [command for copy_index in range(n_remaining) for command in self._copy(body, copy_index)]
+        unrolled += commands[header:body_start - 1] + [("if-goto", end_label)]
+        unrolled += [command for copy_index in range(n_remaining, n_remaining + factor)
+                     for command in self._copy(body, copy_index)]
+        return commands[:header] + unrolled + [commands[back_edge], ("label", end_label)] + commands[back_edge + 2:]
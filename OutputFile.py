@@ -0,0 +1,172 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import hashlib
+import io
+import os
+import stat
+import typing
+
+
+class OutputFile:
+    """An output file that is written in memory, and only replaces the file
+    on disk if its content changed, so the modification time of an output
+    that did not change is kept and tools like make do not rebuild what
+    depends on it.
+
+    The writers close their output stream when a class ends, so closing an
+    OutputFile keeps its content. The content is committed when the with
+    statement that opened it ends without an exception: it is compared with
+    the existing file by hash, and if they differ the file is replaced at
+    once through a temporary file, so a reader never sees a partly written
+    output.
+
+    An output file that is replaced even when its content did not change,
+    so its modification time is that of the build, is still only written
+    once its with statement ends without an exception: a class with errors
+    never leaves a partly written output behind.
+    """
+    # the number of bytes of the existing file hashed at a time:
+    chunk_size = 64 * 1024
+
+    def __init__(self, path: str, binary: bool = False, if_changed: bool = True) -> None:
+        """Creates a new empty output file.
+
+        Args:
+            path (str): path of the file on disk.
+            binary (bool): is bytes written to the file, rather than str?
+            if_changed (bool): only replace the file if its content changed,
+            rather than whenever the content is committed.
+        """
+        self.path = path
+        self.binary = binary
+        self.if_changed = if_changed
+        self._buffer = io.BytesIO() if binary else io.StringIO()
+        # was the file on disk replaced when the content was committed? None
+        # until it is committed:
+        self.changed = None
+
+    def write(self, data: typing.Union[str, bytes]) -> int:
+        """Writes data to the content of the file.
+
+        Args:
+            data (str or bytes): the data to write.
+
+        Returns:
+            int: the number of characters or bytes written.
+        """
+        return self._buffer.write(data)
+
+    def tell(self) -> int:
+        """
+        Returns:
+            int: the position of the next write in the content.
+        """
+        return self._buffer.tell()
+
+    def seek(self, position: int, whence: int = io.SEEK_SET) -> int:
+        """Moves the position of the next write, like the seek of a file, so
+        writers that go back to fill in headers, like zipfile, can use an
+        OutputFile.
+
+        Returns:
+            int: the new position.
+        """
+        return self._buffer.seek(position, whence)
+
+    def flush(self) -> None:
+        """Does nothing: the content is kept until it is committed."""
+
+    def close(self) -> None:
+        """Does nothing: the content is kept until it is committed."""
+
+    def getvalue(self) -> typing.Union[str, bytes]:
+        """
+        Returns:
+            str or bytes: the content written so far.
+        """
+        return self._buffer.getvalue()
+
+    def commit(self) -> bool:
+        """Replaces the file on disk with the content, unless they are equal
+        and the file is only replaced if its content changed.
+
+        Returns:
+            bool: was the file replaced?
+        """
+        content = self.getvalue()
+        if not self.binary:
+            content = content.encode("utf-8")
+        self.changed = not self.if_changed or self._file_digest() != hashlib.blake2b(content).digest()
+        if self.changed:
+            descriptor, temporary_path = self._create_temporary_file()
+            try:
+                with os.fdopen(descriptor, 'wb') as output_file:
+                    output_file.write(content)
+                mode = self._file_mode()
+                if mode is not None:
+                    os.chmod(temporary_path, mode)
+                os.replace(temporary_path, self.path)
+            except BaseException:
+                if os.path.exists(temporary_path):
+                    os.remove(temporary_path)
+                raise
+        return self.changed
+
+    def __enter__(self) -> "OutputFile":
+        return self
+
+    def __exit__(self, exception_type, exception, traceback) -> None:
+        """Commits the content, unless the with statement raised."""
+        if exception_type is None:
+            self.commit()
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    def _create_temporary_file(self) -> tuple:
+        """Creates a temporary file of its own next to the file, so builds
+        that write the same file at once do not write into each other's
+        temporary file. It is created with the permissions of a new file, as
+        the umask of the process allows.
+
+        Returns:
+            tuple: (descriptor, path): the open descriptor and the path of the
+            temporary file.
+        """
+        prefix = os.path.join(os.path.dirname(self.path), os.path.basename(self.path) + ".")
+        while True:
+            temporary_path = prefix + os.urandom(6).hex() + ".tmp"
+            try:
+                return os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0),
+                               0o666), temporary_path
+            except FileExistsError:
+                continue
+
+    def _file_mode(self) -> typing.Optional[int]:
+        """
+        Returns:
+            int: the permissions of the file on disk, which replacing it
+            keeps, or None if there is none.
+        """
+        try:
+            return stat.S_IMODE(os.stat(self.path).st_mode)
+        except FileNotFoundError:
+            return None
+
+    def _file_digest(self) -> typing.Optional[bytes]:
+        """
+        Returns:
+            bytes: the hash of the file on disk, or None if there is no file.
+        """
+        digest = hashlib.blake2b()
+        try:
+            with open(self.path, 'rb') as existing_file:
+                for chunk in iter(lambda: existing_file.read(self.chunk_size), b""):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            return None
+        return digest.digest()
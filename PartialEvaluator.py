@@ -0,0 +1,162 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from ConstantPropagator import ConstantPropagator
+from VMEmulator import VMEmulator, VMEmulatorError
+from VMParser import VMParser
+
+
+class PartialEvaluator:
+    """An optimization that evaluates calls of pure functions with constant
+    arguments at compile time, and pushes the value they return instead.
+
+    A function of the program is pure if it only reads its arguments, its
+    locals and temp, and only calls pure functions: it neither reads nor
+    writes "this", "that", "static" or "pointer", so it does not allocate
+    or use arrays, strings or objects, and it returns the same value for the
+    same arguments. The Jack OS functions in os_pure_functions are pure, and
+    are evaluated as VMEmulator emulates them. The program is given with
+    load_program, and the pass does nothing until it is.
+
+    Every call is evaluated by VMEmulator, at most step_limit VM commands
+    long, so a call that does not end, or fails like a division by zero, is
+    left to run at runtime.
+    """
+    # the name, representation and dependencies of the pass (see PassManager).
+    # Constant arguments are known once constants are propagated:
+    name = "evaluate"
+    representation = "ir"
+    depends_on = ("cse", "licm", "unroll", "propagate")
+
+    # the functions of the Jack OS that return the same value for the same
+    # arguments, as VMEmulator emulates them:
+    os_pure_functions = {"Math.multiply", "Math.divide", "Math.abs", "Math.min", "Math.max"}
+
+    # the segments a pure function may not read or write:
+    state_segments = ("this", "that", "static", "pointer")
+
+    # the default number of VM commands a single evaluated call may run:
+    default_step_limit = 10000
+
+    def __init__(self, step_limit: int = default_step_limit) -> None:
+        """Creates a new optimization.
+
+        Args:
+            step_limit (int): the maximal number of VM commands a single
+            evaluated call runs.
+        """
+        self.step_limit = step_limit
+        # the names of the pure functions of the loaded program:
+        self.pure_functions = set()
+        # maps the name of every evaluated function to the number of its
+        # calls that were replaced by constants:
+        self.evaluated = {}
+        # the number of calls whose evaluation did not end within the limit:
+        self.steps_exceeded = 0
+        self._emulator = None
+        # maps every evaluated (name, arguments) to its value, or to None if
+        # it could not be evaluated:
+        self._values = {}
+
+    def load_program(self, commands: list) -> None:
+        """Finds the pure functions of the whole program.
+
+        Args:
+            commands (list): the VM commands of every class of the program.
+        """
+        functions = {name: function_commands for name, _, function_commands
+                     in VMParser.split_to_functions(commands) if name not in self.os_pure_functions}
+        pure_functions = set(functions)
+        for name, function_commands in functions.items():
+            for command in function_commands:
+                if command[0] in ("push", "pop") and command[1] in self.state_segments:
+                    pure_functions.discard(name)
+        # a function that calls a function that is not pure is not pure:
+        is_changed = True
+        while is_changed:
+            is_changed = False
+            for name in sorted(pure_functions):
+                if any(command[0] == "call" and command[1] not in pure_functions and
+                       command[1] not in self.os_pure_functions for command in functions[name]):
+                    pure_functions.discard(name)
+                    is_changed = True
+        self.pure_functions = pure_functions | self.os_pure_functions
+        self._emulator = VMEmulator([command for name in sorted(pure_functions) for command in functions[name]],
+                                    self.step_limit)
+        self._values = {}
+
+    def run(self, commands: list) -> list:
+        """
+        Args:
+            commands (list): the commands of a single function, starting with
+            its "function" command.
+
+        Returns:
+            list: the commands of the function, with the calls of pure
+            functions with constant arguments replaced by their values.
+        """
+        if self._emulator is None:
+            return commands
+        new_commands = []
+        for command in commands:
+            if command[0] == "call" and command[1] in self.pure_functions:
+                arguments, length = self._constant_arguments(new_commands, command[2])
+                value = None if arguments is None else self._evaluate(command[1], arguments)
+                if value is not None:
+                    del new_commands[len(new_commands) - length:]
+                    new_commands.extend(ConstantPropagator.constant_commands(value))
+                    self.evaluated[command[1]] = self.evaluated.get(command[1], 0) + 1
+                    continue
+            new_commands.append(command)
+        return new_commands
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    @staticmethod
+    def _constant_arguments(commands: list, n_arguments: int) -> tuple:
+        """
+        Returns:
+            tuple: (arguments, length): the constants the last commands push
+            as the given number of arguments, and the number of commands that
+            push them, or (None, 0) if they do not push constants.
+        """
+        arguments = []
+        end = len(commands)
+        for _ in range(n_arguments):
+            if end >= 2 and commands[end - 1] in (("neg",), ("not",)) and \
+                    commands[end - 2][:2] == ("push", "constant"):
+                value = int(commands[end - 2][2])
+                arguments.append(-value if commands[end - 1] == ("neg",) else ~value)
+                end -= 2
+            elif end >= 1 and commands[end - 1][:2] == ("push", "constant"):
+                arguments.append(int(commands[end - 1][2]))
+                end -= 1
+            else:
+                return None, 0
+        return arguments[::-1], len(commands) - end
+
+    def _evaluate(self, name: str, arguments: list) -> typing.Optional[int]:
+        """
+        Returns:
+            int: the value the function returns for the given arguments, or
+            None if the call does not end within the step limit or fails.
+        """
+        key = (name, tuple(arguments))
+        if key not in self._values:
+            self._emulator.steps = 0
+            self._emulator.step_limit = self.step_limit
+            try:
+                self._values[key] = self._emulator.call(name, arguments)
+            except VMEmulatorError:
+                self._values[key] = None
+                if self._emulator.steps >= self.step_limit:
+                    self.steps_exceeded += 1
+            except IndexError:
+                # the call recursed deeper than the memory of the VM:
+                self._values[key] = None
+        return self._values[key]
@@ -0,0 +1,223 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import time
+import typing
+from BlockLayout import BlockLayout
+from CommonSubexpressionEliminator import CommonSubexpressionEliminator
+from ConstantPropagator import ConstantPropagator
+from LocalSlotAllocator import LocalSlotAllocator
+from LoopInvariantCodeMotion import LoopInvariantCodeMotion
+from LoopUnroller import LoopUnroller
+from PartialEvaluator import PartialEvaluator
+from ProfileGuidedInliner import ProfileGuidedInliner
+from StrengthReducer import StrengthReducer
+from VMReport import VMReport
+
+
+class PassManager:
+    """Chooses the optimization passes of a build by an optimization level,
+    runs them in the order their dependencies ask for, and measures them.
+
+    Every pass class declares its name, the representation it works on and
+    the passes it depends on: when those are enabled they run before it.
+    The representations are the AST the engine parses, the IR of VM command
+    tuples the writer buffers, and the VM text that is written. The engine
+    compiles straight to IR, so every pass is an IR pass, and the manager is
+    given to a VMWriter as its single optimization: it runs the enabled
+    passes on every compiled function.
+
+    For every pass, the manager adds up the time it took and the VM
+    commands and estimated Hack instructions (see VMReport) it removed.
+    """
+    # the representations a pass may work on:
+    representations = ("ast", "ir", "text")
+
+    # every pass class, by name, in the order they are listed in reports:
+    pass_classes = {pass_class.name: pass_class for pass_class in (
+        ProfileGuidedInliner, CommonSubexpressionEliminator, LoopInvariantCodeMotion, LoopUnroller,
+        ConstantPropagator, PartialEvaluator, StrengthReducer, BlockLayout, LocalSlotAllocator)}
+
+    # the passes of every optimization level: -O0 runs none for the fastest
+    # builds, -O1 only shares local slots (the default build), and -O2 runs
+    # every pass that does not need an execution profile:
+    levels = {
+        0: (),
+        1: ("slots",),
+        2: ("cse", "licm", "unroll", "propagate", "evaluate", "strength", "slots"),
+    }
+
+    def __init__(self, level: int = 1, enabled: typing.Iterable = (), disabled: typing.Iterable = ()) -> None:
+        """Creates the passes of a build.
+
+        Args:
+            level (int): the optimization level, 0, 1 or 2.
+            enabled (Iterable): names of passes to run on top of the level.
+            disabled (Iterable): names of passes not to run, even if the level
+            or enabled has them.
+
+        Raises:
+            ValueError: if a level or a pass is unknown, a pass works on a
+            representation the compiler does not optimize, or the passes
+            depend on each other in a cycle.
+        """
+        if level not in self.levels:
+            raise ValueError("unknown optimization level {}".format(level))
+        names = (set(self.levels[level]) | set(enabled)) - set(disabled)
+        for name in names | set(disabled):
+            if name not in self.pass_classes:
+                raise ValueError("unknown pass {!r}".format(name))
+        self.level = level
+        # the enabled passes, in the order they run:
+        self.passes = [self.pass_classes[name]() for name in self._order(names)]
+        for optimization in self.passes:
+            if optimization.representation != "ir":
+                raise ValueError("pass {!r} works on the {}, which is not optimized".format(
+                    optimization.name, optimization.representation))
+        # maps the name of every pass to its [seconds, functions, VM commands
+        # removed, Hack instructions removed]:
+        self.statistics = {optimization.name: [0.0, 0, 0, 0] for optimization in self.passes}
+
+    def get(self, name: str) -> typing.Optional[object]:
+        """
+        Args:
+            name (str): the name of a pass.
+
+        Returns:
+            object: the pass, or None if it is not enabled.
+        """
+        for optimization in self.passes:
+            if optimization.name == name:
+                return optimization
+        return None
+
+    @property
+    def function_order(self) -> typing.Optional[typing.Callable]:
+        """
+        Returns:
+            Callable: if the functions of every class are reordered (see
+            BlockLayout), a function that maps the name of a function to
+            the key VMWriter orders it by, and otherwise None.
+        """
+        layout = self.get("layout")
+        if layout is None or layout.profile is None:
+            return None
+        return layout.function_order
+
+    def run(self, commands: list) -> list:
+        """
+        Args:
+            commands (list): the commands of a single function, starting with
+            its "function" command.
+
+        Returns:
+            list: the commands after every enabled pass ran on them.
+        """
+        for optimization in self.passes:
+            statistics = self.statistics[optimization.name]
+            start = time.perf_counter()
+            optimized = optimization.run(commands)
+            statistics[0] += time.perf_counter() - start
+            statistics[1] += 1
+            statistics[2] += len(commands) - len(optimized)
+            statistics[3] += self._cost(commands) - self._cost(optimized)
+            commands = optimized
+        return commands
+
+    def counters(self) -> dict:
+        """
+        Returns:
+            dict: a copy of everything the manager counts: maps the name of
+            every pass to its statistics, and (name, attribute) to every
+            number and dict of numbers of a pass, such as the functions
+            ConstantPropagator eliminated loads in.
+        """
+        counters = {}
+        for optimization in self.passes:
+            counters[optimization.name] = list(self.statistics[optimization.name])
+            for attribute, value in vars(optimization).items():
+                if attribute.startswith("_"):
+                    continue
+                if self._is_number(value):
+                    counters[optimization.name, attribute] = value
+                elif isinstance(value, dict) and all(self._is_number(count) for count in value.values()):
+                    counters[optimization.name, attribute] = dict(value)
+        return counters
+
+    def add_counters(self, before: dict, after: dict) -> None:
+        """Adds what a copy of the manager counted between two of its
+        counters, such as a copy that compiled files in a worker process (see
+        JobServer). The options of the passes, which do not change, are kept.
+
+        Args:
+            before (dict): the counters of the copy before it compiled.
+            after (dict): the counters of the copy after it compiled.
+        """
+        for key, value in after.items():
+            if isinstance(key, str):
+                statistics = self.statistics[key]
+                for index, count in enumerate(value):
+                    statistics[index] += count - before[key][index]
+            elif isinstance(value, dict):
+                counts = getattr(self.get(key[0]), key[1])
+                for name, count in value.items():
+                    if count != before[key].get(name, 0):
+                        counts[name] = counts.get(name, 0) + count - before[key].get(name, 0)
+            elif value != before[key]:
+                setattr(self.get(key[0]), key[1], getattr(self.get(key[0]), key[1]) + value - before[key])
+
+    def write_report(self, output_stream: typing.TextIO) -> None:
+        """Writes the time every pass took and the instructions it removed.
+
+        Args:
+            output_stream (typing.TextIO): writes the report to this stream.
+        """
+        output_stream.write("-O{}: {}\n".format(
+            self.level, ", ".join(optimization.name for optimization in self.passes) or "no passes"))
+        for optimization in self.passes:
+            seconds, n_functions, vm_removed, hack_removed = self.statistics[optimization.name]
+            output_stream.write("  {:<10} {:>9.1f} ms {:>6} function(s) {:>7} VM command(s) {:>8} Hack "
+                                "instruction(s) removed\n".format(optimization.name, seconds * 1000,
+                                                                  n_functions, vm_removed, hack_removed))
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    def _order(self, names: set) -> list:
+        """
+        Returns:
+            list: the names of the given passes, ordered so every pass runs
+            after the given passes it depends on, and otherwise as listed in
+            pass_classes.
+        """
+        ordered = []
+        remaining = [name for name in self.pass_classes if name in names]
+        while remaining:
+            for name in remaining:
+                if all(dependency in ordered or dependency not in names
+                       for dependency in self.pass_classes[name].depends_on):
+                    ordered.append(name)
+                    remaining.remove(name)
+                    break
+            else:
+                raise ValueError("the passes {} depend on each other".format(", ".join(remaining)))
+        return ordered
+
+    @staticmethod
+    def _is_number(value: object) -> bool:
+        """
+        Returns:
+            bool: is the value a count, an int or a float but not a bool?
+        """
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+    @staticmethod
+    def _cost(commands: list) -> int:
+        """
+        Returns:
+            int: the estimated number of Hack instructions of the commands.
+        """
+        return sum(VMReport.command_cost(command) for command in commands)
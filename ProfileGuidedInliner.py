@@ -0,0 +1,195 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from ControlFlowGraph import ControlFlowGraph
+from VMParser import VMParser
+from VMReport import VMReport
+
+
+class ProfileGuidedInliner:
+    """An optimization that copies small functions into the call sites an
+    execution profile shows are hot (see ExecutionProfile), so they do not
+    pay for the call and the return.
+
+    A call site is hot when the profile estimates it runs at least
+    ExecutionProfile.hot_count times. A call within an expression, such as
+    "let y = y + f(x);", is only inlined if the function has no branches,
+    so the blocks of the copy never start with values waiting on the stack;
+    any function may be inlined into a call that is a whole statement, such
+    as "do f(x);", "let y = f(x);" or "return f(x);". The function must be
+    given with load_program, and must:
+    - cost at most inline_budget estimated Hack instructions (see VMReport),
+    - not set "pointer 0", since a call keeps the "this" of its caller,
+    - only use statics if it is of the class of its caller,
+    - not be the function it is inlined into.
+
+    The copy pops the arguments into new locals, gives the locals of the
+    function new locals (set to 0 when they may be read before they are
+    written, as the VM does), and names its labels "Callee.site:label",
+    which are valid VM labels that no other label of the compiler has. A
+    function with a single "return" leaves its value on the stack; one with
+    several keeps it in a new local until they join. A call site is only
+    inlined when the copy runs fewer estimated Hack instructions than the
+    call.
+    """
+    # the name, representation and dependencies of the pass (see PassManager).
+    # Calls are inlined before the other passes optimize the copies with
+    # the code around them:
+    name = "inline"
+    representation = "ir"
+    depends_on = ()
+
+    # the default estimated Hack instructions of the largest inlined function:
+    default_inline_budget = 128
+
+    # the number of values every VM command takes from the stack and pushes:
+    stack_effect_dictionary = {
+        "push": 1, "pop": -1, "add": -1, "sub": -1, "and": -1, "or": -1,
+        "eq": -1, "gt": -1, "lt": -1, "if-goto": -1
+    }
+
+    def __init__(self, inline_budget: int = default_inline_budget) -> None:
+        """Creates a new optimization.
+
+        Args:
+            inline_budget (int): the maximal estimated Hack instructions of an
+            inlined function.
+        """
+        self.inline_budget = inline_budget
+        # the ExecutionProfile of the program, or None for no inlining:
+        self.profile = None
+        # maps the name of every inlined function to the number of call
+        # sites it was inlined into, and to the number of its profiled calls
+        # those call sites made:
+        self.inlined = {}
+        self.inlined_calls = {}
+        # maps the name of every function of the program to its commands:
+        self._functions = {}
+
+    def load_program(self, commands: list) -> None:
+        """Keeps the functions of the whole program, to inline them.
+
+        Args:
+            commands (list): the VM commands of every class of the program.
+        """
+        self._functions = {name: function_commands
+                           for name, _, function_commands in VMParser.split_to_functions(commands)}
+
+    def run(self, commands: list) -> list:
+        """
+        Args:
+            commands (list): the commands of a single function, starting with
+            its "function" command.
+
+        Returns:
+            list: the commands of the function, with the small functions its
+            hot call sites call inlined.
+        """
+        if self.profile is None or self.profile.calls.get(commands[0][1], 0) == 0:
+            return commands
+        caller_name, n_locals = commands[0][1], commands[0][2]
+        n_calls = self.profile.calls[caller_name]
+        graph = ControlFlowGraph(commands)
+        frequencies = self.profile.block_frequencies(commands)
+        new_commands = [commands[0]]
+        n_sites = 0
+        for block_index, (start, end) in enumerate(graph.blocks):
+            depth = 0
+            n_site_calls = round(frequencies[block_index] * n_calls)
+            for command in commands[start:end]:
+                if command[0] == "call" and n_site_calls >= self.profile.hot_count and \
+                        self._can_inline(caller_name, command[1], depth > command[2]):
+                    copy = self._copy(command[1], command[2], n_locals, n_sites)
+                    if copy is not None:
+                        copy_commands, n_copy_locals = copy
+                        new_commands += copy_commands
+                        n_locals += n_copy_locals
+                        n_sites += 1
+                        self.inlined[command[1]] = self.inlined.get(command[1], 0) + 1
+                        self.inlined_calls[command[1]] = self.inlined_calls.get(command[1], 0) + n_site_calls
+                        depth += self._stack_effect(command)
+                        continue
+                new_commands.append(command)
+                depth += self._stack_effect(command)
+        if n_sites == 0:
+            return commands
+        new_commands[0] = ("function", caller_name, n_locals)
+        return new_commands
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    @classmethod
+    def _stack_effect(cls, command: tuple) -> int:
+        """
+        Returns:
+            int: the number of values the command adds to the stack.
+        """
+        if command[0] == "call":
+            return 1 - command[2]
+        return cls.stack_effect_dictionary.get(command[0], 0)
+
+    def _can_inline(self, caller_name: str, callee_name: str, is_in_expression: bool) -> bool:
+        """
+        Returns:
+            bool: may the given function be inlined into the caller, at a
+            call within an expression or at a call that is a statement?
+        """
+        callee = self._functions.get(callee_name)
+        if callee is None or callee_name == caller_name or callee[-1] != ("return",):
+            return False
+        if is_in_expression and any(command[0] in ("label", "goto", "if-goto", "return")
+                                    for command in callee[1:-1]):
+            return False
+        if VMReport.estimate_hack_cost(callee) > self.inline_budget:
+            return False
+        is_same_class = callee_name.split(".")[0] == caller_name.split(".")[0]
+        return all(command != ("pop", "pointer", 0) and
+                   (is_same_class or len(command) < 3 or command[1] != "static")
+                   for command in callee[1:])
+
+    def _copy(self, callee_name: str, n_args: int, first_local: int, site: int) -> typing.Optional[tuple]:
+        """
+        Returns:
+            tuple: (commands, n_locals): the commands that replace a call of
+            the given function, and the number of new locals they use, or
+            None if the copy costs more than the call.
+        """
+        callee = self._functions[callee_name]
+        n_callee_locals = callee[0][2]
+        n_returns = callee.count(("return",))
+        graph = ControlFlowGraph(callee)
+        initialized = sorted(graph.live_locals()[0][0]) if graph.blocks else []
+        prefix = "{}.{}:".format(callee_name, site)
+        result_local = first_local + n_args + n_callee_locals
+        end_label = prefix + "RETURN"
+
+        def local_of(command):
+            if command[1] == "argument":
+                return command[0], "local", first_local + command[2]
+            return command[0], "local", first_local + n_args + command[2]
+
+        copy = [("pop", "local", first_local + index) for index in range(n_args - 1, -1, -1)]
+        for index in initialized:
+            copy += [("push", "constant", 0), ("pop", "local", first_local + n_args + index)]
+        for index, command in enumerate(callee[1:], 1):
+            if command[0] in ("push", "pop") and command[1] in ("argument", "local"):
+                copy.append(local_of(command))
+            elif command[0] in ("label", "goto", "if-goto"):
+                copy.append((command[0], prefix + command[1]))
+            elif command[0] == "return" and n_returns > 1:
+                copy.append(("pop", "local", result_local))
+                if index < len(callee) - 1:
+                    copy.append(("goto", end_label))
+            elif command[0] != "return":
+                copy.append(command)
+        if n_returns > 1:
+            copy += [("label", end_label), ("push", "local", result_local)]
+        call_cost = VMReport.command_cost(("call", callee_name, n_args)) + VMReport.estimate_hack_cost(callee)
+        if VMReport.estimate_hack_cost(copy) >= call_cost:
+            return None
+        return copy, n_args + n_callee_locals + (n_returns > 1)
@@ -0,0 +1,162 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import bz2
+import gzip
+import io
+import lzma
+import posixpath
+import tarfile
+import typing
+import zipfile
+
+
+class ProjectArchive:
+    """A tar or zip archive of a Jack project, read and written without
+    extracting it.
+
+    The members of an input archive are read one at a time, and tar archives
+    are read as a stream, so every member is read once, in the order it is
+    stored. The members of an output archive are written to a stream as they
+    are added. Their time is fixed and they are stored in the order they are
+    added, so the same outputs always give the same archive, and
+    "--if-changed" can keep an output archive that did not change.
+    """
+    # maps the suffix of every archive format to its compression, where zip
+    # is a zip archive and the others are tar archives:
+    formats_dictionary = {
+        ".zip": "zip",
+        ".tar": "",
+        ".tar.gz": "gz",
+        ".tgz": "gz",
+        ".tar.bz2": "bz2",
+        ".tbz2": "bz2",
+        ".tar.xz": "xz",
+        ".txz": "xz"
+    }
+
+    # the time of every written zip member, the earliest a zip can store:
+    zip_date_time = (1980, 1, 1, 0, 0, 0)
+
+    def __init__(self, output_stream: typing.BinaryIO, archive_format: str) -> None:
+        """Starts writing a new empty archive.
+
+        Args:
+            output_stream (typing.BinaryIO): writes the archive to this stream.
+            archive_format (str): the compression of formats_dictionary.
+        """
+        self._compressed_stream = None
+        if archive_format == "zip":
+            self._archive = zipfile.ZipFile(output_stream, 'w', zipfile.ZIP_DEFLATED)
+            return
+        if archive_format == "gz":
+            # the time and the name in the gzip header are left out as well:
+            self._compressed_stream = gzip.GzipFile(filename="", mode='wb', fileobj=output_stream, mtime=0)
+        elif archive_format == "bz2":
+            self._compressed_stream = bz2.BZ2File(output_stream, 'wb')
+        elif archive_format == "xz":
+            self._compressed_stream = lzma.LZMAFile(output_stream, 'wb')
+        self._archive = tarfile.open(fileobj=self._compressed_stream or output_stream, mode='w')
+
+    @classmethod
+    def archive_format(cls, path: str) -> typing.Optional[str]:
+        """
+        Args:
+            path (str): path of a file.
+
+        Returns:
+            str: the compression formats_dictionary gives the suffix of the
+            path, or None if it is not an archive.
+        """
+        lower_path = path.lower()
+        for suffix, archive_format in cls.formats_dictionary.items():
+            if lower_path.endswith(suffix):
+                return archive_format
+        return None
+
+    @classmethod
+    def split_suffix(cls, path: str) -> tuple:
+        """
+        Args:
+            path (str): path of an archive.
+
+        Returns:
+            tuple: (stem, suffix): the path without its archive suffix, and
+            the suffix, such as ("Pong", ".tar.gz").
+        """
+        lower_path = path.lower()
+        suffix = max((suffix for suffix in cls.formats_dictionary if lower_path.endswith(suffix)), key=len)
+        return path[:-len(suffix)], path[-len(suffix):]
+
+    @classmethod
+    def read_members(cls, path: str, extension: str) -> typing.Iterator:
+        """Reads the files of an archive that have the given extension.
+
+        Args:
+            path (str): path of a tar or zip archive.
+            extension (str): the extension of the members to read, such as
+            ".jack".
+
+        Yields:
+            tuple: (name, text): the name of every such member in the archive,
+            such as "Pong/Main.jack", and its text.
+        """
+        if cls.archive_format(path) == "zip":
+            with zipfile.ZipFile(path, 'r') as archive:
+                for member in archive.infolist():
+                    if not member.is_dir() and member.filename.lower().endswith(extension):
+                        yield member.filename, archive.read(member).decode("utf-8")
+            return
+        with tarfile.open(path, 'r|*') as archive:
+            for member in archive:
+                if member.isfile() and member.name.lower().endswith(extension):
+                    yield member.name, archive.extractfile(member).read().decode("utf-8")
+
+    @staticmethod
+    def output_name(name: str, extension: str) -> str:
+        """
+        Args:
+            name (str): the name of a member, such as "Pong/Main.jack".
+            extension (str): the extension of its output, such as ".vm".
+
+        Returns:
+            str: the name of its output in an archive, such as "Pong/Main.vm".
+        """
+        return posixpath.splitext(name)[0] + extension
+
+    def add(self, name: str, content: typing.Union[str, bytes]) -> None:
+        """Writes a file to the archive.
+
+        Args:
+            name (str): the name of the member, such as "Pong/Main.vm".
+            content (str or bytes): the content of the file, where text is
+            written as UTF-8.
+        """
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        if isinstance(self._archive, zipfile.ZipFile):
+            member = zipfile.ZipInfo(name, self.zip_date_time)
+            member.compress_type = zipfile.ZIP_DEFLATED
+            member.external_attr = 0o644 << 16
+            self._archive.writestr(member, content)
+            return
+        member = tarfile.TarInfo(name)
+        member.size = len(content)
+        member.mode = 0o644
+        self._archive.addfile(member, io.BytesIO(content))
+
+    def close(self) -> None:
+        """Ends the archive, leaving the output stream open."""
+        self._archive.close()
+        if self._compressed_stream is not None:
+            self._compressed_stream.close()
+
+    def __enter__(self) -> "ProjectArchive":
+        return self
+
+    def __exit__(self, exception_type, exception, traceback) -> None:
+        self.close()
+
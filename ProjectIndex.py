@@ -0,0 +1,251 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import hashlib
+import sys
+from OutputFile import OutputFile
+from VMBytecode import VMBytecode
+
+
+class ProjectIndex:
+    """An index of the subroutines of every class of a project: their kind,
+    number of parameters and number of locals, with a hash of the source of
+    every class, so whole-project analyses do not have to parse every file.
+
+    The index is built during compilation, and saved in a compact binary
+    format. The file starts with the magic bytes "JIDX" and a version byte,
+    followed by the number of classes and a record for every class. Every
+    number is an unsigned LEB128 varint (see VMBytecode), and every string
+    is its length and its UTF-8 bytes. A class record is the name of the
+    class, its 16-byte source hash, the length of its subroutine list in
+    bytes and the list: the number of subroutines, and then the name, kind
+    byte, number of parameters and number of locals of every subroutine.
+
+    Loading only reads the class names and hashes; the subroutine list of a
+    class is decoded the first time it is asked for, and the records of
+    classes that did not change are saved again as they were loaded.
+    """
+    MAGIC = b"JIDX"
+    VERSION = 1
+
+    # the kinds of subroutines, in the order of their kind bytes:
+    kinds = ("function", "method", "constructor")
+
+    def __init__(self) -> None:
+        """Creates a new empty index."""
+        # maps the name of every class to its source hash:
+        self._hashes = {}
+        # maps the name of every class to its decoded subroutines, as a dict
+        # of name to (kind, n_params, n_locals):
+        self._subroutines = {}
+        # maps the name of every loaded class that was not decoded yet to its
+        # encoded subroutine list:
+        self._encoded = {}
+
+    @classmethod
+    def load(cls, path: str) -> "ProjectIndex":
+        """
+        Args:
+            path (str): path of an index file.
+
+        Returns:
+            ProjectIndex: the index saved in the file, or an empty index if
+            there is no such file, it is not a version 1 index, or the lengths
+            of its records do not add up to its size, as in a truncated file.
+        """
+        index = cls()
+        try:
+            with open(path, 'rb') as index_file:
+                data = index_file.read()
+        except FileNotFoundError:
+            return index
+        if data[:len(cls.MAGIC)] != cls.MAGIC or data[len(cls.MAGIC):len(cls.MAGIC) + 1] != bytes([cls.VERSION]):
+            return index
+        view = memoryview(data)
+        position = len(cls.MAGIC) + 1
+        try:
+            n_classes, position = VMBytecode.read_varint(data, position)
+            for _ in range(n_classes):
+                name, position = cls._read_string(data, position)
+                source_hash = bytes(view[position:position + 16])
+                length, position = VMBytecode.read_varint(data, position + 16)
+                if position + length > len(data):
+                    return cls()
+                index._hashes[name] = source_hash
+                index._encoded[name] = view[position:position + length]
+                position += length
+        except (IndexError, ValueError):
+            # a varint or a string runs past the end of the file, or a name is
+            # not UTF-8:
+            return cls()
+        if position != len(data):
+            return cls()
+        return index
+
+    def save(self, path: str) -> None:
+        """Writes the index to a file. The file is replaced at once, so a
+        reader never sees a partly written index.
+
+        Args:
+            path (str): path of the index file.
+        """
+        data = bytearray(self.MAGIC)
+        data.append(self.VERSION)
+        VMBytecode.write_varint(data, len(self._hashes))
+        for name in sorted(self._hashes):
+            self._write_string(data, name)
+            data += self._hashes[name]
+            encoded = self._encoded[name] if name in self._encoded else self._encode(self._subroutines[name])
+            VMBytecode.write_varint(data, len(encoded))
+            data += encoded
+        with OutputFile(path, binary=True) as index_file:
+            index_file.write(data)
+
+    @staticmethod
+    def source_hash(text: str) -> bytes:
+        """
+        Args:
+            text (str): the Jack source code of a class.
+
+        Returns:
+            bytes: the 16-byte hash of the source code.
+        """
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def class_names(self) -> list:
+        """
+        Returns:
+            list: the names of all the classes in the index.
+        """
+        return sorted(self._hashes)
+
+    def is_current(self, class_name: str, source_hash: bytes) -> bool:
+        """
+        Args:
+            class_name (str): name of a class.
+            source_hash (bytes): the hash of its source code (see source_hash).
+
+        Returns:
+            bool: is the class indexed from this source code?
+        """
+        return self._hashes.get(class_name) == source_hash
+
+    def subroutines(self, class_name: str) -> dict:
+        """
+        Args:
+            class_name (str): name of a class in the index.
+
+        Returns:
+            dict: maps the name of every subroutine of the class to its
+            (kind, n_params, n_locals), where kind is "function", "method" or
+            "constructor", and n_params does not count "this".
+        """
+        if class_name in self._encoded:
+            self._subroutines[class_name] = self._decode(self._encoded.pop(class_name))
+        return self._subroutines[class_name]
+
+    def update(self, class_name: str, source_hash: bytes, subroutines: list) -> None:
+        """Indexes a class again.
+
+        Args:
+            class_name (str): name of the class.
+            source_hash (bytes): the hash of its source code (see source_hash).
+            subroutines (list): the (name, kind, n_params, n_locals) of every
+            subroutine, as in CompilationEngine.subroutines.
+        """
+        self._hashes[class_name] = source_hash
+        self._encoded.pop(class_name, None)
+        self._subroutines[class_name] = {name: (kind, n_params, n_locals)
+                                         for name, kind, n_params, n_locals in subroutines}
+
+    def merge(self, other: "ProjectIndex") -> None:
+        """Indexes the classes of another index again, such as of one a class
+        was compiled into in a worker process.
+
+        Args:
+            other (ProjectIndex): the index to take the classes of.
+        """
+        for class_name in other.class_names():
+            self.update(class_name, other._hashes[class_name],
+                        [(name,) + signature for name, signature in other.subroutines(class_name).items()])
+
+    def remove(self, class_name: str) -> None:
+        """Removes a class from the index, if it is there.
+
+        Args:
+            class_name (str): name of the class.
+        """
+        self._hashes.pop(class_name, None)
+        self._encoded.pop(class_name, None)
+        self._subroutines.pop(class_name, None)
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    @classmethod
+    def _encode(cls, subroutines: dict) -> bytes:
+        """
+        Returns:
+            bytes: the encoded subroutine list of a class.
+        """
+        data = bytearray()
+        VMBytecode.write_varint(data, len(subroutines))
+        for name, (kind, n_params, n_locals) in subroutines.items():
+            cls._write_string(data, name)
+            data.append(cls.kinds.index(kind))
+            VMBytecode.write_varint(data, n_params)
+            VMBytecode.write_varint(data, n_locals)
+        return bytes(data)
+
+    @classmethod
+    def _decode(cls, data: memoryview) -> dict:
+        """
+        Returns:
+            dict: the subroutines of an encoded subroutine list.
+        """
+        subroutines = {}
+        n_subroutines, position = VMBytecode.read_varint(data, 0)
+        for _ in range(n_subroutines):
+            name, position = cls._read_string(data, position)
+            kind = cls.kinds[data[position]]
+            n_params, position = VMBytecode.read_varint(data, position + 1)
+            n_locals, position = VMBytecode.read_varint(data, position)
+            subroutines[name] = (kind, n_params, n_locals)
+        return subroutines
+
+    @staticmethod
+    def _write_string(data: bytearray, string: str):
+        """appends the length and the UTF-8 bytes of the string to data"""
+        encoded = string.encode("utf-8")
+        VMBytecode.write_varint(data, len(encoded))
+        data += encoded
+
+    @staticmethod
+    def _read_string(data, position: int) -> tuple:
+        """
+        Returns:
+            tuple: (string, position): the string at the given position of
+            data, and the position after it.
+
+        Raises:
+            IndexError: if the string runs past the end of data.
+        """
+        length, position = VMBytecode.read_varint(data, position)
+        if position + length > len(data):
+            raise IndexError("string runs past the end of the data")
+        return bytes(data[position:position + length]).decode("utf-8"), position + length
+
+
+if "__main__" == __name__:
+    # Prints the subroutines of every class of an index file.
+    if not len(sys.argv) == 2:
+        sys.exit("Invalid usage, please use: ProjectIndex <index file>")
+    project_index = ProjectIndex.load(sys.argv[1])
+    for indexed_class in project_index.class_names():
+        for subroutine_name, (subroutine_kind, parameters, local_count) in \
+                project_index.subroutines(indexed_class).items():
+            print("{}.{}: {}, {} parameter(s), {} local(s)".format(
+                indexed_class, subroutine_name, subroutine_kind, parameters, local_count))
@@ -0,0 +1,254 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from VMParser import VMParser
+
+
+class StackAnalysis:
+    """Finds, without running the program, how much of the Hack stack every
+    function of a VM program may use.
+
+    - The maximal operand-stack depth of a function is found by following
+      every path of its commands, with the depth of the stack at every
+      command. Where paths join the larger depth is kept.
+    - The frame of a function is the 5 words a call saves, its locals and its
+      maximal operand-stack depth.
+    - The worst-case stack of a function is the most stack it may use from
+      its call to its return, including the functions it calls: its own
+      frame, or the words on the stack at a call site (with the arguments of
+      the call) and the worst-case stack of the callee, whichever is more.
+
+    A function that may call itself, directly or through other functions,
+    may use unbounded stack, and so does every function that may call it:
+    their worst-case stack is None. Functions that are called but not part
+    of the program, such as the Jack OS when it is not compiled, are listed
+    as unknown callees, and are counted as using no stack.
+    """
+    # the words every call pushes: the return address, LCL, ARG, THIS and THAT:
+    saved_frame_size = 5
+
+    # the words the Hack stack has, from address 256 up to the heap at 2048:
+    hack_stack_size = 2048 - 256
+
+    # the change of the stack depth of commands that are not push, pop or call:
+    depth_changes = {
+        "add": -1, "sub": -1, "and": -1, "or": -1, "eq": -1, "gt": -1, "lt": -1,
+        "neg": 0, "not": 0, "shiftleft": 0, "shiftright": 0,
+        "label": 0, "goto": 0, "if-goto": -1, "function": 0
+    }
+
+    def __init__(self, commands: list) -> None:
+        """Analyzes a VM program.
+
+        Args:
+            commands (list): the VM commands of every function of the program.
+        """
+        self._functions = VMParser.split_to_functions(commands)
+        self.n_locals = {}
+        # the maximal operand-stack depth of every function, or None if it may
+        # grow without a bound, such as in a loop that pushes more than it pops:
+        self.max_depths = {}
+        # the (depth, callee) of every call site of every function, where the
+        # depth counts the arguments of the call:
+        self.call_sites = {}
+        for name, n_locals, function_commands in self._functions:
+            self.n_locals[name] = n_locals
+            self.max_depths[name], self.call_sites[name] = self.operand_stack(function_commands)
+        self.recursive = self._find_recursive()
+        self.worst_cases = {}
+        self.unknown_callees = {}
+        self._find_worst_cases()
+
+    def frame_size(self, name: str) -> typing.Optional[int]:
+        """
+        Args:
+            name (str): name of a function of the program.
+
+        Returns:
+            int: the words of the frame of the function, or None if its
+            operand stack is unbounded.
+        """
+        if self.max_depths[name] is None:
+            return None
+        return self.saved_frame_size + self.n_locals[name] + self.max_depths[name]
+
+    def function_report(self, name: str) -> dict:
+        """
+        Args:
+            name (str): name of a function of the program.
+
+        Returns:
+            dict: the stack usage of the function, in a form that can be
+            written as JSON.
+        """
+        return {
+            "max_stack_depth": self.max_depths[name],
+            "frame_size": self.frame_size(name),
+            "worst_case_stack": self.worst_cases[name],
+            "recursive": name in self.recursive,
+            "unknown_callees": sorted(self.unknown_callees[name])
+        }
+
+    def summary(self) -> dict:
+        """
+        Returns:
+            dict: the worst-case stack of the entry point of the program
+            (Sys.init, or Main.main if the Jack OS is not part of it) and the
+            headroom that leaves in the Hack stack, and the functions that may
+            call themselves.
+        """
+        entry = "Sys.init" if "Sys.init" in self.worst_cases else "Main.main"
+        worst_case = self.worst_cases.get(entry)
+        return {
+            "entry": entry if entry in self.worst_cases else None,
+            "worst_case_stack": worst_case,
+            "headroom": None if worst_case is None else self.hack_stack_size - worst_case,
+            "recursive_functions": sorted(self.recursive)
+        }
+
+    @classmethod
+    def operand_stack(cls, commands: list) -> tuple:
+        """
+        Args:
+            commands (list): the commands of a single function, starting with
+            its "function" command.
+
+        Returns:
+            tuple: (max_depth, call_sites): the maximal depth of the operand
+            stack of the function, or None if it is unbounded, and the
+            (depth, callee) of every call site.
+        """
+        labels = {command[1]: index for index, command in enumerate(commands) if command[0] == "label"}
+        # the largest depth before every command that was reached:
+        depths = [None] * len(commands)
+        # the depth can only grow past the number of commands in a loop that
+        # grows it on every iteration:
+        bound = len(commands)
+        max_depth = 0
+        to_visit = [(0, 0)]
+        while to_visit:
+            index, depth = to_visit.pop()
+            while index < len(commands) and (depths[index] is None or depths[index] < depth):
+                if depth > bound:
+                    return None, cls._call_sites(commands, depths)
+                depths[index] = depth
+                command = commands[index]
+                if command[0] == "push":
+                    depth += 1
+                elif command[0] == "pop":
+                    depth -= 1
+                elif command[0] == "call":
+                    depth += 1 - int(command[2])
+                elif command[0] == "return":
+                    break
+                else:
+                    depth += cls.depth_changes.get(command[0], 0)
+                max_depth = max(max_depth, depth)
+                if command[0] in ("goto", "if-goto") and command[1] in labels:
+                    to_visit.append((labels[command[1]], depth))
+                    if command[0] == "goto":
+                        break
+                index += 1
+        return max_depth, cls._call_sites(commands, depths)
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    @staticmethod
+    def _call_sites(commands: list, depths: list) -> list:
+        """
+        Returns:
+            list: the (depth, callee) of every reached call command.
+        """
+        return [(depths[index], command[1]) for index, command in enumerate(commands)
+                if command[0] == "call" and depths[index] is not None]
+
+    def _find_recursive(self) -> set:
+        """
+        Returns:
+            set: the functions that may call themselves, found as the strongly
+            connected components of the call graph (Tarjan's algorithm, with an
+            explicit stack, so deep call chains do not hit the recursion
+            limit of Python).
+        """
+        callees = {name: [callee for _, callee in self.call_sites[name] if callee in self.call_sites]
+                   for name in self.call_sites}
+        recursive = set()
+        indices = {}
+        low_links = {}
+        component_stack = []
+        on_stack = set()
+        for root in callees:
+            if root in indices:
+                continue
+            work = [(root, 0)]
+            while work:
+                name, child_index = work.pop()
+                if child_index == 0:
+                    indices[name] = low_links[name] = len(indices)
+                    component_stack.append(name)
+                    on_stack.add(name)
+                if child_index < len(callees[name]):
+                    work.append((name, child_index + 1))
+                    callee = callees[name][child_index]
+                    if callee not in indices:
+                        work.append((callee, 0))
+                    elif callee in on_stack:
+                        low_links[name] = min(low_links[name], indices[callee])
+                    continue
+                if work:
+                    caller = work[-1][0]
+                    low_links[caller] = min(low_links[caller], low_links[name])
+                if low_links[name] == indices[name]:
+                    component = []
+                    while True:
+                        member = component_stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == name:
+                            break
+                    if len(component) > 1 or name in callees[name]:
+                        recursive.update(component)
+        return recursive
+
+    def _find_worst_cases(self):
+        """Finds the worst-case stack of every function, callees first."""
+        for root in self.call_sites:
+            work = [root]
+            while work:
+                name = work[-1]
+                if name in self.worst_cases:
+                    work.pop()
+                    continue
+                pending = [callee for _, callee in self.call_sites[name]
+                           if callee in self.call_sites and callee not in self.worst_cases
+                           and callee not in self.recursive and callee != name]
+                if pending and name not in self.recursive:
+                    work.extend(pending)
+                    continue
+                work.pop()
+                self.worst_cases[name] = self._worst_case(name)
+
+    def _worst_case(self, name: str) -> typing.Optional[int]:
+        """
+        Returns:
+            int: the worst-case stack of a function whose callees are done,
+            or None if it is unbounded.
+        """
+        self.unknown_callees[name] = {callee for _, callee in self.call_sites[name] if callee not in self.call_sites}
+        frame_size = self.frame_size(name)
+        if name in self.recursive or frame_size is None:
+            return None
+        base = self.saved_frame_size + self.n_locals[name]
+        worst_case = frame_size
+        for depth, callee in self.call_sites[name]:
+            if callee in self.unknown_callees[name]:
+                continue
+            if callee in self.recursive or self.worst_cases[callee] is None:
+                return None
+            worst_case = max(worst_case, base + depth + self.worst_cases[callee])
+        return worst_case
@@ -0,0 +1,488 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from ControlFlowGraph import ControlFlowGraph
+from VMReport import VMReport
+
+
+class StrengthReducer:
+    """An optimization that lowers the cost of array accesses. The compiler
+    computes "push index; push base; add; pop pointer 1" before every access
+    of "that 0", and an array write keeps its value in temp 0 while it sets
+    "pointer 1".
+
+    - Adding or subtracting a constant 0, as the index of a[0] does, is
+      folded away.
+    - An array write computes its value before its address, so the value
+      does not wait in temp 0, when the value does not change what the
+      address reads.
+    - In a while loop, an address base + i or base + i +- c, where base does
+      not change in the loop and every write of i in the loop adds or
+      subtracts a constant (an induction variable), is pushed from a new
+      local that keeps base + i: it is set before the loop, and changes by
+      the same constant right after every write of i. When the loop then
+      reads a local i only to test its condition against a bound the loop
+      does not change, and i is not read after the loop, the condition tests
+      the new local against base + bound instead, and i is not written in
+      the loop at all. The VM compares by the sign of the 16-bit difference,
+      which adding base to both sides keeps. An induction variable is only
+      reduced if the estimated Hack cost of the loop body goes down (see
+      VMReport).
+    - A "pop pointer 1" of an address that "pointer 1" already holds within
+      the block, since nothing the address reads was written, is removed
+      with the computation of the address. Calls keep "pointer 1", since the
+      VM restores it on return.
+    """
+    # the name, representation and dependencies of the pass (see PassManager).
+    # Constant indices are known once constants are propagated, and unrolled
+    # loops keep no induction variables:
+    name = "strength"
+    representation = "ir"
+    depends_on = ("cse", "licm", "unroll", "propagate")
+
+    # the commands that end an array write, once its address and its value
+    # are on the stack, and the commands that end it once its value is
+    # computed before its address:
+    store_commands = [("pop", "temp", 0), ("pop", "pointer", 1), ("push", "temp", 0), ("pop", "that", 0)]
+    sunk_store_commands = [("pop", "pointer", 1), ("pop", "that", 0)]
+
+    # the segments an address may read, and those of them that are stored in
+    # memory, which calls and writes through other segments may change:
+    address_segments = ("constant", "local", "argument", "static", "this")
+    memory_segments = ("static", "this", "that")
+
+    # the segments of induction variables, and of the bases of addresses:
+    variable_segments = ("local", "argument")
+    base_segments = ("local", "argument", "static", "this")
+
+    # the number of values every command that does not jump pops and pushes,
+    # by its first word:
+    stack_effects_dictionary = {
+        "push": (0, 1), "pop": (1, 0),
+        "add": (2, 1), "sub": (2, 1), "and": (2, 1), "or": (2, 1), "eq": (2, 1), "gt": (2, 1), "lt": (2, 1),
+        "neg": (1, 1), "not": (1, 1), "shiftleft": (1, 1), "shiftright": (1, 1)
+    }
+
+    # the estimated cost of keeping a running address up to date after a
+    # single write of its induction variable:
+    update_cost = VMReport.estimate_hack_cost(
+        [("push", "local", 0), ("push", "constant", 1), ("add",), ("pop", "local", 0)])
+
+    def __init__(self) -> None:
+        """Creates a new optimization."""
+        # the number of constant 0 offsets folded, array writes whose value
+        # no longer waits in temp 0, address computations replaced by running
+        # addresses, loop tests moved to running addresses and "pop pointer
+        # 1" commands removed, in all the optimized functions:
+        self.folded = 0
+        self.stores = 0
+        self.reduced = 0
+        self.tests_replaced = 0
+        self.pointer_reuses = 0
+
+    def run(self, commands: list) -> list:
+        """
+        Args:
+            commands (list): the commands of a single function, starting with
+            its "function" command.
+
+        Returns:
+            list: the commands of the function, with cheaper array accesses.
+        """
+        commands = self._sink_stores(self._fold_zero_offsets(commands))
+        # inner loops first, so the locals they add are invariant in their
+        # outer loops:
+        for label in self._loop_labels(commands):
+            commands = self._reduce(commands, label)
+        return self._reuse_pointer(commands)
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    @staticmethod
+    def _loop_labels(commands: list) -> list:
+        """
+        Returns:
+            list: the labels that start loops, inner loops first.
+        """
+        label_indices = {}
+        loops = {}
+        for index, command in enumerate(commands):
+            if command[0] == "label":
+                label_indices[command[1]] = index
+            elif command[0] == "goto" and command[1] in label_indices:
+                loops[command[1]] = index - label_indices[command[1]]
+        return sorted(loops, key=lambda label: loops[label])
+
+    @staticmethod
+    def _find_loop(commands: list, label: str) -> typing.Optional[tuple]:
+        """
+        Returns:
+            tuple: (header, back_edge), the indices of the label of the loop and
+            of the last "goto" back to it, or None if the loop may be entered
+            other than through its label.
+        """
+        header = commands.index(("label", label))
+        back_edge = max(index for index, command in enumerate(commands)
+                        if command == ("goto", label) and index > header)
+        if commands[header - 1][0] in ("goto", "return"):
+            return None
+        inner_labels = {command[1] for command in commands[header + 1:back_edge + 1]
+                        if command[0] == "label"}
+        for index, command in enumerate(commands):
+            if command[0] not in ("goto", "if-goto") or header < index <= back_edge:
+                continue
+            if command[1] == label or command[1] in inner_labels:
+                return None
+        return header, back_edge
+
+    def _fold_zero_offsets(self, commands: list) -> list:
+        """
+        Returns:
+            list: the commands, without the additions of a constant 0 and the
+            subtractions of a constant 0 from a single pushed value.
+        """
+        new_commands = []
+        for command in commands:
+            new_commands.append(command)
+            if command[0] not in ("add", "sub") or len(new_commands) < 3 or \
+                    new_commands[-3][0] != "push" or new_commands[-2][0] != "push":
+                continue
+            if new_commands[-2] == ("push", "constant", 0):
+                del new_commands[-2:]
+                self.folded += 1
+            elif command == ("add",) and new_commands[-3] == ("push", "constant", 0):
+                del new_commands[-1]
+                del new_commands[-2]
+                self.folded += 1
+        return new_commands
+
+    def _address_start(self, commands: list, end: int) -> typing.Optional[int]:
+        """
+        Returns:
+            int: the index of the first of the commands that end before the
+            given index and compute the value they leave on the stack, or
+            None if they are not a pure computation of additions and
+            subtractions of address_segments.
+        """
+        needed = 1
+        for index in range(end - 1, 0, -1):
+            command = commands[index]
+            if command[0] == "push" and command[1] in self.address_segments:
+                needed -= 1
+            elif command[0] in ("add", "sub"):
+                needed += 1
+            elif command != ("neg",):
+                return None
+            if needed == 0:
+                return index
+        return None
+
+    def _value_start(self, commands: list, end: int) -> typing.Optional[int]:
+        """
+        Returns:
+            int: the index of the first of the commands of the block that end
+            before the given index and leave a single value on the stack
+            without popping what was on it before them, taking as many
+            commands as possible, or None if there are none.
+        """
+        needed = 1
+        start = None
+        for index in range(end - 1, 0, -1):
+            effect = self.stack_effects_dictionary.get(commands[index][0])
+            if commands[index][0] == "call":
+                effect = (int(commands[index][2]), 1)
+            if effect is None or needed < effect[1]:
+                break
+            needed += effect[0] - effect[1]
+            if needed == 0:
+                start = index
+        return start
+
+    def _is_unchanged(self, address: list, commands: list) -> bool:
+        """
+        Returns:
+            bool: do the given commands leave unchanged everything the address
+            reads?
+        """
+        reads = {(command[1], command[2]) for command in address
+                 if command[0] == "push" and command[1] != "constant"}
+        reads_memory = any(segment in self.memory_segments for segment, _ in reads)
+        for command in commands:
+            if command[0] == "pop" and ((command[1], command[2]) in reads or reads_memory and (
+                    command[1] in self.memory_segments or command[1:] == ("pointer", 0))):
+                return False
+            if command[0] == "call" and reads_memory:
+                return False
+        return True
+
+    def _sink_stores(self, commands: list) -> list:
+        """
+        Returns:
+            list: the commands, with the array writes whose address can be
+            computed after their value doing so.
+        """
+        index = len(commands) - len(self.store_commands)
+        while index > 0:
+            if commands[index:index + len(self.store_commands)] == self.store_commands:
+                value_start = self._value_start(commands, index)
+                address_start = None if value_start is None else self._address_start(commands, value_start)
+                if address_start is not None and \
+                        self._is_unchanged(commands[address_start:value_start], commands[value_start:index]):
+                    self.stores += 1
+                    commands = commands[:address_start] + commands[value_start:index] + \
+                        commands[address_start:value_start] + self.sunk_store_commands + \
+                        commands[index + len(self.store_commands):]
+                    index = address_start
+            index -= 1
+        return commands
+
+    def _match_address(self, commands: list, index: int, steps: dict,
+                       is_invariant: typing.Callable) -> typing.Optional[tuple]:
+        """
+        Returns:
+            tuple: (variable, base, end, offset) of the address base + variable
+            that the commands from the given index compute, where variable is
+            an induction variable and base is invariant: end is the index after
+            the address, and offset is the commands that add or subtract its
+            constant, if any. None if the commands do not compute such an
+            address.
+        """
+        window = commands[index:index + 5]
+        if len(window) < 3 or window[0][0] != "push" or window[1][0] != "push":
+            return None
+
+        def variable_of(command):
+            return (command[1], command[2]) if (command[1], command[2]) in steps else None
+
+        def is_base(command):
+            return command[0] == "push" and command[1] in self.base_segments and \
+                (command[1], command[2]) not in steps and is_invariant(command)
+
+        if window[2] == ("add",):
+            if variable_of(window[0]) and is_base(window[1]):
+                return variable_of(window[0]), window[1], index + 3, []
+            if variable_of(window[1]) and is_base(window[0]):
+                return variable_of(window[1]), window[0], index + 3, []
+        if len(window) < 5 or window[4] != ("add",):
+            return None
+        if variable_of(window[0]) and window[1][:2] == ("push", "constant") and window[2][0] in ("add", "sub") \
+                and is_base(window[3]):
+            return variable_of(window[0]), window[3], index + 5, [window[1], window[2]]
+        if is_base(window[0]) and variable_of(window[1]) and window[2][:2] == ("push", "constant") \
+                and window[3][0] in ("add", "sub"):
+            return variable_of(window[1]), window[0], index + 5, [window[2], window[3]]
+        return None
+
+    def _match_test(self, commands: list, header: int, back_edge: int, variable: tuple,
+                    is_invariant: typing.Callable) -> typing.Optional[tuple]:
+        """
+        Returns:
+            tuple: (comparison, bound, is_variable_first) of the loop condition
+            "variable <comparison> bound" or "bound <comparison> variable",
+            where comparison is the index of "lt", "gt" or "eq" and bound is
+            the commands that compute an invariant value, or None if the
+            condition is not such a test that ends the loop.
+        """
+        comparison = header + 1
+        while comparison < back_edge and (commands[comparison][0] == "push" or
+                                          commands[comparison][0] in ("add", "sub", "neg")):
+            comparison += 1
+        if commands[comparison][0] not in ("lt", "gt", "eq") or commands[comparison + 1] != ("not",) \
+                or commands[comparison + 2][0] != "if-goto" \
+                or commands[back_edge + 1] != ("label", commands[comparison + 2][1]):
+            return None
+        push_variable = ("push",) + variable
+        if commands[header + 1] == push_variable:
+            bound_start, bound_end, is_variable_first = header + 2, comparison, True
+        elif commands[comparison - 1] == push_variable:
+            bound_start, bound_end, is_variable_first = header + 1, comparison - 1, False
+        else:
+            return None
+        bound = commands[bound_start:bound_end]
+        if self._address_start(commands, bound_end) != bound_start or \
+                not all(command[0] != "push" or command[1] == "constant" or is_invariant(command)
+                        for command in bound):
+            return None
+        return comparison, bound, is_variable_first
+
+    def _reduce(self, commands: list, label: str) -> list:
+        """
+        Returns:
+            list: the commands of the function, with the addresses of the
+            induction variables of the loop that starts at the given label
+            kept in running locals, where it lowers the cost.
+        """
+        loop = self._find_loop(commands, label)
+        if loop is None:
+            return commands
+        header, back_edge = loop
+        writes = {}
+        memory_written = False
+        for index in range(header + 1, back_edge):
+            command = commands[index]
+            if command[0] == "pop":
+                writes.setdefault((command[1], command[2]), []).append(index)
+                memory_written |= command[1] in self.memory_segments or command[1:] == ("pointer", 0)
+            elif command[0] == "call":
+                memory_written = True
+
+        def is_invariant(command):
+            variable = (command[1], command[2])
+            return variable not in writes and (command[1] in self.variable_segments or not memory_written)
+
+        # maps every induction variable to the (index, step commands) of its
+        # writes, which are "push variable; push constant c; add|sub; pop
+        # variable":
+        steps = {}
+        for variable, pop_indices in writes.items():
+            if variable[0] in self.variable_segments and all(
+                    commands[pop_index - 3] == ("push",) + variable and
+                    commands[pop_index - 2][:2] == ("push", "constant") and
+                    commands[pop_index - 1][0] in ("add", "sub") for pop_index in pop_indices):
+                steps[variable] = [(pop_index, commands[pop_index - 2:pop_index]) for pop_index in pop_indices]
+        if not steps:
+            return commands
+        # maps every (variable, base) to the (start, end, offset) of its
+        # addresses:
+        addresses = {}
+        index = header + 1
+        while index < back_edge:
+            match = self._match_address(commands, index, steps, is_invariant)
+            if match is None:
+                index += 1
+                continue
+            variable, base, end, offset = match
+            addresses.setdefault((variable, base), []).append((index, end, offset))
+            index = end
+
+        def gain(key):
+            return sum(VMReport.estimate_hack_cost(commands[start:end]) -
+                       VMReport.estimate_hack_cost([("push", "local", 0)] + offset)
+                       for start, end, offset in addresses[key]) - len(steps[key[0]]) * self.update_cost
+
+        selected = []
+        # maps the variables whose loop test moves to a running address to
+        # the test:
+        tests = {}
+        for variable in sorted(steps):
+            keys = [key for key in sorted(addresses) if key[0] == variable]
+            profitable = [key for key in keys if gain(key) > 0]
+            test = self._match_test(commands, header, back_edge, variable, is_invariant) \
+                if keys and variable[0] == "local" else None
+            if test is not None and self._is_only_tested(commands, header, back_edge, variable, keys,
+                                                         addresses, test):
+                test_gain = len(steps[variable]) * VMReport.estimate_hack_cost(
+                    [("push",) + variable] + steps[variable][0][1] + [("pop",) + variable]) + \
+                    VMReport.command_cost(("push",) + variable) - VMReport.command_cost(("push", "local", 0))
+                if sum(gain(key) for key in keys) + test_gain > sum(gain(key) for key in profitable):
+                    profitable = keys
+                    tests[variable] = test
+            selected += profitable
+        if not selected:
+            return commands
+        return self._rewrite(commands, header, back_edge, selected, addresses, steps, tests)
+
+    def _is_only_tested(self, commands: list, header: int, back_edge: int, variable: tuple, keys: list,
+                        addresses: dict, test: tuple) -> bool:
+        """
+        Returns:
+            bool: once the addresses of the given keys are replaced, is the
+            variable only read by the loop test and its own writes in the
+            loop, and not read once the loop ends?
+        """
+        comparison, bound, is_variable_first = test
+        push_variable = ("push",) + variable
+        allowed = {header + 1 if is_variable_first else comparison - 1}
+        for key in keys:
+            allowed.update(start for start, _, _ in addresses[key])
+            allowed.update(start + 1 for start, _, _ in addresses[key])
+        for index in range(header + 1, back_edge):
+            command = commands[index]
+            if command == push_variable and index not in allowed and \
+                    commands[index + 3] != ("pop",) + variable:
+                return False
+            if command[0] in ("goto", "if-goto") and index != comparison + 2 and \
+                    ("label", command[1]) not in commands[header + 1:back_edge]:
+                return False
+        graph = ControlFlowGraph(commands)
+        live_in, _ = graph.live_locals()
+        return variable[1] not in live_in[graph.label_blocks[commands[comparison + 2][1]]]
+
+    def _rewrite(self, commands: list, header: int, back_edge: int, selected: list, addresses: dict,
+                 steps: dict, tests: dict) -> list:
+        """
+        Returns:
+            list: the commands of the function, with a running local for every
+            selected (variable, base) of the loop, and the given tests moved to
+            running locals.
+        """
+        _, name, n_locals = commands[0]
+        preheader = []
+        # maps the start of every replaced range to its end and replacement:
+        replacements = {}
+        # maps every reduced variable to the commands that update its running
+        # locals after every write of it:
+        updates = {}
+        for variable, base in selected:
+            running = ("local", n_locals)
+            n_locals += 1
+            preheader += [("push",) + variable, base, ("add",), ("pop",) + running]
+            for start, end, offset in addresses[(variable, base)]:
+                replacements[start] = (end, [("push",) + running] + offset)
+                self.reduced += 1
+            updates.setdefault(variable, []).append(running)
+            if variable in tests and len(updates[variable]) == 1:
+                comparison, bound, is_variable_first = tests[variable]
+                limit = ("local", n_locals)
+                n_locals += 1
+                preheader += bound + [base, ("add",), ("pop",) + limit]
+                replacements[header + 1] = (comparison, [("push",) + running, ("push",) + limit]
+                                            if is_variable_first else [("push",) + limit, ("push",) + running])
+                self.tests_replaced += 1
+        for variable, running_locals in updates.items():
+            for pop_index, step in steps[variable]:
+                update = [] if variable in tests else [("push",) + variable] + step + [("pop",) + variable]
+                for running in running_locals:
+                    update += [("push",) + running] + step + [("pop",) + running]
+                replacements[pop_index - 3] = (pop_index + 1, update)
+
+        new_commands = [("function", name, n_locals)] + commands[1:header] + preheader + [commands[header]]
+        index = header + 1
+        while index < len(commands):
+            if index in replacements:
+                index, replacement = replacements[index]
+                new_commands.extend(replacement)
+            else:
+                new_commands.append(commands[index])
+                index += 1
+        return new_commands
+
+    def _reuse_pointer(self, commands: list) -> list:
+        """
+        Returns:
+            list: the commands, without the computations of addresses that
+            "pointer 1" already holds, and their "pop pointer 1".
+        """
+        new_commands = []
+        # the commands that computed the address "pointer 1" holds:
+        pointer = None
+        for index, command in enumerate(commands):
+            if command[0] in ("function", "label"):
+                pointer = None
+            elif command == ("pop", "pointer", 1):
+                start = self._address_start(commands, index)
+                address = None if start is None else commands[start:index]
+                if address is not None and address == pointer:
+                    del new_commands[start - index:]
+                    self.pointer_reuses += 1
+                    continue
+                pointer = address
+            elif pointer is not None and not self._is_unchanged(pointer, [command]):
+                pointer = None
+            new_commands.append(command)
+        return new_commands
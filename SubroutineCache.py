@@ -0,0 +1,109 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import hashlib
+
+
+class SubroutineCache:
+    """Keeps the compiled VM code of subroutines, so a class can be compiled
+    again while only the subroutines that changed are compiled.
+
+    The VM code of a subroutine only depends on the name of its class, its
+    own tokens, the class-scope variables it names, and for constructors the
+    number of fields, since every subroutine starts its own label counters,
+    and on the options of the engine that change the code it emits: the
+    Jack OS functions it expands inline and the optimizations of its writer.
+    These make up the fingerprint of the subroutine (see fingerprint), and
+    the engine reuses the cached code of a subroutine whose fingerprint did
+    not change.
+
+    The optimizations are told apart by the names of their passes only, so
+    a cache must not be shared by builds whose passes have different
+    options, such as different execution profiles.
+    """
+
+    def __init__(self) -> None:
+        """Creates a new empty cache."""
+        # maps every fingerprint to the commands, the signature, the
+        # dependencies and the intrinsic counts of its subroutine:
+        self._entries = {}
+        # maps the name of every class to the fingerprints of its subroutines
+        # in the last compilation of the class:
+        self._class_fingerprints = {}
+        # the number of subroutines that were reused and that were compiled:
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(class_name: str, tokens: tuple, class_symbols: tuple, n_fields: int,
+                    options: tuple = ()) -> str:
+        """
+        Args:
+            class_name (str): the name of the class of the subroutine.
+            tokens (tuple): the (type, value) tokens of the subroutine.
+            class_symbols (tuple): the (name, (type, kind, index)) entries of
+            the class-scope variables the subroutine names.
+            n_fields (int): the number of fields of the class, for constructors.
+            options (tuple): the options of the engine that change the code
+            it emits, such as the intrinsics it expands.
+
+        Returns:
+            str: the fingerprint of the subroutine.
+        """
+        return hashlib.sha256(repr((class_name, tokens, class_symbols, n_fields, options)).encode()).hexdigest()
+
+    def get(self, fingerprint: str) -> tuple:
+        """
+        Args:
+            fingerprint (str): the fingerprint of a subroutine.
+
+        Returns:
+            tuple: (commands, signature, dependencies, intrinsic_rewrites): the
+            cached commands, signature, dependencies and intrinsic counts of
+            the subroutine, or None if it is not cached.
+        """
+        entry = self._entries.get(fingerprint)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, fingerprint: str, commands: list, signature: tuple, dependencies: tuple,
+            intrinsic_rewrites: dict = None) -> None:
+        """Caches a compiled subroutine.
+
+        Args:
+            fingerprint (str): the fingerprint of the subroutine.
+            commands (list): its commands, starting with its "function" command.
+            signature (tuple): its (name, kind, n_params, n_locals), as in
+            CompilationEngine.subroutines.
+            dependencies (tuple): the (called classes, type classes) of the
+            subroutine, as frozensets.
+            intrinsic_rewrites (dict): maps the name of every Jack OS function
+            whose calls the subroutine expanded inline to the number of its
+            expanded calls, which a reuse of the subroutine counts again.
+        """
+        self._entries[fingerprint] = (commands, signature, dependencies, dict(intrinsic_rewrites or {}))
+
+    def retain(self, class_name: str, fingerprints: list) -> None:
+        """Removes the subroutines the class had in its previous compilation
+        and no longer has, so editing a class does not grow the cache.
+
+        Args:
+            class_name (str): the name of the class that was compiled.
+            fingerprints (list): the fingerprints of its subroutines.
+        """
+        for fingerprint in self._class_fingerprints.get(class_name, set()) - set(fingerprints):
+            self._entries.pop(fingerprint, None)
+        self._class_fingerprints[class_name] = set(fingerprints)
+
+    def __len__(self) -> int:
+        """
+        Returns:
+            int: the number of cached subroutines.
+        """
+        return len(self._entries)
@@ -0,0 +1,290 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import os
+import sys
+import typing
+import VMWriter
+from VMParser import VMParser
+
+
+class VMBytecode:
+    """A compact binary encoding of VM code (.vmb files).
+
+    The file starts with the magic bytes "JVMB" and a version byte, followed
+    by three sections. Every number is an unsigned LEB128 varint.
+    1. The name table: the number of names, and then every label and
+       function name as its length and its UTF-8 bytes. Commands refer to
+       names by their index in the table.
+    2. The function index: the number of functions, and then the name index
+       of every function and the offset of its "function" command in the
+       code section.
+    3. The code section: its length in bytes, and then the commands. Every
+       command is a single opcode byte followed by its arguments: the index
+       of push and pop, the name of label, goto and if-goto, and the name and
+       the number of call and function.
+
+    Decoding an encoded file gives back exactly the encoded commands, so the
+    VM code written from them is exactly the VM code they were parsed from.
+    """
+    MAGIC = b"JVMB"
+    VERSION = 1
+
+    # the segments of push and pop, in the order of their opcodes:
+    segments = ("constant", "argument", "local", "static", "this", "that", "pointer", "temp")
+
+    # the commands without arguments, in the order of their opcodes:
+    plain_commands = ("add", "sub", "neg", "eq", "gt", "lt", "and", "or", "not",
+                      "shiftleft", "shiftright", "return")
+
+    # the commands with a name argument, in the order of their opcodes:
+    name_commands = ("label", "goto", "if-goto", "call", "function")
+
+    def __init__(self, data: bytes) -> None:
+        """Loads the name table and the function index of encoded VM code.
+        Commands are only decoded when they are asked for.
+
+        Args:
+            data (bytes): encoded VM code.
+        """
+        if data[:len(self.MAGIC)] != self.MAGIC or data[len(self.MAGIC)] != self.VERSION:
+            raise ValueError("not a version {} .vmb file".format(self.VERSION))
+        self._data = data
+        position = len(self.MAGIC) + 1
+        n_names, position = self.read_varint(data, position)
+        self.names = []
+        for _ in range(n_names):
+            length, position = self.read_varint(data, position)
+            self.names.append(data[position:position + length].decode("utf-8"))
+            position += length
+        n_functions, position = self.read_varint(data, position)
+        # maps the name of every function to the offset of its code:
+        self.function_offsets = {}
+        for _ in range(n_functions):
+            name_index, position = self.read_varint(data, position)
+            offset, position = self.read_varint(data, position)
+            self.function_offsets[self.names[name_index]] = offset
+        code_length, position = self.read_varint(data, position)
+        self._code_start = position
+        self._code_end = position + code_length
+
+    def commands(self) -> list:
+        """
+        Returns:
+            list: all the encoded commands.
+        """
+        return self._decode(self._code_start, None)
+
+    def function(self, name: str) -> list:
+        """
+        Args:
+            name (str): the name of a function.
+
+        Returns:
+            list: the commands of the function, starting with its "function"
+            command.
+        """
+        return self._decode(self._code_start + self.function_offsets[name], name)
+
+    @staticmethod
+    def load_commands(path: str) -> list:
+        """
+        Args:
+            path (str): path of a .vm or a .vmb file.
+
+        Returns:
+            list: the commands of the file.
+        """
+        if path.endswith(".vmb"):
+            with open(path, 'rb') as input_file:
+                return VMBytecode(input_file.read()).commands()
+        with open(path, 'r') as input_file:
+            return VMParser(input_file).commands
+
+    @classmethod
+    def encode(cls, commands: list) -> bytes:
+        """
+        Args:
+            commands (list): VM commands.
+
+        Returns:
+            bytes: the encoded commands.
+        """
+        name_indices = {}
+        names = []
+        function_offsets = []
+        code = bytearray()
+        for command in commands:
+            command_word = command[0]
+            if command_word in ("push", "pop"):
+                code.append(cls._opcode(command_word, command[1]))
+                cls.write_varint(code, command[2])
+                continue
+            if command_word in cls.plain_commands:
+                code.append(cls._opcode(command_word))
+                continue
+            if command[1] not in name_indices:
+                name_indices[command[1]] = len(names)
+                names.append(command[1])
+            if command_word == "function":
+                function_offsets.append((name_indices[command[1]], len(code)))
+            code.append(cls._opcode(command_word))
+            cls.write_varint(code, name_indices[command[1]])
+            if command_word in ("call", "function"):
+                cls.write_varint(code, command[2])
+
+        data = bytearray(cls.MAGIC)
+        data.append(cls.VERSION)
+        cls.write_varint(data, len(names))
+        for name in names:
+            encoded_name = name.encode("utf-8")
+            cls.write_varint(data, len(encoded_name))
+            data += encoded_name
+        cls.write_varint(data, len(function_offsets))
+        for name_index, offset in function_offsets:
+            cls.write_varint(data, name_index)
+            cls.write_varint(data, offset)
+        cls.write_varint(data, len(code))
+        data += code
+        return bytes(data)
+
+    @staticmethod
+    def write_varint(data: bytearray, value: int) -> None:
+        """Appends the value to data as an unsigned LEB128 varint.
+
+        Args:
+            data (bytearray): the encoded data.
+            value (int): a non-negative number.
+        """
+        while value >= 0x80:
+            data.append((value & 0x7f) | 0x80)
+            value >>= 7
+        data.append(value)
+
+    @staticmethod
+    def read_varint(data: bytes, position: int) -> tuple:
+        """
+        Args:
+            data (bytes): encoded data.
+            position (int): the position of a varint in data.
+
+        Returns:
+            tuple: (value, position): the varint at the given position of data,
+            and the position after it.
+        """
+        value = 0
+        shift = 0
+        while True:
+            byte = data[position]
+            position += 1
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return value, position
+            shift += 7
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    @classmethod
+    def _opcode(cls, command_word: str, segment: str = None) -> int:
+        """
+        Returns:
+            int: the opcode of the given command. Opcodes of push are 0-7,
+            of pop 8-15, of the plain commands from 16 and of the name
+            commands after them.
+        """
+        if command_word == "push":
+            return cls.segments.index(segment)
+        if command_word == "pop":
+            return len(cls.segments) + cls.segments.index(segment)
+        if command_word in cls.plain_commands:
+            return 2 * len(cls.segments) + cls.plain_commands.index(command_word)
+        return 2 * len(cls.segments) + len(cls.plain_commands) + cls.name_commands.index(command_word)
+
+    def _decode(self, position: int, function_name: typing.Optional[str]) -> list:
+        """
+        Args:
+            position (int): the position of the first command to decode.
+            function_name (str): if given, decoding stops before the "function"
+            command of the next function.
+
+        Returns:
+            list: the decoded commands.
+        """
+        data = self._data
+        n_segments = len(self.segments)
+        n_plain = len(self.plain_commands)
+        commands = []
+        while position < self._code_end:
+            opcode = data[position]
+            position += 1
+            if opcode < 2 * n_segments:
+                index, position = self.read_varint(data, position)
+                command_word = "push" if opcode < n_segments else "pop"
+                commands.append((command_word, self.segments[opcode % n_segments], index))
+                continue
+            opcode -= 2 * n_segments
+            if opcode < n_plain:
+                commands.append((self.plain_commands[opcode],))
+                continue
+            command_word = self.name_commands[opcode - n_plain]
+            name_index, position = self.read_varint(data, position)
+            name = self.names[name_index]
+            if command_word == "function" and function_name is not None and commands:
+                break
+            if command_word in ("call", "function"):
+                number, position = self.read_varint(data, position)
+                commands.append((command_word, name, number))
+            else:
+                commands.append((command_word, name))
+        return commands
+
+
+class VMBytecodeWriter(VMWriter.VMWriter):
+    """Writes the VM commands the compilation engine emits as a .vmb file,
+    instead of as VM code (see VMBytecode).
+    """
+
+    def __init__(self, output_stream: typing.BinaryIO, optimizations: list = ()) -> None:
+        """Creates a new writer.
+
+        Args:
+            output_stream (typing.BinaryIO): the binary stream to write to.
+            optimizations (list): optimizations to run on every function
+            before it is written, as in VMWriter.
+        """
+        super().__init__(output_stream, optimizations)
+        self._written_commands = []
+
+    def close(self) -> None:
+        """Encodes all the written commands and closes the output stream."""
+        self._flush()
+        self._write_class()
+        self._output_file.write(VMBytecode.encode(self._written_commands))
+        self._output_file.close()
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    def _write_commands(self, commands: list) -> None:
+        """Keeps the given commands until the file is closed."""
+        self._written_commands.extend(commands)
+
+
+if "__main__" == __name__:
+    # Converts a .vm file to a .vmb file next to it, or prints the VM code of
+    # a .vmb file.
+    if not len(sys.argv) == 2:
+        sys.exit("Invalid usage, please use: VMBytecode <.vm or .vmb file>")
+    input_path = sys.argv[1]
+    if input_path.endswith(".vmb"):
+        with open(input_path, 'rb') as input_file:
+            sys.stdout.write(''.join(VMWriter.VMWriter.command_to_string(command)
+                                     for command in VMBytecode(input_file.read()).commands()))
+    else:
+        with open(input_path, 'r') as input_file, \
+                open(os.path.splitext(input_path)[0] + ".vmb", 'wb') as output_file:
+            output_file.write(VMBytecode.encode(VMParser(input_file).commands))
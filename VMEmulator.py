@@ -0,0 +1,383 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import os
+import sys
+from ExecutionProfile import ExecutionProfile
+from VMBytecode import VMBytecode
+from VMReport import VMReport
+
+
+class VMEmulatorError(Exception):
+    """Raised when the emulated program fails, or runs out of steps."""
+
+
+class VMEmulator:
+    """Runs VM code and measures how many VM commands it executes and how
+    many Hack instructions they are estimated to take.
+
+    The memory layout follows the VM specification: the stack starts at 256,
+    the heap at 2048, temp is RAM[5..12] and every class has its own range of
+    statics starting at 16. The functions of the Jack OS that are not given
+    as VM code are emulated natively, each at a fixed estimated Hack cost.
+    """
+    # the first addresses of the stack, the heap and the statics:
+    STACK_BASE = 256
+    HEAP_BASE = 2048
+    STATIC_BASE = 16
+
+    # the number of words in the RAM:
+    RAM_SIZE = 32768
+
+    # the addresses of the pointers of the VM:
+    SP, LCL, ARG, THIS, THAT = 0, 1, 2, 3, 4
+
+    # the base address of the fixed segments:
+    fixed_segments_dictionary = {"pointer": 3, "temp": 5}
+
+    # the pointers of the segments that are relative to a pointer:
+    pointer_segments_dictionary = {"local": 1, "argument": 2, "this": 3, "that": 4}
+
+    # the estimated number of Hack instructions of every emulated OS function:
+    native_cost_dictionary = {
+        "Math.multiply": 350,
+        "Math.divide": 600,
+        "Math.abs": 60,
+        "Math.min": 70,
+        "Math.max": 70,
+        "Math.sqrt": 1200,
+        "Memory.peek": 60,
+        "Memory.poke": 60,
+        "Memory.alloc": 200,
+        "Memory.deAlloc": 100,
+        "Array.new": 250,
+        "Array.dispose": 150,
+        "String.new": 300,
+        "String.appendChar": 120,
+        "String.length": 60,
+        "String.charAt": 80,
+        "String.dispose": 150,
+        "Output.printInt": 500,
+        "Output.printString": 500,
+        "Output.printChar": 300,
+        "Output.println": 200,
+        "Sys.halt": 0,
+        "Sys.error": 0
+    }
+
+    def __init__(self, commands: list, step_limit: int = 10 ** 7) -> None:
+        """Loads the given VM code.
+
+        Args:
+            commands (list): the commands of all the functions of the program.
+            step_limit (int): the maximal number of VM commands to execute.
+        """
+        self.step_limit = step_limit
+        # the executed VM commands and their estimated Hack cost:
+        self.steps = 0
+        self.hack_cost = 0
+        # everything printed by the program, one string per print call:
+        self.output = []
+        # if given, an ExecutionProfile that counts the calls of the VM
+        # functions and the jumps of every "if-goto":
+        self.profile = None
+        self.ram = [0] * self.RAM_SIZE
+        self._commands = []
+        self._function_addresses = {}
+        self._label_addresses = {}
+        self._static_bases = {}
+        self._heap_top = self.HEAP_BASE
+        self._load(commands)
+
+    def call(self, function_name: str, arguments: list = ()) -> int:
+        """Calls a function, runs it until it returns and returns its value.
+
+        Args:
+            function_name (str): the function to call.
+            arguments (list): the arguments to call the function with.
+
+        Returns:
+            int: the value the function returned.
+        """
+        self.ram[self.SP] = self.STACK_BASE
+        for argument in arguments:
+            self._push(self._to_word(argument))
+        return_marker = -1
+        address = self._call(function_name, len(arguments), return_marker)
+        self._run(address, return_marker)
+        return self._pop()
+
+    def run_main(self) -> None:
+        """Runs the program from Sys.init if it is given, or else from
+        Main.main.
+        """
+        if "Sys.init" in self._function_addresses:
+            self.call("Sys.init")
+        else:
+            self.call("Main.main")
+
+    @classmethod
+    def from_directory(cls, path: str, step_limit: int = 10 ** 7) -> "VMEmulator":
+        """
+        Args:
+            path (str): a directory of .vm or .vmb files, or a single file.
+            step_limit (int): the maximal number of VM commands to execute.
+
+        Returns:
+            VMEmulator: an emulator loaded with all the given files.
+        """
+        if os.path.isdir(path):
+            paths = [os.path.join(path, filename) for filename in sorted(os.listdir(path))]
+        else:
+            paths = [path]
+        commands = []
+        for vm_path in paths:
+            if vm_path.endswith(".vm") or vm_path.endswith(".vmb"):
+                commands += VMBytecode.load_commands(vm_path)
+        return cls(commands, step_limit)
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    def _load(self, commands: list):
+        """
+        loads the commands, resolving the addresses of functions and labels
+        Returns:
+           Nothing- just init this._commands and the address dictionaries
+        """
+        function_name = ""
+        static_counts = {}
+        for command in commands:
+            if command[0] == "function":
+                function_name = command[1]
+                self._function_addresses[function_name] = len(self._commands)
+            elif command[0] == "label":
+                self._label_addresses[(function_name, command[1])] = len(self._commands)
+            elif len(command) == 3 and command[1] == "static":
+                class_name = function_name.split(".")[0]
+                static_counts[class_name] = max(static_counts.get(class_name, 0), command[2] + 1)
+            self._commands.append((command, function_name))
+        next_static = self.STATIC_BASE
+        for class_name, count in static_counts.items():
+            self._static_bases[class_name] = next_static
+            next_static += count
+
+    @staticmethod
+    def _to_word(value: int) -> int:
+        """
+        Returns:
+            int: the value wrapped to a signed 16-bit word.
+        """
+        return (value + 32768) % 65536 - 32768
+
+    def _push(self, value: int):
+        """pushes the value to the stack"""
+        self.ram[self.ram[self.SP]] = value
+        self.ram[self.SP] += 1
+
+    def _pop(self) -> int:
+        """pops and returns the top of the stack"""
+        self.ram[self.SP] -= 1
+        return self.ram[self.ram[self.SP]]
+
+    def _address(self, segment: str, index: int, function_name: str) -> int:
+        """
+        Returns:
+            int: the RAM address of the given segment entry.
+        """
+        if segment in self.pointer_segments_dictionary:
+            return self.ram[self.pointer_segments_dictionary[segment]] + index
+        if segment in self.fixed_segments_dictionary:
+            return self.fixed_segments_dictionary[segment] + index
+        return self._static_bases[function_name.split(".")[0]] + index
+
+    def _call(self, function_name: str, n_args: int, return_address: int):
+        """calls the given function, as the VM "call" command does"""
+        if function_name not in self._function_addresses:
+            arguments = [self._pop() for _ in range(n_args)][::-1]
+            self.hack_cost += self.native_cost_dictionary.get(function_name, 100)
+            self._push(self._to_word(self._native_call(function_name, arguments)))
+            return return_address
+        self.hack_cost += VMReport.command_cost(("call", function_name, n_args))
+        if self.profile is not None:
+            self.profile.record_call(function_name)
+        self._push(return_address)
+        for pointer in (self.LCL, self.ARG, self.THIS, self.THAT):
+            self._push(self.ram[pointer])
+        self.ram[self.ARG] = self.ram[self.SP] - n_args - 5
+        self.ram[self.LCL] = self.ram[self.SP]
+        return self._function_addresses[function_name]
+
+    def _return(self) -> int:
+        """returns from the current function, as the VM "return" command does"""
+        frame = self.ram[self.LCL]
+        return_address = self.ram[frame - 5]
+        self.ram[self.ram[self.ARG]] = self._pop()
+        self.ram[self.SP] = self.ram[self.ARG] + 1
+        self.ram[self.THAT] = self.ram[frame - 1]
+        self.ram[self.THIS] = self.ram[frame - 2]
+        self.ram[self.ARG] = self.ram[frame - 3]
+        self.ram[self.LCL] = self.ram[frame - 4]
+        return return_address
+
+    def _run(self, address: int, return_marker: int):
+        """
+        runs commands from the given address until the function first called
+        returns to return_marker
+        """
+        while address != return_marker:
+            if self.steps >= self.step_limit:
+                raise VMEmulatorError("step limit of {} reached".format(self.step_limit))
+            self.steps += 1
+            command, function_name = self._commands[address]
+            self.hack_cost += VMReport.command_cost(command)
+            address = self._execute(command, function_name, address)
+
+    def _execute(self, command: tuple, function_name: str, address: int) -> int:
+        """
+        executes a single command
+        Returns:
+            int: the address of the next command to execute
+        """
+        command_word = command[0]
+        if command_word == "push":
+            if command[1] == "constant":
+                self._push(command[2])
+            else:
+                self._push(self.ram[self._address(command[1], command[2], function_name)])
+        elif command_word == "pop":
+            target = self._address(command[1], command[2], function_name)
+            self.ram[target] = self._pop()
+        elif command_word in ("add", "sub", "and", "or", "eq", "gt", "lt"):
+            second = self._pop()
+            first = self._pop()
+            self._push(self._binary_operation(command_word, first, second))
+        elif command_word == "neg":
+            self._push(self._to_word(-self._pop()))
+        elif command_word == "not":
+            self._push(~self._pop())
+        elif command_word == "shiftleft":
+            self._push(self._to_word(self._pop() << 1))
+        elif command_word == "shiftright":
+            self._push(self._pop() >> 1)
+        elif command_word == "goto":
+            return self._label_addresses[(function_name, command[1])]
+        elif command_word == "if-goto":
+            is_jump = self._pop() != 0
+            if self.profile is not None:
+                self.profile.record_branch(function_name, command[1], is_jump)
+            if is_jump:
+                return self._label_addresses[(function_name, command[1])]
+        elif command_word == "call":
+            return self._call(command[1], command[2], address + 1)
+        elif command_word == "function":
+            for _ in range(command[2]):
+                self._push(0)
+        elif command_word == "return":
+            return self._return()
+        return address + 1
+
+    def _binary_operation(self, command_word: str, first: int, second: int) -> int:
+        """
+        Returns:
+            int: the result of the given binary command
+        """
+        if command_word == "add":
+            return self._to_word(first + second)
+        if command_word == "sub":
+            return self._to_word(first - second)
+        if command_word == "and":
+            return first & second
+        if command_word == "or":
+            return first | second
+        if command_word == "eq":
+            return -1 if first == second else 0
+        if command_word == "gt":
+            return -1 if self._to_word(first - second) > 0 else 0
+        return -1 if self._to_word(first - second) < 0 else 0
+
+    def _native_call(self, function_name: str, arguments: list) -> int:
+        """
+        emulates a function of the Jack OS
+        Returns:
+            int: the value the function returns
+        """
+        if function_name == "Math.multiply":
+            return arguments[0] * arguments[1]
+        if function_name == "Math.divide":
+            if arguments[1] == 0:
+                raise VMEmulatorError("division by zero")
+            quotient = abs(arguments[0]) // abs(arguments[1])
+            return quotient if (arguments[0] < 0) == (arguments[1] < 0) else -quotient
+        if function_name == "Math.abs":
+            return abs(arguments[0])
+        if function_name == "Math.min":
+            return min(arguments)
+        if function_name == "Math.max":
+            return max(arguments)
+        if function_name == "Math.sqrt":
+            return int(max(arguments[0], 0) ** 0.5)
+        if function_name == "Memory.peek":
+            return self.ram[arguments[0] % self.RAM_SIZE]
+        if function_name == "Memory.poke":
+            self.ram[arguments[0] % self.RAM_SIZE] = arguments[1]
+            return 0
+        if function_name in ("Memory.alloc", "Array.new"):
+            address = self._heap_top
+            self._heap_top += max(arguments[0], 1)
+            return address
+        if function_name == "String.new":
+            address = self._heap_top
+            self._heap_top += max(arguments[0], 1) + 2
+            self.ram[address] = 0
+            return address
+        if function_name == "String.appendChar":
+            string, character = arguments
+            self.ram[string + 2 + self.ram[string]] = character
+            self.ram[string] += 1
+            return string
+        if function_name == "String.length":
+            return self.ram[arguments[0]]
+        if function_name == "String.charAt":
+            return self.ram[arguments[0] + 2 + arguments[1]]
+        if function_name == "Output.printInt":
+            self.output.append(str(arguments[0]))
+            return 0
+        if function_name == "Output.printString":
+            string = arguments[0]
+            self.output.append(''.join(
+                chr(self.ram[string + 2 + index]) for index in range(self.ram[string])))
+            return 0
+        if function_name == "Output.printChar":
+            self.output.append(chr(arguments[0]))
+            return 0
+        if function_name == "Sys.error":
+            raise VMEmulatorError("Sys.error({})".format(arguments[0]))
+        if function_name in self.native_cost_dictionary:
+            return 0
+        raise VMEmulatorError("unknown function " + function_name)
+
+
+if "__main__" == __name__:
+    # Runs the .vm files of the given path and prints their output and the
+    # number of executed VM commands and estimated Hack instructions. With
+    # --profile, the calls and branches of the run are added to a profile
+    # file (see ExecutionProfile), which is written even if the run fails.
+    if not (len(sys.argv) == 2 or len(sys.argv) == 4 and sys.argv[2] == "--profile"):
+        sys.exit("Invalid usage, please use: VMEmulator <input path> [--profile <profile path>]")
+    emulator = VMEmulator.from_directory(sys.argv[1])
+    if len(sys.argv) == 4:
+        emulator.profile = ExecutionProfile()
+    try:
+        emulator.run_main()
+    finally:
+        if emulator.profile is not None:
+            if os.path.exists(sys.argv[3]):
+                emulator.profile.merge(ExecutionProfile.load(sys.argv[3]))
+            emulator.profile.save(sys.argv[3])
+    print("\n".join(emulator.output))
+    print("vm commands: {}, estimated hack instructions: {}".format(
+        emulator.steps, emulator.hack_cost))
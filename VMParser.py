@@ -0,0 +1,100 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+
+class VMParser:
+    """Parses a .vm file into a list of VM commands.
+
+    Each command is a tuple whose first element is the VM command word and
+    whose other elements are its arguments, for example:
+    ("push", "constant", 7), ("add",), ("label", "LOOP"),
+    ("call", "Math.multiply", 2), ("function", "Main.main", 3), ("return",).
+    Numeric arguments are kept as ints. Comments and blank lines are ignored.
+    """
+    # the commands that receive a segment and an index:
+    memory_access_commands = {"push", "pop"}
+
+    # the commands that receive a name and a number:
+    function_commands = {"function", "call"}
+
+    # the commands that receive a label:
+    branching_commands = {"label", "goto", "if-goto"}
+
+    def __init__(self, input_stream: typing.TextIO) -> None:
+        """Reads the input stream and parses all of its commands.
+
+        Args:
+            input_stream (typing.TextIO): input stream of VM code.
+        """
+        self.commands = self.parse_text(input_stream.read())
+
+    def functions(self) -> list:
+        """
+        Returns:
+            list: a list of (name, n_locals, commands) tuples, one for every
+            function in the parsed code. commands includes the "function"
+            command itself.
+        """
+        return self.split_to_functions(self.commands)
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    @classmethod
+    def parse_text(cls, text: str) -> list:
+        """
+        Args:
+            text (str): VM code.
+
+        Returns:
+            list: the commands of the given VM code.
+        """
+        commands = []
+        for line in text.split("\n"):
+            comment_index = line.find("//")
+            if comment_index != -1:
+                line = line[:comment_index]
+            words = line.split()
+            if words:
+                commands.append(cls.parse_words(words))
+        return commands
+
+    @classmethod
+    def parse_words(cls, words: list) -> tuple:
+        """
+        Args:
+            words (list): the words of a single VM line.
+
+        Returns:
+            tuple: the command the words represent.
+        """
+        command = words[0]
+        if command in cls.memory_access_commands or command in cls.function_commands:
+            return command, words[1], int(words[2])
+        if command in cls.branching_commands:
+            return command, words[1]
+        return (command,)
+
+    @staticmethod
+    def split_to_functions(commands: list) -> list:
+        """
+        Args:
+            commands (list): VM commands.
+
+        Returns:
+            list: a list of (name, n_locals, commands) tuples, one for every
+            "function" command. Commands that appear before the first
+            "function" command are ignored.
+        """
+        functions = []
+        for command in commands:
+            if command[0] == "function":
+                functions.append((command[1], command[2], [command]))
+            elif functions:
+                functions[-1][2].append(command)
+        return functions
@@ -0,0 +1,243 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import json
+import os
+import sys
+import typing
+from StackAnalysis import StackAnalysis
+from VMParser import VMParser
+
+
+class VMReport:
+    """Builds a static code-size and cost report of VM code.
+
+    For every function the report lists the number of emitted instructions
+    by opcode, the call sites and their targets, the number of locals and an
+    estimated number of Hack instructions the function is translated to,
+    with its stack usage (see StackAnalysis). Reports of two builds can be
+    compared with diff().
+    """
+    # estimated number of Hack instructions every VM command is translated
+    # to, by a straight-forward VM translator:
+    hack_cost_dictionary = {
+        "add": 5,
+        "sub": 5,
+        "and": 5,
+        "or": 5,
+        "neg": 3,
+        "not": 3,
+        "shiftleft": 3,
+        "shiftright": 3,
+        "eq": 13,
+        "gt": 13,
+        "lt": 13,
+        "label": 0,
+        "goto": 2,
+        "if-goto": 5,
+        "call": 47,
+        "function": 0,
+        "return": 43
+    }
+
+    # estimated number of Hack instructions of push / pop, by segment:
+    push_cost_dictionary = {
+        "constant": 7,
+        "local": 10,
+        "argument": 10,
+        "this": 10,
+        "that": 10,
+        "static": 7,
+        "temp": 7,
+        "pointer": 7
+    }
+    pop_cost_dictionary = {
+        "local": 12,
+        "argument": 12,
+        "this": 12,
+        "that": 12,
+        "static": 5,
+        "temp": 5,
+        "pointer": 5
+    }
+
+    # estimated number of Hack instructions that initialize a single local:
+    local_initialization_cost = 7
+
+    def __init__(self, commands: list, program_commands: typing.Optional[list] = None) -> None:
+        """Builds the report of the given VM code.
+
+        Args:
+            commands (list): VM commands, as parsed by VMParser.
+            program_commands (list): the VM commands of the whole program the
+            commands are part of, so the stack usage along call chains counts
+            the functions of other classes. The default is the given
+            commands alone.
+        """
+        self.stack_analysis = StackAnalysis(commands if program_commands is None else program_commands)
+        self.functions = {}
+        for name, n_locals, function_commands in VMParser.split_to_functions(commands):
+            self.functions[name] = self.function_report(n_locals, function_commands)
+            self.functions[name].update(self.stack_analysis.function_report(name))
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            dict: the report, in a form that can be written as JSON.
+        """
+        totals = {"instructions": 0, "call_sites": 0, "hack_cost": 0}
+        for function_report in self.functions.values():
+            for key in totals:
+                totals[key] += function_report[key]
+        return {"functions": self.functions, "totals": totals, "stack": self.stack_analysis.summary()}
+
+    def write(self, output_stream: typing.TextIO) -> None:
+        """Writes the report as JSON.
+
+        Args:
+            output_stream (typing.TextIO): writes the report to this stream.
+        """
+        json.dump(self.to_dict(), output_stream, indent=2, sort_keys=True)
+        output_stream.write("\n")
+
+    @classmethod
+    def function_report(cls, n_locals: int, commands: list) -> dict:
+        """
+        Args:
+            n_locals (int): the number of locals the function declares.
+            commands (list): the commands of the function.
+
+        Returns:
+            dict: the report of a single function.
+        """
+        opcodes = {}
+        calls = {}
+        for command in commands:
+            opcodes[command[0]] = opcodes.get(command[0], 0) + 1
+            if command[0] == "call":
+                calls[command[1]] = calls.get(command[1], 0) + 1
+        return {
+            "n_locals": n_locals,
+            "instructions": len(commands),
+            "opcodes": opcodes,
+            "call_sites": opcodes.get("call", 0),
+            "calls": calls,
+            "hack_cost": cls.estimate_hack_cost(commands)
+        }
+
+    @classmethod
+    def estimate_hack_cost(cls, commands: list) -> int:
+        """
+        Args:
+            commands (list): VM commands.
+
+        Returns:
+            int: the estimated number of Hack instructions the commands are
+            translated to.
+        """
+        cost = 0
+        for command in commands:
+            cost += cls.command_cost(command)
+        return cost
+
+    @classmethod
+    def command_cost(cls, command: tuple) -> int:
+        """
+        Args:
+            command (tuple): a VM command.
+
+        Returns:
+            int: the estimated number of Hack instructions the command is
+            translated to.
+        """
+        if command[0] == "push":
+            return cls.push_cost_dictionary[command[1]]
+        if command[0] == "pop":
+            return cls.pop_cost_dictionary[command[1]]
+        if command[0] == "function":
+            return command[2] * cls.local_initialization_cost
+        return cls.hack_cost_dictionary.get(command[0], 0)
+
+    @staticmethod
+    def diff(old_report: dict, new_report: dict) -> dict:
+        """
+        Args:
+            old_report (dict): a report of the old build, as returned by
+            to_dict().
+            new_report (dict): a report of the new build.
+
+        Returns:
+            dict: maps every function whose size or cost changed to a dict
+            with its old and new instruction count and Hack cost. A function
+            that exists in only one of the builds has None in the other.
+        """
+        keys = ("instructions", "hack_cost", "n_locals", "call_sites")
+        old_functions = old_report["functions"]
+        new_functions = new_report["functions"]
+        changes = {}
+        for name in sorted(set(old_functions) | set(new_functions)):
+            old_function = old_functions.get(name)
+            new_function = new_functions.get(name)
+            change = {}
+            for key in keys:
+                change["old_" + key] = old_function[key] if old_function else None
+                change["new_" + key] = new_function[key] if new_function else None
+            if old_function is None or new_function is None or \
+                    any(old_function[key] != new_function[key] for key in keys):
+                changes[name] = change
+        return changes
+
+    @staticmethod
+    def format_diff(changes: dict) -> str:
+        """
+        Args:
+            changes (dict): changes as returned by diff().
+
+        Returns:
+            str: a table of the changes, sorted by the growth in Hack cost.
+        """
+        def cost_delta(name):
+            change = changes[name]
+            return (change["new_hack_cost"] or 0) - (change["old_hack_cost"] or 0)
+
+        lines = ["{:<40} {:>12} {:>12} {:>8}".format(
+            "function", "instructions", "hack cost", "delta")]
+        for name in sorted(changes, key=cost_delta, reverse=True):
+            change = changes[name]
+            lines.append("{:<40} {:>12} {:>12} {:>+8}".format(
+                name,
+                "{}->{}".format(change["old_instructions"], change["new_instructions"]),
+                "{}->{}".format(change["old_hack_cost"], change["new_hack_cost"]),
+                cost_delta(name)))
+        return "\n".join(lines)
+
+    @staticmethod
+    def load(path: str) -> dict:
+        """
+        Args:
+            path (str): a report file, or a directory of report files.
+
+        Returns:
+            dict: the report. Reports of a directory are merged into one.
+        """
+        if not os.path.isdir(path):
+            with open(path, 'r') as report_file:
+                return json.load(report_file)
+        merged = {"functions": {}}
+        for filename in sorted(os.listdir(path)):
+            if filename.endswith(".report.json"):
+                with open(os.path.join(path, filename), 'r') as report_file:
+                    merged["functions"].update(json.load(report_file)["functions"])
+        return merged
+
+
+if "__main__" == __name__:
+    # Compares two reports, or two directories of reports, and prints every
+    # function whose size or cost changed between them.
+    if not len(sys.argv) == 3:
+        sys.exit("Invalid usage, please use: VMReport <old report> <new report>")
+    print(VMReport.format_diff(VMReport.diff(
+        VMReport.load(sys.argv[1]), VMReport.load(sys.argv[2]))))
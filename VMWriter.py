@@ -41,10 +41,35 @@ class VMWriter:
     Writes VM commands into a file. Encapsulates the VM command syntax.
     """
 
-    def __init__(self, output_stream: typing.TextIO) -> None:
-        """Creates a new file and prepares it for writing VM commands."""
+    def __init__(self, output_stream: typing.TextIO, optimizations: list = ()) -> None:
+        """Creates a new file and prepares it for writing VM commands.
+
+        Args:
+            output_stream (typing.TextIO): the stream to write VM commands to.
+            optimizations (list): optimizations to run on every function
+            before it is written. Each has a run(commands) method that gets
+            the commands of a single function and returns the optimized ones.
+        """
         # Your code goes here!
         self._output_file = output_stream
+        self._optimizations = list(optimizations)
+        # the commands of the function currently written. They are written to
+        # the output stream once the whole function is known:
+        self._function_commands = []
+        # if an optimization orders the functions of every class (see
+        # PassManager.function_order), the key to order them by, and the
+        # functions of the class, which are written once the class ends:
+        self._function_order = next((optimization.function_order for optimization in self._optimizations
+                                     if getattr(optimization, "function_order", None) is not None), None)
+        self._class_functions = []
+
+    @property
+    def optimizations(self) -> tuple:
+        """
+        Returns:
+            tuple: the optimizations the writer runs on every function.
+        """
+        return tuple(self._optimizations)
 
     def write_push(self, segment: str, index: int) -> None:
         """Writes a VM push command.
@@ -55,8 +80,7 @@ class VMWriter:
             index (int): the index to push to.
         """
         # Your code goes here!
-        string_to_write = 'push' + ' ' + self.segments_dictionary[segment] + ' ' + str(index) + '\n'
-        self._output_file.write(string_to_write)
+        self._function_commands.append(("push", self.segments_dictionary[segment], int(index)))
 
     def write_pop(self, segment: str, index: int) -> None:
         """Writes a VM pop command.
@@ -67,8 +91,7 @@ class VMWriter:
             index (int): the index to pop from.
         """
         # Your code goes here!
-        string_to_write = 'pop' + ' ' + self.segments_dictionary[segment] + ' ' + str(index) + '\n'
-        self._output_file.write(string_to_write)
+        self._function_commands.append(("pop", self.segments_dictionary[segment], int(index)))
 
     def write_arithmetic(self, command: str) -> None:
         """Writes a VM arithmetic command.
@@ -78,8 +101,7 @@ class VMWriter:
             "EQ", "GT", "LT", "AND", "OR", "NOT".
         """
         # Your code goes here!
-        string_to_write = self.commands_dictionary[command] + '\n'
-        self._output_file.write(string_to_write)
+        self._function_commands.append((self.commands_dictionary[command],))
 
     def write_label(self, label: str) -> None:
         """Writes a VM label command.
@@ -88,8 +110,7 @@ class VMWriter:
             label (str): the label to write.
         """
         # Your code goes here!
-        string_to_write = 'label' + ' ' + label + '\n'
-        self._output_file.write(string_to_write)
+        self._function_commands.append(("label", label))
 
     def write_goto(self, label: str) -> None:
         """Writes a VM goto command.
@@ -98,8 +119,7 @@ class VMWriter:
             label (str): the label to go to.
         """
         # Your code goes here!
-        string_to_write = 'goto' + ' ' + label + '\n'
-        self._output_file.write(string_to_write)
+        self._function_commands.append(("goto", label))
 
     def write_if(self, label: str) -> None:
         """Writes a VM if-goto command.
@@ -108,8 +128,7 @@ class VMWriter:
             label (str): the label to go to.
         """
         # Your code goes here!
-        string_to_write = 'if-goto' + ' ' + label + '\n'
-        self._output_file.write(string_to_write)
+        self._function_commands.append(("if-goto", label))
 
     def write_call(self, name: str, n_args: int) -> None:
         """Writes a VM call command.
@@ -119,8 +138,7 @@ class VMWriter:
             n_args (int): the number of arguments the function receives.
         """
         # Your code goes here!
-        string_to_write = 'call' + ' ' + name + ' ' + str(n_args) + '\n'
-        self._output_file.write(string_to_write)
+        self._function_commands.append(("call", name, n_args))
 
     def write_function(self, name: str, n_locals: int) -> None:
         """Writes a VM function command.
@@ -130,11 +148,85 @@ class VMWriter:
             n_locals (int): the number of local variables the function uses.
         """
         # Your code goes here!
-        string_to_write = 'function' + ' ' + name + ' ' + str(n_locals) + '\n'
-        self._output_file.write(string_to_write)
+        self._flush()
+        self._function_commands.append(("function", name, n_locals))
 
     def write_return(self) -> None:
         """Writes a VM return command."""
         # Your code goes here!
-        string_to_write = 'return' + '\n'
-        self._output_file.write(string_to_write)
+        self._function_commands.append(("return",))
+
+    def write_vm_commands(self, commands: list) -> None:
+        """Writes VM commands that were not emitted by the compilation engine,
+        such as the commands of a .vm file of the Jack OS, or of a function
+        that was compiled before. They are not optimized again.
+
+        Args:
+            commands (list): VM commands, as parsed by VMParser.
+        """
+        self._flush()
+        self._write_function(commands)
+
+    def flush(self) -> list:
+        """Writes the function currently written, without waiting for the next
+        function.
+
+        Returns:
+            list: the commands that were written, after the optimizations.
+        """
+        return self._flush()
+
+    def close(self) -> None:
+        """Writes the last function and closes the output stream."""
+        self._flush()
+        self._write_class()
+        self._output_file.close()
+
+    @staticmethod
+    def command_to_string(command: tuple) -> str:
+        """
+        Args:
+            command (tuple): a VM command, as ("push", "constant", 7).
+
+        Returns:
+            str: the line of VM code of the command, including its newline.
+        """
+        return ' '.join(map(str, command)) + '\n'
+
+    ######################################
+    # helpers- not part of the API:
+    #######################################
+    def _flush(self) -> list:
+        """Optimizes the function currently written and writes it to the
+        output stream.
+
+        Returns:
+            list: the commands that were written.
+        """
+        commands = self._function_commands
+        self._function_commands = []
+        if commands and commands[0][0] == "function":
+            for optimization in self._optimizations:
+                commands = optimization.run(commands)
+        self._write_function(commands)
+        return commands
+
+    def _write_function(self, commands: list) -> None:
+        """Writes the given commands, or keeps them until the class ends if
+        the functions of the class are ordered."""
+        if self._function_order is None:
+            self._write_commands(commands)
+        elif commands:
+            self._class_functions.append(commands)
+
+    def _write_class(self) -> None:
+        """Writes the kept functions of the class, in their order."""
+        functions = self._class_functions
+        self._class_functions = []
+        for commands in sorted(functions, key=lambda function_commands: self._function_order(
+                function_commands[0][1] if function_commands[0][0] == "function" else "")):
+            self._write_commands(commands)
+
+    def _write_commands(self, commands: list) -> None:
+        """Writes the given commands to the output stream as VM code."""
+        self._output_file.write(''.join(self.command_to_string(command) for command in commands))
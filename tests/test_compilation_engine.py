@@ -0,0 +1,30 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+Tests the diagnostics of CompilationEngine for source code with errors.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Diagnostic import CompilationError  # noqa: E402
+from JackCompiler import compile_source  # noqa: E402
+
+
+@pytest.mark.parametrize("text, message", [
+    ("class A { } class B { }", "expected end of file but found 'class'"),
+    ("class A { }\n}", "expected end of file but found '}'"),
+])
+def test_tokens_after_the_class_are_an_error(text, message):
+    with pytest.raises(CompilationError) as error:
+        compile_source(text)
+    assert [diagnostic.message for diagnostic in error.value.diagnostics] == [message]
+
+
+def test_comments_after_the_class_are_allowed():
+    assert compile_source("class A { }\n// the end\n/* of A */\n") == ""
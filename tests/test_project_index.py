@@ -0,0 +1,57 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+Tests that a ProjectIndex is saved and loaded again, and that a damaged
+index file loads as an empty index.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ProjectIndex import ProjectIndex  # noqa: E402
+
+
+def saved_index(path):
+    """
+    Returns:
+        ProjectIndex: an index of two classes, saved at the given path.
+    """
+    index = ProjectIndex()
+    index.update("Main", ProjectIndex.source_hash("class Main { }"), [("main", "function", 0, 2)])
+    index.update("Point", ProjectIndex.source_hash("class Point { }"),
+                 [("new", "constructor", 2, 0), ("getX", "method", 0, 0)])
+    index.save(str(path))
+    return index
+
+
+def contents(index):
+    """
+    Returns:
+        dict: maps the name of every class of the index to its subroutines.
+    """
+    return {class_name: index.subroutines(class_name) for class_name in index.class_names()}
+
+
+def test_saved_index_loads_again(tmp_path):
+    index = saved_index(tmp_path / "project.idx")
+    assert contents(ProjectIndex.load(str(tmp_path / "project.idx"))) == contents(index)
+    assert os.listdir(str(tmp_path)) == ["project.idx"]
+
+
+def test_truncated_index_loads_empty(tmp_path):
+    path = tmp_path / "project.idx"
+    saved_index(path)
+    data = path.read_bytes()
+    for length in range(len(data)):
+        path.write_bytes(data[:length])
+        assert contents(ProjectIndex.load(str(path))) == {}
+
+
+def test_index_with_trailing_bytes_loads_empty(tmp_path):
+    path = tmp_path / "project.idx"
+    saved_index(path)
+    path.write_bytes(path.read_bytes() + b"\0")
+    assert contents(ProjectIndex.load(str(path))) == {}
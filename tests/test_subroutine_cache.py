@@ -0,0 +1,60 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+Tests that a SubroutineCache shared by builds with different options reuses
+a subroutine only when the build compiles it to the same code: the code of
+a class compiled with a warm cache must be the code it has with no cache.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from CompilationEngine import CompilationEngine  # noqa: E402
+from JackCompiler import compile_source  # noqa: E402
+from PassManager import PassManager  # noqa: E402
+from SubroutineCache import SubroutineCache  # noqa: E402
+
+source = """
+class Main {
+    function int clamp(int x) {
+        return Math.min(Math.max(x, 0), 100);
+    }
+    function int twice(int x) {
+        return Math.abs(x) + Math.abs(x);
+    }
+}
+"""
+
+
+def intrinsics(names=None):
+    """
+    Returns:
+        dict: zero counts of the given intrinsics, by default all of them.
+    """
+    return dict.fromkeys(CompilationEngine.intrinsics_dictionary if names is None else names, 0)
+
+
+def test_cache_is_shared_by_builds_with_and_without_intrinsics():
+    cache = SubroutineCache()
+    builds = [None, intrinsics(), None, intrinsics(["Math.abs"]), intrinsics(), intrinsics(["Math.min"])]
+    for intrinsic_rewrites in builds:
+        expected_rewrites = None if intrinsic_rewrites is None else dict(intrinsic_rewrites)
+        expected = compile_source(source, intrinsic_rewrites=expected_rewrites)
+        for _ in range(2):
+            assert compile_source(source, subroutine_cache=cache, intrinsic_rewrites=intrinsic_rewrites) == expected
+        if expected_rewrites is not None:
+            assert intrinsic_rewrites == {name: 2 * count for name, count in expected_rewrites.items()}
+    # the second compilation of every build reuses both subroutines:
+    assert (cache.hits, cache.misses) == (2 * len(builds), 2 * len(builds))
+
+
+def test_cache_is_shared_by_builds_with_different_optimizations():
+    cache = SubroutineCache()
+    for level in (0, 2, 0, 2):
+        expected = compile_source(source, [PassManager(level)])
+        for _ in range(2):
+            assert compile_source(source, [PassManager(level)], subroutine_cache=cache) == expected
+    assert (cache.hits, cache.misses) == (2 * 4, 2 * 4)
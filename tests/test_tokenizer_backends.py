@@ -0,0 +1,95 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+A differential test of the two tokenizer backends: the "regex" and the
+"dfa" backend of JackTokenizer must give the same tokens, token lines and
+diagnostics for every input. The inputs are fuzzed from Jack fragments
+(keywords, identifiers, integers past the largest constant, strings and
+comments, terminated or not) and from random characters.
+
+Run it with pytest, or as a script to choose the number of inputs and the
+seed:
+
+    python3 tests/test_tokenizer_backends.py --count 20000 --seed 1
+"""
+import argparse
+import io
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from JackTokenizer import JackTokenizer  # noqa: E402
+
+# the fragments fuzzed inputs are made of:
+fragments = sorted(JackTokenizer.set_of_keywords) + [
+    "x", "_y1", "Main", "a.b", "0", "7", "32767", "32768", "99999", "007",
+    '"str"', '"a // b"', '"/* c */"', '"unterminated', '""',
+    "// line comment\n", "/* block */", "/** doc\n comment */", "/* unterminated", "/*/", "//",
+    "{", "}", "(", ")", "[", "]", ".", ",", ";", "+", "-", "*", "/", "&", "|", "<", ">", "=", "~",
+    " ", "  ", "\t", "\n", "\r\n", "\n\n",
+    "#", "$", "@", "\\", "'", "?", "!", "`", "é", "א", "\x00",
+]
+
+# the characters random inputs are made of:
+alphabet = "abcXYZ_019 \t\n\r\"/*{}()[].,;+-&|<>=~#$@\\'é"
+
+
+def tokenize(text: str, backend: str) -> tuple:
+    """
+    Returns:
+        tuple: (tokens, lines, diagnostics) the backend gives for the text.
+    """
+    tokenizer = JackTokenizer(io.StringIO(text), backend)
+    return (tokenizer.tokens_list, tokenizer.token_lines,
+            [diagnostic.to_dict() for diagnostic in tokenizer.diagnostics])
+
+
+def fuzzed_inputs(count: int, seed: int) -> list:
+    """
+    Returns:
+        list: the given number of fuzzed inputs, half of them joined from
+        fragments and half of them random characters.
+    """
+    generator = random.Random(seed)
+    inputs = []
+    for index in range(count):
+        length = generator.randint(0, 60)
+        if index % 2 == 0:
+            separator = generator.choice(("", " ", "\n"))
+            inputs.append(separator.join(generator.choice(fragments) for _ in range(length)))
+        else:
+            inputs.append("".join(generator.choice(alphabet) for _ in range(length)))
+    return inputs
+
+
+def mismatches(inputs: list) -> list:
+    """
+    Returns:
+        list: the inputs the backends tokenize differently.
+    """
+    return [text for text in inputs if tokenize(text, "regex") != tokenize(text, "dfa")]
+
+
+def test_backends_agree_on_fragments() -> None:
+    for fragment in fragments:
+        assert tokenize(fragment, "regex") == tokenize(fragment, "dfa"), repr(fragment)
+
+
+def test_backends_agree_on_fuzzed_inputs() -> None:
+    assert mismatches(fuzzed_inputs(2000, 0)) == []
+
+
+if "__main__" == __name__:
+    parser = argparse.ArgumentParser(description="compare the regex and dfa tokenizer backends")
+    parser.add_argument("--count", type=int, default=20000, help="the number of fuzzed inputs")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the fuzzed inputs")
+    arguments = parser.parse_args()
+    failed = mismatches(fragments + fuzzed_inputs(arguments.count, arguments.seed))
+    for text in failed[:10]:
+        print("mismatch: {!r}".format(text))
+    print("{} input(s), {} mismatch(es)".format(len(fragments) + arguments.count, len(failed)))
+    sys.exit(1 if failed else 0)
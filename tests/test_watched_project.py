@@ -0,0 +1,49 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+Tests the builds of a watched directory: the outputs its first build and
+its rebuilds leave in the directory.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from JackCompiler import _WatchedProject  # noqa: E402
+
+sources = {
+    "Main.jack": "class Main { function void main() { do Util.run(); return; } }",
+    "Util.jack": "class Util { function void run() { return; } }",
+}
+
+
+def watched_project(directory):
+    """
+    Returns:
+        _WatchedProject: a project of the sources in the directory, built once.
+    """
+    for filename, text in sources.items():
+        (directory / filename).write_text(text)
+    project = _WatchedProject(str(directory), [], True, None, str(directory / "project.deps.json"))
+    project.rebuild(set(sources), False)
+    return project
+
+
+def test_first_build_writes_reports_of_unchanged_outputs(tmp_path):
+    watched_project(tmp_path)
+    for filename in ("Main.report.json", "Util.report.json"):
+        os.remove(str(tmp_path / filename))
+    # the .vm files are already up to date, but the reports are missing:
+    watched_project(tmp_path)
+    assert (tmp_path / "Main.report.json").exists() and (tmp_path / "Util.report.json").exists()
+
+
+def test_deleted_class_leaves_no_outputs(tmp_path):
+    project = watched_project(tmp_path)
+    os.remove(str(tmp_path / "Util.jack"))
+    project.rebuild({"Util.jack"}, True)
+    assert sorted(os.listdir(str(tmp_path))) == [
+        "Main.d", "Main.jack", "Main.report.json", "Main.vm", "project.deps.json"]
+    assert "Util" not in project.dependency_graph.class_names()
@@ -0,0 +1,84 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+Measures the throughput of the tokenizer backends, in MB of Jack source
+per second. The source is the given .jack files, or a generated class of
+about the given size:
+
+    python3 tests/tokenizer_throughput.py --size 500000
+    python3 tests/tokenizer_throughput.py Pong/*.jack
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from JackTokenizer import JackTokenizer  # noqa: E402
+
+# a subroutine of the generated class, with comments, strings and arrays:
+subroutine_template = '''
+    /** Returns the sum of the first n elements of a. */
+    function int sum{0}(Array a, int n) {{
+        var int i, total;
+        let i = 0;
+        let total = 0;  // the running sum
+        while (i < n) {{
+            let total = total + a[i];
+            let i = i + 1;
+        }}
+        do Output.printString("sum{0}: ");
+        return total;
+    }}
+'''
+
+
+def generated_source(size: int) -> str:
+    """
+    Returns:
+        str: a class of subroutines of about the given number of characters.
+    """
+    subroutines = []
+    length = 0
+    while length < size:
+        subroutines.append(subroutine_template.format(len(subroutines)))
+        length += len(subroutines[-1])
+    return "class Generated {\n" + "".join(subroutines) + "}\n"
+
+
+def throughput(text: str, backend: str, repeats: int) -> float:
+    """
+    Returns:
+        float: the MB per second the backend tokenizes the text at, in the
+        fastest of the repeats.
+    """
+    fastest = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        JackTokenizer(io.StringIO(text), backend)
+        seconds = time.perf_counter() - start
+        fastest = seconds if fastest is None else min(fastest, seconds)
+    return len(text.encode("utf-8")) / 1e6 / fastest
+
+
+if "__main__" == __name__:
+    parser = argparse.ArgumentParser(description="measure the throughput of the tokenizer backends")
+    parser.add_argument("paths", nargs="*", help=".jack files to tokenize")
+    parser.add_argument("--size", type=int, default=500000,
+                        help="the characters of the generated class, when no files are given")
+    parser.add_argument("--repeats", type=int, default=5, help="the runs of every backend")
+    arguments = parser.parse_args()
+    if arguments.paths:
+        texts = []
+        for path in arguments.paths:
+            with open(path, 'r') as input_file:
+                texts.append(input_file.read())
+        source = "\n".join(texts)
+    else:
+        source = generated_source(arguments.size)
+    for name in JackTokenizer.backends:
+        print("{:<6} {:6.2f} MB/s".format(name, throughput(source, name, arguments.repeats)))